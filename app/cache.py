@@ -0,0 +1,197 @@
+import json
+import os
+import threading
+import time
+from .utils import CACHE_FILE, Logger
+
+CACHE_VERSION = 2
+
+def _valid_miss(miss):
+    return isinstance(miss, dict) and isinstance(miss.get("next_retry"), (int, float)) and isinstance(miss.get("failures"), int)
+
+class GameCache:
+    """
+    Game metadata cache: a compact JSON snapshot plus an append-only journal.
+    New entries are appended as one JSON line each and folded into the
+    snapshot by a background compaction (temp file + atomic rename).
+    Failed lookups are kept as negative entries with an exponential retry schedule.
+    """
+    def __init__(self, path=CACHE_FILE, ttl=30 * 86400, compact_every=50, retry_base=600, retry_max=86400):
+        self.path = path
+        self.journal_path = path + ".journal"
+        self.ttl = ttl
+        self.compact_every = compact_every
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+
+        self.entries = {}    # title_id -> {"name", "image", "background"}
+        self.fetched_at = {} # title_id -> unix time of the lookup
+        self.misses = {}     # title_id -> {"reason", "failures", "next_retry"}
+        self.journal_count = 0
+        self.compacting = False
+        self.lock = threading.RLock()
+
+        self.load()
+
+    def __contains__(self, title_id):
+        return title_id in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, title_id):
+        return self.entries.get(title_id)
+
+    def is_stale(self, title_id):
+        if not self.ttl: return False
+        return time.time() - self.fetched_at.get(title_id, 0) > self.ttl
+
+    def put(self, title_id, info, fetched_at=None):
+        fetched_at = fetched_at or int(time.time())
+        entry = {"name": info.get("name"), "image": info.get("image"), "background": info.get("background")}
+
+        with self.lock:
+            self.entries[title_id] = entry
+            self.fetched_at[title_id] = fetched_at
+            self.misses.pop(title_id, None)
+            self._append({"id": title_id, "info": entry, "fetched_at": fetched_at})
+
+    # === NEGATIVE CACHE ===
+    def get_miss(self, title_id):
+        return self.misses.get(title_id)
+
+    def retry_due(self, title_id):
+        """True if the title has no negative entry or its retry time has come."""
+        miss = self.misses.get(title_id)
+        return miss is None or time.time() >= miss["next_retry"]
+
+    def put_miss(self, title_id, reason):
+        """Records a failed lookup; each consecutive failure doubles the retry delay."""
+        with self.lock:
+            failures = self.misses.get(title_id, {}).get("failures", 0) + 1
+            delay = min(self.retry_base * (2 ** (failures - 1)), self.retry_max)
+            miss = {"reason": reason, "failures": failures, "next_retry": int(time.time() + delay)}
+            self.misses[title_id] = miss
+            self._append({"id": title_id, "miss": miss})
+        return miss
+
+    def clear_miss(self, title_id):
+        with self.lock:
+            if self.misses.pop(title_id, None) is not None:
+                self._append({"id": title_id, "miss": None})
+
+    def _append(self, record):
+        try:
+            with open(self.journal_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            self.journal_count += 1
+        except Exception as e:
+            Logger.log(f"Cache journal error: {e}")
+
+        if self.journal_count >= self.compact_every:
+            self.compact_async()
+
+    # === LOADING ===
+    def load(self):
+        migrated = self._load_snapshot()
+        self._replay_journal()
+        # Also compacts away a torn trailing line so new appends start clean
+        journal_dirty = os.path.exists(self.journal_path) and os.path.getsize(self.journal_path) > 0
+        if migrated or journal_dirty:
+            self.compact_async()
+
+    def _load_snapshot(self):
+        """Reads the snapshot. Returns True if it needs rewriting (legacy format or damaged)."""
+        if not os.path.exists(self.path): return False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except Exception as e:
+            Logger.log(f"Cache snapshot unreadable, starting from journal: {e}")
+            return True
+
+        if not isinstance(data, dict):
+            Logger.log(f"Cache snapshot malformed ({type(data).__name__}), starting from journal.")
+            return True
+
+        if data.get("version") == CACHE_VERSION:
+            games, misses = data.get("games"), data.get("misses", {})
+            if not isinstance(games, dict) or not isinstance(misses, dict):
+                Logger.log("Cache snapshot malformed, starting from journal.")
+                return True
+
+            skipped = 0
+            for title_id, entry in games.items():
+                if not isinstance(entry, dict):
+                    skipped += 1
+                    continue
+                fetched_at = entry.pop("fetched_at", 0)
+                self.fetched_at[title_id] = fetched_at if isinstance(fetched_at, (int, float)) else 0
+                self.entries[title_id] = entry
+            for title_id, miss in misses.items():
+                if _valid_miss(miss): self.misses[title_id] = miss
+                else: skipped += 1
+            if skipped: Logger.log(f"Cache snapshot: skipped {skipped} malformed entries.")
+            return skipped > 0
+
+        # Legacy {title_id: info} file: the file date is the best fetch time we have
+        fetched_at = int(os.path.getmtime(self.path))
+        for title_id, info in data.items():
+            if isinstance(info, dict):
+                self.entries[title_id] = {"name": info.get("name"), "image": info.get("image"), "background": info.get("background")}
+                self.fetched_at[title_id] = fetched_at
+        Logger.log(f"Migrating legacy game cache ({len(self.entries)} titles).")
+        return True
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_path): return
+        try:
+            with open(self.journal_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try: record = json.loads(line)
+                    except ValueError: continue # Torn write from a crash
+                    if not isinstance(record, dict) or not isinstance(record.get("id"), str): continue
+                    title_id = record["id"]
+                    if "miss" in record:
+                        if _valid_miss(record["miss"]): self.misses[title_id] = record["miss"]
+                        elif not record["miss"]: self.misses.pop(title_id, None)
+                    elif isinstance(record.get("info"), dict):
+                        self.entries[title_id] = record["info"]
+                        fetched_at = record.get("fetched_at", 0)
+                        self.fetched_at[title_id] = fetched_at if isinstance(fetched_at, (int, float)) else 0
+                        self.misses.pop(title_id, None)
+                    self.journal_count += 1
+        except Exception as e:
+            Logger.log(f"Cache journal unreadable: {e}")
+
+    # === COMPACTION ===
+    def compact_async(self):
+        with self.lock:
+            if self.compacting: return
+            self.compacting = True
+        threading.Thread(target=self.compact, daemon=True).start()
+
+    def compact(self):
+        """Writes a fresh snapshot atomically and truncates the journal."""
+        with self.lock:
+            try:
+                games = {}
+                for title_id, entry in self.entries.items():
+                    games[title_id] = dict(entry, fetched_at=self.fetched_at.get(title_id, 0))
+
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"version": CACHE_VERSION, "games": games, "misses": self.misses}, f, ensure_ascii=False, separators=(",", ":"))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+
+                # Snapshot is durable, journal entries are now redundant
+                open(self.journal_path, "w").close()
+                self.journal_count = 0
+            except Exception as e:
+                Logger.log(f"Cache compaction error: {e}")
+            finally:
+                self.compacting = False
@@ -1,60 +1,192 @@
+import os
+import random
 import socket
-import re
 import time
 import threading
-import httpx
-from bs4 import BeautifulSoup
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
-from .utils import ConfigManager, Logger, load_cache, save_cache
-
-# === REGEX PATTERNS ===
-SCENE_PATTERN = re.compile(r"OnFocusActiveSceneChanged\s*\[(.*?)\]\s*->\s*\[(.*?)\]")
-ID_EXTRACTOR = re.compile(r"(?:Render\.|titleId\s*[:=]\s*|title_id\s*=\s*['\"\[]?|SplashScreen\.)([A-Z]{4}[0-9]{5})", re.IGNORECASE)
-DEBUG_PATTERN = re.compile(r"id_debug_settings")
-PROHIBITION_PATTERN = re.compile(r"ProhibitionFlag.*?newFlags\s*=\s*\[.*?,([A-Z]{4}[0-9]{5}),\]")
-
-# === IGNORED PROCESSES (Background/Dialogs/Overlays) ===
-IGNORED_IDS = {
-    "NPXS40003", "NPXS40093", "NPXS40094", "NPXS40095", "NPXS40096", 
-    "NPXS40100", "NPXS40109", "NPXS40112"
-}
+from concurrent.futures import ThreadPoolExecutor
+from .utils import ConfigManager, Logger, BASE_DIR, STARTED_AT
+from .cache import GameCache
+from .http_client import HttpClient
+from .providers import ProviderChain, PatchSiteProvider, OverridesProvider, PS4_PREFIXES
+from .stats import create_stats_fetcher, StatsTimeout
+from .timeseries import StatsHistory, parse_stat
+from .events import StatusChanged, GameChanged, StatsChanged
+from .state import CoreState, GameInfo, Stats, EMPTY_GAME, STATS_NA, STATS_TIMEOUT, STATS_ERR_CONN
+from .klog import LineFramer, KlogRecorder, KlogMatch, classify_line, IGNORED_IDS
+from . import metrics
+from .tracing import TRACER
 
 SYSTEM_TITLES = {
-    "NPXS40002": {"name": "Home Menu", "image": "ps5", "background": ""},
-    "NPXS40008": {"name": "Settings", "image": "settings", "background": ""},
-    "DEBUG_SETTINGS": {"name": "Debug Settings", "image": "cog", "background": ""},
-    "ITEM00001": {"name": "Launching...", "image": "ps5", "background": ""},
-    "CUSA00001": {"name": "Media Player", "image": "play", "background": ""},
-    "PPSA00001": {"name": "PlayStation Store", "image": "store", "background": ""},
-    "CUSA00002": {"name": "Trophies", "image": "trophy", "background": ""}
+    "NPXS40002": GameInfo(name="Home Menu", image="ps5", background=""),
+    "NPXS40008": GameInfo(name="Settings", image="settings", background=""),
+    "DEBUG_SETTINGS": GameInfo(name="Debug Settings", image="cog", background=""),
+    "ITEM00001": GameInfo(name="Launching...", image="ps5", background=""),
+    "CUSA00001": GameInfo(name="Media Player", image="play", background=""),
+    "PPSA00001": GameInfo(name="PlayStation Store", image="store", background=""),
+    "CUSA00002": GameInfo(name="Trophies", image="trophy", background="")
+}
+SYSTEM_APP = GameInfo(name="System App", image="ps5", background="")
+
+# === METRICS ===
+KLOG_MATCHES = {
+    kind: metrics.counter("ps5_klog_matches_total", "KLOG lines matched by the classifier", kind=kind)
+    for kind in (KlogMatch.PROHIBITION, KlogMatch.SCENE, KlogMatch.TITLE, KlogMatch.DEBUG)
+}
+TRANSITIONS = metrics.counter("ps5_transitions_total", "Title changes detected in the KLOG")
+GAME_INFO = {
+    source: metrics.counter("ps5_game_info_total", "Game info lookups by where the answer came from", source=source)
+    for source in ("system", "override", "cache", "negative", "online")
+}
+METADATA_FETCH = metrics.histogram("ps5_metadata_fetch_seconds", "Online metadata lookup latency")
+METADATA_RESULTS = {
+    found: metrics.counter("ps5_metadata_fetch_total", "Online metadata lookups", found=str(found).lower())
+    for found in (True, False)
+}
+STATS_POLL = metrics.histogram("ps5_stats_poll_seconds", "Stats page fetch latency")
+STATS_ERRORS = {
+    kind: metrics.counter("ps5_stats_errors_total", "Failed stats polls", kind=kind)
+    for kind in ("timeout", "connection")
+}
+CORE_EVENTS = {
+    kind: metrics.counter("ps5_core_events_total", "Typed change events emitted by the core", kind=kind)
+    for kind in ("status", "game", "stats")
 }
 
 class PS5Core:
-    def __init__(self, callback_update):
+    def __init__(self, callback_update, callback_event=None):
         self.config = ConfigManager()
         self.running = False
-        self.callback_update = callback_update
-        self.game_cache = load_cache()
+        self.callback_update = callback_update # Full {status, game, stats} snapshots
+        self.callback_event = callback_event   # Typed deltas (StatusChanged, GameChanged, StatsChanged)
+        self.game_cache = GameCache(
+            ttl=float(self.config.get("metadata", "cache_ttl_days")) * 86400,
+            retry_base=float(self.config.get("metadata", "retry_base_min")) * 60,
+            retry_max=float(self.config.get("metadata", "retry_max_hours")) * 3600
+        )
         self.current_title_id = None
         
         self.last_status = "Offline"
-        self.last_game_info = {}
-        self.current_stats = {"cpu_temp": "N/A", "soc_temp": "N/A", "frequency": "N/A"}
+        self.last_game_info = EMPTY_GAME
+        self.current_stats = STATS_NA
+
+        # === CHANGE TRACKING ===
+        # Last published values, the deltas are computed against them
+        self.version = 0
+        self.published = {"status": None, "game": None, "stats": None}
+        self.stats_published_at = 0
+        # Immutable snapshot, replaced as a whole on every change: read it from any thread
+        self.state = CoreState(status=self.last_status, game=EMPTY_GAME, stats=STATS_NA, version=0)
+        self.notify_lock = threading.Lock()
+        self.stats_fetcher = None
+        self.stats_history = StatsHistory()
+        self.stats_demand = None # Callable: does any enabled sink use stats right now?
+        self.stats_wakeup = threading.Event()
+        self.klog_framer = LineFramer() # Framer of the current connection (timestamps for traces)
+        self.klog_generation = 0 # Bumped on start(), readers of an older generation exit
+        self.klog_recorder = None
+        self.klog_address = None # (ip, port) override, used by replay mode
+        self.first_connect = None # Seconds from startup to the first KLOG connection
+
+        # === METADATA RESOLVER ===
+        # Online lookups run off the KLOG thread; one in-flight fetch per title
+        self.metadata_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="metadata")
+        self.pending_lookups = {}
+        self.lookup_lock = threading.Lock()
+        self.http = HttpClient(
+            timeout=float(self.config.get("metadata", "timeout")),
+            max_connections=int(self.config.get("metadata", "max_connections")),
+            http2=bool(self.config.get("metadata", "http2")),
+            retries=int(self.config.get("metadata", "retries")),
+            backoff=float(self.config.get("metadata", "backoff")),
+            headers={
+                'User-Agent': 'Mozilla/5.0',
+                'Accept-Encoding': 'gzip, deflate'
+            }
+        )
+
+        overrides_file = self.config.get("metadata", "overrides_file")
+        if not os.path.isabs(overrides_file): overrides_file = os.path.join(BASE_DIR, overrides_file)
+        timeout = float(self.config.get("metadata", "timeout"))
+        self.overrides = OverridesProvider(overrides_file)
+        self.metadata = ProviderChain([
+            self.overrides,
+            PatchSiteProvider("orbispatches", "https://orbispatches.com", self.http, PS4_PREFIXES, timeout),
+            PatchSiteProvider("prosperopatches", "https://prosperopatches.com", self.http, None, timeout)
+        ], hedge_delay=float(self.config.get("metadata", "hedge_delay")))
         
         # === TIME PERSISTENCE SYSTEM ===
         # Stores the start timestamp of the current game session
         self.active_game_id = None
         self.active_game_start_time = None
+        self.trace = None # Latency trace of the current transition
+
+        metrics.gauge("ps5_state_version", "Version of the last published state", fn=lambda: self.version)
+        metrics.gauge("ps5_first_klog_connect_seconds", "Time from launch to the first KLOG connection",
+                      fn=lambda: self.first_connect or 0)
+        metrics.gauge("ps5_metadata_pending", "Online lookups in flight", fn=lambda: len(self.pending_lookups))
+        metrics.gauge("ps5_game_cache_entries", "Titles in the metadata cache", fn=lambda: len(self.game_cache))
 
     def start(self):
         self.running = True
-        threading.Thread(target=self._monitor_klog, daemon=True).start()
+        self._setup_recorder()
+        self.klog_generation += 1
+        threading.Thread(target=self._monitor_klog, args=(self.klog_generation,), daemon=True).start()
         threading.Thread(target=self._monitor_stats, daemon=True).start()
 
     def stop(self):
         self.running = False
+        self.stats_wakeup.set()
+        self.klog_framer.tap = None
+        if self.klog_recorder:
+            self.klog_recorder.close()
+            self.klog_recorder = None
+        if self.metadata.stats: Logger.log(f"Metadata providers {self.metadata.get_stats()}")
+        if self.http.host_stats: Logger.log(f"Metadata HTTP {self.http.get_stats()}")
+        self._report_traces()
+
+    def _report_traces(self):
+        if not TRACER.traces: return
+        Logger.log(f"Transition latency since KLOG receive:\n{TRACER.summary()}")
+        path = self.config.get("tracing", "export_file")
+        if path:
+            if not os.path.isabs(path): path = os.path.join(BASE_DIR, path)
+            TRACER.export(path)
+
+    def _setup_recorder(self):
+        if not self.config.get("klog", "record"): return
+
+        directory = self.config.get("klog", "record_dir")
+        if not os.path.isabs(directory): directory = os.path.join(BASE_DIR, directory)
+        max_bytes = int(float(self.config.get("klog", "record_max_mb")) * 1024 * 1024)
+
+        self.klog_recorder = KlogRecorder(directory, max_bytes, int(self.config.get("klog", "record_keep")))
+
+    def _stats_wanted(self):
+        if self.stats_demand is None: return True
+        try: return bool(self.stats_demand())
+        except Exception: return True
+
+    def _next_stats_delay(self, errors):
+        """Poll rate follows console state; failures back off exponentially with jitter."""
+        if self.last_status == "Playing": delay = self.config.get("stats", "interval_playing")
+        elif self.last_status == "Online": delay = self.config.get("stats", "interval_online")
+        else: delay = self.config.get("stats", "interval_idle")
+        delay = float(delay)
+
+        if errors:
+            delay = min(delay * (2 ** errors), float(self.config.get("stats", "max_backoff")))
+            delay *= random.uniform(0.8, 1.2)
+        return delay
+
+    def request_stats(self):
+        """Wakes the stats poller (status change, new subscriber, ...)."""
+        self.stats_wakeup.set()
 
     def _monitor_stats(self):
+        backend = self.config.get("stats", "backend")
+        fetcher = None
+        errors = 0
+
         while self.running:
             ip = self.config.get("general", "ps5_ip")
             port = self.config.get("general", "stats_port")
@@ -63,80 +195,88 @@ class PS5Core:
                 time.sleep(5)
                 continue
 
+            # Suspended while the console is off or nobody uses the numbers
+            if self.last_status == "Offline" or not self._stats_wanted():
+                self.stats_wakeup.wait(30)
+                self.stats_wakeup.clear()
+                errors = 0
+                continue
+
             url = f"http://{ip}:{port}"
-            SELECTORS = {
-                "cpu_temp": 'div.info-label:text("CPU Temp") + div.info-value',
-                "soc_temp": 'div.info-label:text("SoC Temp") + div.info-value',
-                "frequency": 'div.info-label:text("Frequency") + div.info-value'
-            }
+            if fetcher is None:
+                fetcher = self.stats_fetcher = create_stats_fetcher(backend)
 
             try:
-                with sync_playwright() as p:
-                    browser = p.chromium.launch(headless=True)
-                    page = browser.new_page()
-                    
-                    while self.running:
-                        try:
-                            page.goto(url, timeout=5000)
-                            try: page.wait_for_selector('div.system-info-content', timeout=3000)
-                            except: pass
-                            
-                            new_stats = {}
-                            for key, selector in SELECTORS.items():
-                                try:
-                                    if page.locator(selector).count() > 0:
-                                        val = page.locator(selector).first.inner_text()
-                                        new_stats[key] = val.strip()
-                                    else: new_stats[key] = "N/A"
-                                except: new_stats[key] = "N/A"
-
-                            self.current_stats = new_stats
-                            self._notify()
-
-                        except PlaywrightTimeoutError:
-                            self.current_stats = {"cpu_temp": "Timeout", "soc_temp": "Timeout", "frequency": "Timeout"}
-                        except Exception:
-                            self.current_stats = {"cpu_temp": "Err Conn", "soc_temp": "Err Conn", "frequency": "Err Conn"}
-                        
-                        for _ in range(10): 
-                            if not self.running: break
-                            time.sleep(1)
-                    browser.close()
-            except Exception as e:
-                Logger.log(f"Playwright Error: {e}")
-                time.sleep(60)
-
-    def _monitor_klog(self):
-        while self.running:
-            ip = self.config.get("general", "ps5_ip")
-            port = self.config.get("general", "klog_port")
+                started = time.perf_counter()
+                new_stats = fetcher.fetch(url)
+                STATS_POLL.observe(time.perf_counter() - started)
+                if new_stats is None: new_stats = STATS_NA # Page without values (see AutoStatsFetcher)
+
+                errors = 0
+                self.stats_history.record(new_stats)
+                self.current_stats = Stats.from_dict(new_stats)
+                self._notify()
+
+            except StatsTimeout:
+                errors += 1
+                STATS_ERRORS["timeout"].inc()
+                self.current_stats = STATS_TIMEOUT
+            except Exception:
+                errors += 1
+                STATS_ERRORS["connection"].inc()
+                self.current_stats = STATS_ERR_CONN
+            
+            self.stats_wakeup.wait(self._next_stats_delay(errors))
+            self.stats_wakeup.clear()
+
+        if fetcher:
+            Logger.log(f"Stats backend {fetcher.get_stats()}")
+            fetcher.close()
+        self.stats_fetcher = None
+
+    def _monitor_klog(self, generation):
+        # A restarted core gets a new reader: this one exits at its next check
+        current = lambda: self.running and generation == self.klog_generation
+        while current():
+            if self.klog_address:
+                ip, port = self.klog_address
+            else:
+                ip = self.config.get("general", "ps5_ip")
+                port = self.config.get("general", "klog_port")
             
             if not ip:
                 time.sleep(2)
                 continue
             
+            framer = None
             try:
                 s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 s.settimeout(20)
                 s.connect((ip, port))
+                if not current(): break
                 Logger.log(f"Connected to KLOG at {ip}:{port}")
+                if self.first_connect is None:
+                    self.first_connect = time.perf_counter() - STARTED_AT
+                    Logger.log(f"Startup: first KLOG connection {self.first_connect * 1000:.0f} ms after launch")
                 
                 if not self.current_title_id:
                     self._update_state("NPXS40002")
                 
-                buffer = ""
+                # One framer per connection: no partial line carries over from another reader
+                framer = LineFramer()
+                if self.klog_recorder: framer.tap = self.klog_recorder.write
+                self.klog_framer = framer
                 last_packet = time.time()
                 
-                while self.running:
+                while current():
                     try:
-                        data = s.recv(4096).decode("utf-8", errors="ignore")
-                        if not data: break
-                        buffer += data
+                        lines = framer.recv(s)
+                        if lines is None: break
                         last_packet = time.time()
 
-                        while "\n" in buffer:
-                            line, buffer = buffer.split("\n", 1)
-                            self._process_log_line(line)
+                        for line in lines:
+                            if not current(): break
+                            self._process_log_line(line, framer)
                         
                         if time.time() - last_packet > 120 and self.current_title_id:
                             self.current_title_id = None
@@ -145,60 +285,35 @@ class PS5Core:
                     except socket.timeout:
                         continue
             except Exception as e:
+                if not current(): break
                 self._notify("Offline", None)
                 self.current_title_id = None
                 time.sleep(10)
             finally:
                 try: s.close()
                 except: pass
-
-    def _process_log_line(self, line):
-        new_id = None
-
-        proh_match = PROHIBITION_PATTERN.search(line)
-        if proh_match:
-            new_id = proh_match.group(1)
-
-        if not new_id:
-            scene_match = SCENE_PATTERN.search(line)
-            if scene_match:
-                source = scene_match.group(1)
-                destination = scene_match.group(2)
-                
-                # Ignore internal overlay transitions
-                if "FocusCapture" in destination or "ReactModalScene" in destination:
-                    return 
-
-                if "id_debug_settings" in destination:
-                    new_id = "DEBUG_SETTINGS"
-                else:
-                    id_match = ID_EXTRACTOR.search(destination)
-                    if id_match: new_id = id_match.group(1)
-
-                if not new_id and ("AppScreen" in destination or "ApplicationScreenScene" in destination):
-                    id_match_src = ID_EXTRACTOR.search(source)
-                    if id_match_src: new_id = id_match_src.group(1)
-
-        if not new_id:
-            if "Unload" in line: return
-            
-            id_match = ID_EXTRACTOR.search(line)
-            if id_match:
-                found = id_match.group(1)
-                if found in IGNORED_IDS: return 
-                if found.startswith("NPXS") or found.startswith("CUSA") or found.startswith("PPSA"):
-                     if found != self.current_title_id:
-                         new_id = found
-            
-            if DEBUG_PATTERN.search(line):
-                new_id = "DEBUG_SETTINGS"
-
-        if new_id and new_id != self.current_title_id:
+                if framer and framer.bytes_total:
+                    bps, lps = framer.throughput()
+                    Logger.log(f"KLOG session: {framer.lines_total} lines "
+                               f"({bps / 1024:.1f} KB/s, {lps:.0f} lines/s, {framer.lines_dropped} dropped)")
+
+    def _process_log_line(self, line, framer=None):
+        framer = framer or self.klog_framer
+        match = classify_line(line)
+        if not match: return
+        KLOG_MATCHES[match.kind].inc()
+
+        new_id = match.title_id
+        if new_id != self.current_title_id:
             if new_id in IGNORED_IDS: return
+            TRANSITIONS.inc()
+            trace = TRACER.start(new_id, framer.last_recv_at, framer.last_framed_at)
             Logger.log(f"Transition detected: {new_id}")
-            self._update_state(new_id)
+            self._update_state(new_id, trace)
 
-    def _update_state(self, title_id):
+    def _update_state(self, title_id, trace=None):
+        TRACER.mark(trace, "update_state")
+        self.trace = trace
         self.current_title_id = title_id
         
         is_system = title_id.startswith("NPXS") or title_id == "DEBUG_SETTINGS" or title_id == "ITEM00001"
@@ -217,83 +332,185 @@ class PS5Core:
                 self.active_game_start_time = timestamp_to_send
         
         # Prepare Info
-        if title_id == "DEBUG_SETTINGS":
-            info = SYSTEM_TITLES["DEBUG_SETTINGS"].copy()
-        elif title_id in SYSTEM_TITLES:
-            info = SYSTEM_TITLES[title_id].copy()
+        info = SYSTEM_TITLES.get(title_id)
+        lookup = False
+        if info is not None:
+            GAME_INFO["system"].inc()
         else:
-            info = self._get_game_info(title_id).copy()
-        
-        info["title_id"] = title_id
-        info["start_timestamp"] = timestamp_to_send 
-        
-        self._notify(status, info)
-
-    def _notify(self, status=None, game_info=None):
-        if status is not None: self.last_status = status
+            info, lookup = self._get_game_info(title_id)
+            if info is None:
+                # Publish right away, the enriched update follows when the lookup finishes
+                info = GameInfo(name=f"Loading ({title_id})", image="ps5", background="")
+
+        self._notify(status, info.replace(title_id=title_id, start_timestamp=timestamp_to_send), trace)
+        # Only once published: a lookup that finishes at once must find its title on screen
+        if lookup: self._resolve_async(title_id)
+
+    def _notify(self, status=None, game_info=None, trace=None):
+        with self.notify_lock:
+            self._notify_locked(status, game_info, trace)
+
+    def _notify_locked(self, status, game_info, trace):
+        if status is not None:
+            if status != self.last_status: self.stats_wakeup.set() # Re-plan the poll rate
+            self.last_status = status
         if game_info is not None: self.last_game_info = game_info
-            
-        full_data = {
-            "status": self.last_status,
-            "game": self.last_game_info,
-            "stats": self.current_stats
-        }
-        self.callback_update(full_data)
+
+        events = self._diff_state()
+        if not events: return # Nothing changed since the last broadcast
+
+        for event in events: CORE_EVENTS[event.kind].inc()
+        if trace:
+            # Sinks find the trace through the versions it produced
+            for event in events: TRACER.bind(trace, event.version)
+            TRACER.mark(trace, "notify")
+        if self.callback_event:
+            for event in events: self.callback_event(event)
+
+        # Sub-objects are immutable too, so the snapshot shares them instead of copying
+        self.state = CoreState(
+            status=self.last_status,
+            game=self.last_game_info,
+            stats=self.published["stats"],
+            version=self.version
+        )
+        self.callback_update(self.state)
+
+    def _diff_state(self):
+        """Builds typed deltas against the last published state (game before status,
+        so status listeners already know the new game)."""
+        published = self.published
+        events = []
+
+        if self.last_game_info != published["game"]:
+            self.version += 1
+            events.append(GameChanged(self.version, self.last_game_info, published["game"]))
+            published["game"] = self.last_game_info
+
+        if self.last_status != published["status"]:
+            self.version += 1
+            events.append(StatusChanged(self.version, self.last_status, published["status"]))
+            published["status"] = self.last_status
+
+        now = time.monotonic()
+        if self._stats_due(now):
+            previous = published["stats"] or {}
+            changed = tuple(k for k, v in self.current_stats.items() if previous.get(k) != v)
+            self.version += 1
+            events.append(StatsChanged(self.version, self.current_stats, changed))
+            published["stats"] = self.current_stats
+            self.stats_published_at = now
+
+        return events
+
+    def _stats_due(self, now):
+        """
+        Filters sensor noise before fan-out: numeric moves smaller than the
+        per-metric deadband are held back, significant ones go out at most
+        every 'min_publish_interval', and held drift is flushed by 'heartbeat'.
+        Text states (N/A, Timeout, Err Conn) are published right away.
+        """
+        current, published = self.current_stats, self.published["stats"]
+        if current == published: return False
+        if published is None: return True
+
+        elapsed = now - self.stats_published_at
+        if elapsed >= float(self.config.get("stats", "heartbeat")): return True
+
+        deadband = self.config.get("stats", "deadband") or {}
+        significant = False
+        for key, value in current.items():
+            new, old = parse_stat(value), parse_stat(published.get(key))
+            if new is None or old is None:
+                if value != published.get(key): return True
+            elif abs(new - old) >= float(deadband.get(key, 0)):
+                significant = True
+        return significant and elapsed >= float(self.config.get("stats", "min_publish_interval"))
 
     def _get_game_info(self, title_id):
-        if title_id in self.game_cache: return self.game_cache[title_id]
+        """
+        Returns (info, lookup) without touching the network: info is None if
+        nothing is known yet, lookup is True if an online fetch should follow.
+        """
+        info = self.overrides.get(title_id)
+        if info is not None:
+            GAME_INFO["override"].inc()
+            return GameInfo.from_dict(info), False
+
+        info = self.game_cache.get(title_id)
+        if info is not None:
+            GAME_INFO["cache"].inc()
+            # Serve the cached entry, refresh it in the background once expired
+            stale = self.game_cache.is_stale(title_id) and self.game_cache.retry_due(title_id)
+            return GameInfo.from_dict(info), stale
         
         if title_id.startswith("NPXS"):
-            return {"name": "System App", "image": "ps5", "background": ""}
-
-        data = self._fetch_online(title_id)
+            GAME_INFO["system"].inc()
+            return SYSTEM_APP, False
+
+        # Known failure: don't hit the patch sites again before its retry time
+        if not self.game_cache.retry_due(title_id):
+            GAME_INFO["negative"].inc()
+            return self._unknown_info(title_id), False
+
+        GAME_INFO["online"].inc()
+        return None, True
+
+    def _unknown_info(self, title_id):
+        return GameInfo(name=f"Unknown ({title_id})", image="ps5", background="")
+
+    def refresh_title(self, title_id):
+        """Manual refresh hook: forgets a failed lookup and fetches the title again."""
+        if title_id in SYSTEM_TITLES or title_id.startswith("NPXS"): return # Built-in names, nothing to look up
+        self.game_cache.clear_miss(title_id)
+        Logger.log(f"Refreshing metadata for {title_id}")
+        self._resolve_async(title_id)
+
+    def _resolve_async(self, title_id):
+        with self.lookup_lock:
+            if title_id in self.pending_lookups: return # Share the in-flight fetch
+            future = self.metadata_pool.submit(self._resolve_game_info, title_id)
+            self.pending_lookups[title_id] = future
+        future.add_done_callback(lambda f: self._on_game_resolved(title_id, f))
+
+    def _resolve_game_info(self, title_id):
+        started = time.perf_counter()
+        data, reason = self._fetch_online(title_id)
+        METADATA_FETCH.observe(time.perf_counter() - started)
+        METADATA_RESULTS[bool(data)].inc()
         if data:
-            self.game_cache[title_id] = data
-            save_cache(self.game_cache)
+            self.game_cache.put(title_id, data)
             return data
-        
-        return {"name": f"Unknown ({title_id})", "image": "ps5", "background": ""}
 
-    def _fetch_online(self, title_id):
-        ps4_prefixes = ("CUSA", "CUSJ", "CUSK", "CUSC", "CUSH", "CUSE", "PLAS", "PLJM", "PCJS")
-        base_url = "https://orbispatches.com" if title_id.startswith(ps4_prefixes) else "https://prosperopatches.com"
-        url = f"{base_url}/{title_id}"
-
-        headers = {
-            'User-Agent': 'Mozilla/5.0',
-            'Accept-Encoding': 'gzip, deflate'
-        }
-
-        try:
-            with httpx.Client(timeout=10, headers=headers, follow_redirects=True) as client:
-                r = client.get(url)
-                if r.status_code != 200: return None
-
-                soup = BeautifulSoup(r.text, 'html.parser')
-                name = None
-                
-                h1 = soup.select_one("h1.bd-title")
-                if h1: name = h1.get_text(strip=True)
-                
-                if not name: 
-                    t = soup.find('title')
-                    if t and 'Patches' in t.get_text():
-                        name = t.get_text(strip=True).split(' - ')[0]
+        miss = self.game_cache.put_miss(title_id, reason)
+        Logger.log(f"No metadata for {title_id} ({reason}), retry #{miss['failures']} "
+                   f"after {time.strftime('%H:%M', time.localtime(miss['next_retry']))}")
 
-                img_url = "ps5"
-                bg_url = ""
-                
-                icon_div = soup.select_one("div.game-icon.secondary")
-                if icon_div and "style" in icon_div.attrs:
-                    match = re.search(r'url\((?:&quot;|")?(.*?)(?:&quot;|")?\)', icon_div["style"])
-                    if match: 
-                        u = match.group(1)
-                        img_url = base_url + u if u.startswith("/") else u
-                        bg_url = img_url
+        # Failed refresh of an expired entry: keep what we had
+        cached = self.game_cache.get(title_id)
+        if cached is not None: return cached
+        
+        return self._unknown_info(title_id)
 
-                if not name: return None
-                return {"name": name, "image": img_url, "background": bg_url}
+    def _on_game_resolved(self, title_id, future):
+        with self.lookup_lock:
+            self.pending_lookups.pop(title_id, None)
 
+        try: data = future.result()
         except Exception as e:
-            Logger.log(f"Scraping error {title_id}: {e}")
-            return None
\ No newline at end of file
+            Logger.log(f"Metadata error {title_id}: {e}")
+            return
+
+        # Checked under the publish lock: a title change can't slip in before the enriched update
+        with self.notify_lock:
+            # Only enrich if the console is still on that title
+            if self.current_title_id != title_id or self.last_game_info.get("title_id") != title_id:
+                return
+
+            trace = self.trace if self.trace and self.trace.title_id == title_id else None
+            TRACER.mark(trace, "metadata")
+            start = self.last_game_info.get("start_timestamp")
+            self._notify_locked(None, GameInfo.from_dict(data, title_id=title_id, start_timestamp=start), trace)
+
+    def _fetch_online(self, title_id):
+        return self.metadata.lookup(title_id)
@@ -1,98 +1,217 @@
-from pypresence import Presence
 import time
 import threading
 from .utils import ConfigManager, Logger
+from . import metrics
+from .tracing import TRACER
+
+# === METRICS ===
+DISCORD_UPDATES = metrics.counter("ps5_discord_updates_total", "Presence updates sent to Discord")
+DISCORD_FAILURES = metrics.counter("ps5_discord_update_failures_total", "Presence updates that failed")
+DISCORD_SKIPPED = metrics.counter("ps5_discord_skipped_total", "States not sent because the presence was unchanged")
+DISCORD_CONNECT_FAILURES = metrics.counter("ps5_discord_connect_failures_total", "Failed RPC connection attempts")
+DISCORD_RATE_WAITS = metrics.counter("ps5_discord_rate_limited_total", "Sends delayed by the presence rate limit")
+DISCORD_SEND = metrics.histogram("ps5_discord_send_seconds", "Duration of one presence update call")
+
+class TokenBucket:
+    """Allows 'rate' actions per 'per' seconds, with bursts up to 'rate'."""
+    def __init__(self, rate=5, per=20):
+        self.capacity = rate
+        self.tokens = float(rate)
+        self.fill_rate = rate / per
+        self.stamp = time.monotonic()
+
+    def delay(self):
+        """Seconds until a token is available (0 if one is ready now)."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.stamp) * self.fill_rate)
+        self.stamp = now
+        if self.tokens >= 1: return 0
+        return (1 - self.tokens) / self.fill_rate
+
+    def take(self):
+        self.tokens -= 1
 
 class DiscordHandler:
+    """
+    Discord Rich Presence sink.
+    A single long-lived worker keeps only the newest pending state, sends it
+    within Discord's presence rate limit (5 updates / 20 s) and reconnects
+    with backoff in the background. Intermediate states of a burst are
+    skipped, the final one is always sent.
+    """
+    RECONNECT_MIN = 5
+    RECONNECT_MAX = 120
+
     def __init__(self):
         self.config = ConfigManager()
         self.rpc = None
         self.last_game_id = None
         self.last_timestamp = None
-        self.lock = threading.Lock() # Prevents overlapping updates
+        self.last_name = None
+        self.lock = threading.Lock() # Guards the RPC connection
+
+        self.cond = threading.Condition()
+        self.pending = None
+        self.latest = None
+        self.disconnect_requested = False
+        self.disconnected = threading.Event()
+        self.worker = None
+        self.bucket = TokenBucket(5, 20)
+        self.reconnect_delay = self.RECONNECT_MIN
+        self.next_connect = 0
 
     def connect(self):
+        """Starts the worker; the connection itself is made in the background."""
         if not self.config.get("discord", "enabled"): return
-        client_id = self.config.get("discord", "client_id")
-        
-        if not client_id:
+        if not self.config.get("discord", "client_id"):
             Logger.log("Discord Client ID not configured.")
             return
+        self._ensure_worker()
+        with self.cond:
+            self.next_connect = 0
+            # Show the current state right away instead of waiting for the next change
+            if self.pending is None: self.pending = self.latest
+            self.cond.notify()
+
+    def disconnect(self, timeout=2):
+        """Clears the presence and closes RPC on the worker thread."""
+        if not self.worker:
+            return
+        with self.cond:
+            self.pending = None
+            self.disconnected.clear()
+            self.disconnect_requested = True
+            self.cond.notify()
+        self.disconnected.wait(timeout)
+
+    def update(self, data):
+        """Replaces the pending state; never blocks the caller."""
+        self._ensure_worker()
+        with self.cond:
+            self.pending = self.latest = data
+            self.cond.notify()
+
+    def _ensure_worker(self):
+        with self.cond:
+            if self.worker: return
+            self.worker = threading.Thread(target=self._worker, name="discord", daemon=True)
+            self.worker.start()
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while not self.pending and not self.disconnect_requested:
+                    self.cond.wait()
+
+                if self.disconnect_requested:
+                    self.disconnect_requested = False
+                    self._close(clear=True)
+                    self.disconnected.set()
+                    continue
+
+                if not self.config.get("discord", "enabled"):
+                    self.pending = None
+                    if self.rpc: self._close(clear=True)
+                    continue
+
+                # Nothing new to show: drop without spending a token
+                data = self.pending
+                if not self._has_changed(data):
+                    self.pending = None
+                    DISCORD_SKIPPED.inc()
+                    continue
+
+                wait = max(self.next_connect - time.monotonic(), 0) if not self.rpc else self.bucket.delay()
+                if wait > 0:
+                    if self.rpc: DISCORD_RATE_WAITS.inc()
+                    # Newer states replace 'pending' meanwhile
+                    self.cond.wait(wait)
+                    continue
+
+                self.pending = None
+
+            if not self.rpc and not self._open():
+                self._requeue(data)
+                continue
+
+            self.bucket.take()
+            started = time.perf_counter()
+            sent = self._send(data)
+            DISCORD_SEND.observe(time.perf_counter() - started)
+            if sent:
+                DISCORD_UPDATES.inc()
+                TRACER.mark_event(data, "discord_update")
+            else:
+                DISCORD_FAILURES.inc()
+                self._requeue(data)
 
-        try:
-            if not self.rpc:
+    def _requeue(self, data):
+        with self.cond:
+            if self.pending is None: self.pending = data
+
+    def _open(self):
+        client_id = self.config.get("discord", "client_id")
+        if not client_id:
+            self.next_connect = time.monotonic() + self.RECONNECT_MAX
+            return False
+        with self.lock:
+            try:
+                from pypresence import Presence # Only loaded once Discord is actually used
                 self.rpc = Presence(client_id)
                 self.rpc.connect()
                 Logger.log("Discord RPC Connected.")
-        except Exception as e:
-            Logger.log(f"Error connecting to Discord: {e}")
+                self.reconnect_delay = self.RECONNECT_MIN
+                return True
+            except Exception:
+                # Silent retry with backoff to avoid spamming logs if Discord is closed
+                DISCORD_CONNECT_FAILURES.inc()
+                self.rpc = None
+                self.next_connect = time.monotonic() + self.reconnect_delay
+                self.reconnect_delay = min(self.reconnect_delay * 2, self.RECONNECT_MAX)
+                return False
 
-    def disconnect(self):
+    def _close(self, clear=False):
         with self.lock:
             if self.rpc:
-                try: 
-                    self.rpc.clear()
+                try:
+                    if clear: self.rpc.clear()
                     self.rpc.close()
                 except: pass
                 self.rpc = None
-                self.last_game_id = None
                 Logger.log("Discord RPC Disconnected.")
+            self.last_game_id = None
+            self.last_timestamp = None
+            self.last_name = None
 
-    def update(self, data):
-        """
-        Starts the update in a separate thread to avoid 'Event Loop' conflicts
-        with Playwright running in the main Core thread.
-        """
-        threading.Thread(target=self._update_thread, args=(data,), daemon=True).start()
+    def _has_changed(self, data):
+        status = data.get("status")
+        game = data.get("game", {})
+        if status in ["Playing", "Online"] and game:
+            # Name changes when background metadata resolves a "Loading" placeholder
+            return not (self.last_game_id == game.get("title_id")
+                        and self.last_timestamp == game.get("start_timestamp")
+                        and self.last_name == game.get("name"))
+        if status in ["Idle", "Offline"]:
+            return self.last_game_id is not None
+        return False
 
-    def _update_thread(self, data):
-        with self.lock:
-            if not self.config.get("discord", "enabled"):
-                if self.rpc: self.disconnect()
-                return
-
-            # Try to connect if not connected
-            if not self.rpc: 
-                # We call connect directly here (without the lock, as connect handles itself or is simple)
-                # But to be safe, we are already inside the lock.
-                # However, connect() is not calling 'update', so it's fine.
-                try:
-                    client_id = self.config.get("discord", "client_id")
-                    if client_id:
-                        self.rpc = Presence(client_id)
-                        self.rpc.connect()
-                        Logger.log("Discord RPC Connected.")
-                    else:
-                        return
-                except Exception as e:
-                    # Silent fail to avoid spamming logs if Discord is closed
-                    return
-
-            if not self.rpc: return
-
-            status = data.get("status")
-            game = data.get("game", {})
-            title_id = game.get("title_id")
-            
-            # Use the timestamp calculated by Core to preserve session time
-            start_timestamp = game.get("start_timestamp", int(time.time()))
+    def _send(self, data):
+        status = data.get("status")
+        game = data.get("game", {})
+        title_id = game.get("title_id")
 
+        # Use the timestamp calculated by Core to preserve session time
+        start_timestamp = game.get("start_timestamp", int(time.time()))
+
+        with self.lock:
             try:
                 if status in ["Playing", "Online"] and game:
-                    
-                    # Avoid duplicate updates if nothing changed
-                    if self.last_game_id == title_id and self.last_timestamp == start_timestamp:
-                        return
-                    
-                    self.last_game_id = title_id
-                    self.last_timestamp = start_timestamp
-
                     img = game.get("image", "ps5")
                     if not img or not img.startswith("http"): img = "ps5"
 
                     state_text = game.get("name", "Unknown")
                     details_text = "In Main Menu" if status == "Online" else "Playing on PS5"
-                    
+
                     if title_id == "NPXS40008": details_text = "System Settings"
                     if title_id == "DEBUG_SETTINGS": details_text = "Debug / Toolbox"
 
@@ -105,17 +224,22 @@ class DiscordHandler:
                         small_text="PS5",
                         start=start_timestamp
                     )
+                    self.last_game_id = title_id
+                    self.last_timestamp = start_timestamp
+                    self.last_name = game.get("name")
                     Logger.log(f"Discord updated: {state_text}")
 
                 elif status in ["Idle", "Offline"]:
-                    if self.last_game_id is not None:
-                        self.rpc.clear()
-                        self.last_game_id = None
+                    self.rpc.clear()
+                    self.last_game_id = None
+                return True
 
             except Exception as e:
                 Logger.log(f"Error updating Discord: {e}")
-                # If connection is lost, force reconnection next time
+                # Connection lost: reconnect in the background
                 try:
                     self.rpc.close()
                 except: pass
-                self.rpc = None
\ No newline at end of file
+                self.rpc = None
+                self.next_connect = time.monotonic() + self.reconnect_delay
+                return False
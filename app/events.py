@@ -0,0 +1,182 @@
+import threading
+import time
+from collections import deque
+from collections.abc import Mapping
+from .utils import Logger
+from . import metrics
+from .tracing import TRACER
+
+# === TYPED CHANGE EVENTS ===
+class CoreEvent:
+    """Base class of the deltas emitted by PS5Core. 'version' increases with every change."""
+    __slots__ = ("version", "timestamp")
+    kind = "event"
+
+    def __init__(self, version):
+        self.version = version
+        self.timestamp = time.time()
+
+class StatusChanged(CoreEvent):
+    __slots__ = ("status", "previous")
+    kind = "status"
+
+    def __init__(self, version, status, previous):
+        super().__init__(version)
+        self.status = status
+        self.previous = previous
+
+class GameChanged(CoreEvent):
+    __slots__ = ("game", "previous")
+    kind = "game"
+
+    def __init__(self, version, game, previous):
+        super().__init__(version)
+        self.game = game
+        self.previous = previous
+
+class StatsChanged(CoreEvent):
+    __slots__ = ("stats", "changed")
+    kind = "stats"
+
+    def __init__(self, version, stats, changed):
+        super().__init__(version)
+        self.stats = stats
+        self.changed = changed # Keys whose value differs from the previous stats
+
+EVENT_TYPES = {cls.kind: cls for cls in (StatusChanged, GameChanged, StatsChanged)}
+
+# === OVERFLOW POLICIES ===
+DROP_OLDEST = "drop_oldest" # Bounded FIFO, the oldest pending event makes room
+LATEST = "latest"           # Only the newest pending event is kept
+
+class Subscriber:
+    """
+    One sink with its own bounded queue and worker thread.
+    'kinds' selects typed events (StatusChanged, ...); None receives the
+    full {status, game, stats} snapshots.
+    """
+    def __init__(self, name, callback, maxsize=32, policy=DROP_OLDEST, kinds=None):
+        self.name = name
+        self.callback = callback
+        self.kinds = tuple(kinds) if kinds else None
+        self.maxsize = max(1, maxsize)
+        self.policy = policy
+        self.queue = deque()
+        self.cond = threading.Condition()
+        self.running = True
+
+        self.delivered = 0
+        self.dropped = 0
+        self.errors = 0
+        self.last_lag_ms = 0.0
+        self.max_lag_ms = 0.0
+
+        self.handle_time = metrics.histogram("ps5_sink_seconds", "Time spent in a sink callback", sink=name)
+        self.lag_time = metrics.histogram("ps5_sink_lag_seconds", "Time an update waited in a sink queue", sink=name)
+        self.dropped_count = metrics.counter("ps5_sink_dropped_total", "Updates dropped by a sink queue", sink=name)
+        self.error_count = metrics.counter("ps5_sink_errors_total", "Sink callbacks that raised", sink=name)
+        metrics.gauge("ps5_sink_queue_depth", "Updates waiting in a sink queue", fn=lambda: len(self.queue), sink=name)
+        self.trace_stage = f"sink:{name}"
+
+        self.thread = threading.Thread(target=self._worker, name=f"sink-{name}", daemon=True)
+        self.thread.start()
+
+    def accepts(self, event):
+        if self.kinds is None: return isinstance(event, Mapping)
+        return isinstance(event, self.kinds)
+
+    def put(self, event):
+        with self.cond:
+            if self.policy == LATEST:
+                self.dropped += len(self.queue)
+                self.dropped_count.inc(len(self.queue))
+                self.queue.clear()
+            elif len(self.queue) >= self.maxsize:
+                self.queue.popleft()
+                self.dropped += 1
+                self.dropped_count.inc()
+            self.queue.append((time.monotonic(), event))
+            self.cond.notify()
+
+    def stop(self):
+        with self.cond:
+            self.running = False
+            self.queue.clear()
+            self.cond.notify()
+
+    def _worker(self):
+        while True:
+            with self.cond:
+                while self.running and not self.queue:
+                    self.cond.wait()
+                if not self.running: return
+                queued_at, event = self.queue.popleft()
+
+            started = time.monotonic()
+            lag_ms = (started - queued_at) * 1000
+            self.last_lag_ms = lag_ms
+            if lag_ms > self.max_lag_ms: self.max_lag_ms = lag_ms
+            self.lag_time.observe(lag_ms / 1000)
+
+            try:
+                self.callback(event)
+            except Exception as e:
+                self.errors += 1
+                self.error_count.inc()
+                Logger.log(f"Error in {self.name}: {e}")
+            self.delivered += 1
+            self.handle_time.observe(time.monotonic() - started)
+            TRACER.mark_event(event, self.trace_stage)
+
+    def get_metrics(self):
+        return {
+            "depth": len(self.queue),
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "errors": self.errors,
+            "last_lag_ms": round(self.last_lag_ms, 1),
+            "max_lag_ms": round(self.max_lag_ms, 1),
+            "policy": self.policy
+        }
+
+class EventBus:
+    """
+    Fans core updates out to sinks without running them on the publisher's thread.
+    A slow sink only fills (and overflows) its own queue.
+    """
+    def __init__(self):
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, name, callback, maxsize=32, policy=DROP_OLDEST, kinds=None):
+        """Registers a sink; an existing sink with the same name is replaced."""
+        sub = Subscriber(name, callback, maxsize, policy, kinds)
+        with self.lock:
+            old = self.subscribers.get(name)
+            self.subscribers[name] = sub
+        if old: old.stop()
+        return sub
+
+    def unsubscribe(self, name):
+        with self.lock:
+            sub = self.subscribers.pop(name, None)
+        if sub: sub.stop()
+
+    def unsubscribe_prefix(self, prefix):
+        with self.lock:
+            names = [n for n in self.subscribers if n.startswith(prefix)]
+        for name in names: self.unsubscribe(name)
+
+    def publish(self, event):
+        for sub in list(self.subscribers.values()):
+            if sub.accepts(event): sub.put(event)
+
+    def get_metrics(self):
+        """Queue depth, drops and delivery lag per sink."""
+        return {name: sub.get_metrics() for name, sub in list(self.subscribers.items())}
+
+    def stop(self):
+        with self.lock:
+            subs = list(self.subscribers.values())
+            self.subscribers = {}
+        for sub in subs: sub.stop()
@@ -1,10 +1,163 @@
 import json
+import os
+import random
 import threading
 import time
-import paho.mqtt.client as mqtt
-from .utils import ConfigManager, Logger
+from collections import OrderedDict
+from datetime import datetime, timezone
+from .utils import ConfigManager, Logger, BASE_DIR
+from .timeseries import parse_stat
+from . import metrics
+from .tracing import TRACER
+
+# === HOME ASSISTANT ENTITIES ===
+# Discovery mode: one sensor per field, each with its own state topic
+ENTITIES = {
+    "status": {"name": "Status", "icon": "mdi:sony-playstation"},
+    "game": {"name": "Game", "icon": "mdi:gamepad-variant", "attributes": True},
+    "title_id": {"name": "Title ID", "icon": "mdi:identifier"},
+    "cpu_temp": {"name": "CPU Temperature", "device_class": "temperature", "unit_of_measurement": "°C", "state_class": "measurement"},
+    "soc_temp": {"name": "SoC Temperature", "device_class": "temperature", "unit_of_measurement": "°C", "state_class": "measurement"},
+    "frequency": {"name": "CPU Frequency", "device_class": "frequency", "unit_of_measurement": "MHz", "state_class": "measurement"},
+    "session_start": {"name": "Session Start", "device_class": "timestamp", "icon": "mdi:clock-start"}
+}
+
+# === METRICS ===
+MQTT_PUBLISHED = metrics.counter("ps5_mqtt_published_total", "MQTT messages handed to the client")
+MQTT_FAILURES = metrics.counter("ps5_mqtt_publish_failures_total", "MQTT publishes that failed and were requeued")
+MQTT_DROPPED = metrics.counter("ps5_mqtt_dropped_total", "MQTT messages dropped because the outbox was full")
+MQTT_COALESCED = metrics.counter("ps5_mqtt_coalesced_total", "Queued MQTT messages replaced by a newer payload")
+MQTT_RECONNECTS = metrics.counter("ps5_mqtt_reconnects_total", "Successful reconnections to the broker")
+MQTT_LATENCY = metrics.histogram("ps5_mqtt_queue_seconds", "Time from queueing to publishing an MQTT message")
+
+class Outbox:
+    """
+    Bounded queue of outgoing MQTT messages, coalesced per topic: all our
+    topics are retained states, so only the newest payload of each matters.
+    When full, the oldest topic is dropped. Optionally mirrored to a JSON
+    spool file so pending messages survive a restart during an outage.
+    """
+    def __init__(self, maxsize=500, spool_path=None):
+        self.maxsize = max(1, maxsize)
+        self.spool_path = spool_path
+        self.messages = OrderedDict() # topic -> (payload, retain, queued_at)
+        self.cond = threading.Condition()
+        self.dirty = False
+
+        self.enqueued = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.sent = 0
+        self.last_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+        self.total_latency_ms = 0.0
+
+        self._load_spool()
+
+    def __len__(self):
+        return len(self.messages)
+
+    def put(self, topic, payload, retain=True, front=False):
+        with self.cond:
+            if topic in self.messages:
+                del self.messages[topic]
+                self.coalesced += 1
+                MQTT_COALESCED.inc()
+            elif len(self.messages) >= self.maxsize:
+                self.messages.popitem(last=False)
+                self.dropped += 1
+                MQTT_DROPPED.inc()
+            self.messages[topic] = (payload, retain, time.time())
+            if front: self.messages.move_to_end(topic, last=False)
+            self.enqueued += 1
+            self.dirty = True
+            self.cond.notify()
+
+    def take(self, count, timeout):
+        """Waits up to 'timeout' for messages, then removes up to 'count' of them, oldest first."""
+        with self.cond:
+            if not self.messages: self.cond.wait(timeout)
+            batch = []
+            while self.messages and len(batch) < count:
+                topic, (payload, retain, queued_at) = self.messages.popitem(last=False)
+                batch.append((topic, payload, retain, queued_at))
+            if batch: self.dirty = True
+            return batch
+
+    def requeue(self, batch):
+        """Puts unsent messages back in front, unless a newer payload for the topic arrived meanwhile."""
+        with self.cond:
+            for topic, payload, retain, queued_at in reversed(batch):
+                if topic in self.messages: continue
+                if len(self.messages) >= self.maxsize:
+                    self.dropped += 1
+                    MQTT_DROPPED.inc()
+                    continue
+                self.messages[topic] = (payload, retain, queued_at)
+                self.messages.move_to_end(topic, last=False)
+            self.dirty = True
+
+    def mark_sent(self, queued_at):
+        latency = max(time.time() - queued_at, 0) * 1000
+        self.sent += 1
+        MQTT_PUBLISHED.inc()
+        MQTT_LATENCY.observe(latency / 1000)
+        self.last_latency_ms = latency
+        self.total_latency_ms += latency
+        if latency > self.max_latency_ms: self.max_latency_ms = latency
+
+    def wake(self):
+        with self.cond:
+            self.cond.notify_all()
+
+    def save_spool(self):
+        """Writes pending messages to the spool (temp file + atomic rename); removes it once empty."""
+        if not self.spool_path or not self.dirty: return
+        with self.cond:
+            items = [[topic, payload, retain, queued_at] for topic, (payload, retain, queued_at) in self.messages.items()]
+            self.dirty = False
+        try:
+            if not items:
+                if os.path.exists(self.spool_path): os.remove(self.spool_path)
+                return
+            tmp_path = self.spool_path + ".tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(items, f)
+            os.replace(tmp_path, self.spool_path)
+        except Exception as e:
+            Logger.log(f"HAOS: Spool write error: {e}")
+
+    def _load_spool(self):
+        if not self.spool_path or not os.path.exists(self.spool_path): return
+        try:
+            with open(self.spool_path, "r", encoding="utf-8") as f:
+                items = json.load(f)
+            for topic, payload, retain, queued_at in items[-self.maxsize:]:
+                self.messages[topic] = (payload, retain, queued_at)
+            if self.messages: Logger.log(f"HAOS: {len(self.messages)} messages restored from spool.")
+        except Exception as e:
+            Logger.log(f"HAOS: Spool read error: {e}")
+
+    def get_metrics(self):
+        avg = self.total_latency_ms / self.sent if self.sent else 0.0
+        return {
+            "depth": len(self.messages),
+            "enqueued": self.enqueued,
+            "coalesced": self.coalesced,
+            "dropped": self.dropped,
+            "sent": self.sent,
+            "last_latency_ms": round(self.last_latency_ms, 1),
+            "avg_latency_ms": round(avg, 1),
+            "max_latency_ms": round(self.max_latency_ms, 1)
+        }
 
 class HAOSHandler:
+    """
+    MQTT sink for Home Assistant.
+    Every publish goes through a bounded outbox drained in batches by the
+    connection thread, so nothing is lost while the broker is unreachable
+    (beyond the queue bound) and reconnects back off exponentially.
+    """
     def __init__(self):
         self.config = ConfigManager()
         self.client = None
@@ -12,6 +165,26 @@ class HAOSHandler:
         self.running = False
         self.last_payload = None
 
+        # === OUTBOUND QUEUE ===
+        spool_path = None
+        if self.config.get("haos", "spool"):
+            spool_path = self.config.get("haos", "spool_file")
+            if not os.path.isabs(spool_path): spool_path = os.path.join(BASE_DIR, spool_path)
+        self.outbox = Outbox(int(self.config.get("haos", "queue_size")), spool_path)
+        self.online = threading.Event()
+        self.reconnect_attempts = 0
+        self.reconnects = 0
+        self.disconnected_since = None
+        self.queued_version = None # State version whose messages are waiting (latency tracing)
+        metrics.gauge("ps5_mqtt_queue_depth", "Messages waiting in the MQTT outbox", fn=lambda: len(self.outbox))
+        metrics.gauge("ps5_mqtt_connected", "1 while connected to the broker", fn=lambda: self.connected)
+
+        # Discovery mode state: latest value per field and what the broker has
+        self.discovery = False
+        self.fields = {}
+        self.published_fields = {}
+        self.fields_lock = threading.Lock()
+
     def connect(self):
         """Starts MQTT connection in a separate thread."""
         if not self.config.get("haos", "enabled"):
@@ -25,6 +198,7 @@ class HAOSHandler:
         if self.client:
             return  # Already connected
 
+        self.discovery = bool(self.config.get("haos", "discovery"))
         self.running = True
         threading.Thread(target=self._run_mqtt, daemon=True).start()
 
@@ -32,6 +206,10 @@ class HAOSHandler:
         """Cleanly disconnects MQTT."""
         self.running = False
         if self.client:
+            # Clean disconnect: the broker does not fire the will, so say it ourselves
+            if self.discovery and self.connected:
+                try: self.client.publish(self._availability_topic(), "offline", retain=True).wait_for_publish(2)
+                except: pass
             try:
                 self.client.loop_stop()
                 self.client.disconnect()
@@ -39,64 +217,143 @@ class HAOSHandler:
                 pass
             self.client = None
             self.connected = False
-            Logger.log("HAOS: Disconnected.")
+            self.online.clear()
+            self.outbox.wake()
+            Logger.log(f"HAOS: Disconnected. Outbox {self.get_metrics()}")
+        self.outbox.save_spool()
 
     def _run_mqtt(self):
         """Main connection and reconnection loop."""
+        import paho.mqtt.client as mqtt # Only loaded once HAOS is enabled
+
         broker = self.config.get("haos", "mqtt_broker")
         port = int(self.config.get("haos", "mqtt_port") or 1883)
         user = self.config.get("haos", "mqtt_user")
         password = self.config.get("haos", "mqtt_pass")
+        reconnect_min = float(self.config.get("haos", "reconnect_min"))
+        reconnect_max = float(self.config.get("haos", "reconnect_max"))
 
         while self.running:
             try:
                 # Client Setup
-                self.client = mqtt.Client(client_id="PS5_Monitor_PC", protocol=mqtt.MQTTv311)
+                options = {}
+                if hasattr(mqtt, "CallbackAPIVersion"): # paho 2.x
+                    options["callback_api_version"] = mqtt.CallbackAPIVersion.VERSION2
+                self.client = mqtt.Client(client_id="PS5_Monitor_PC", protocol=mqtt.MQTTv311, **options)
                 
                 if user and password:
                     self.client.username_pw_set(user, password)
 
+                if self.discovery:
+                    # Marks every entity unavailable if we drop off without disconnecting
+                    self.client.will_set(self._availability_topic(), "offline", retain=True)
+
                 self.client.on_connect = self._on_connect
                 self.client.on_disconnect = self._on_disconnect
+                # paho's own automatic reconnects (after a connection drop) back off too
+                self.client.reconnect_delay_set(min_delay=int(reconnect_min), max_delay=int(reconnect_max))
 
                 Logger.log(f"HAOS: Connecting to {broker}:{port}...")
                 self.client.connect(broker, port, 60)
                 self.client.loop_start()
 
-                # Keep thread alive
-                while self.running and self.client:
-                    time.sleep(1)
+                # This thread drains the outbox for the lifetime of the client
+                client = self.client
+                while self.running and self.client is client:
+                    if self.online.wait(1):
+                        self._drain(client)
+                    self.outbox.save_spool()
 
             except Exception as e:
                 Logger.log(f"HAOS Error: {e}")
                 self.connected = False
+                self.online.clear()
                 if self.client:
                     self.client.loop_stop()
                     self.client = None
                 
-                # Wait before reconnecting
+                # Wait before reconnecting: exponential backoff with jitter
                 if self.running:
-                    time.sleep(10)
+                    self.outbox.save_spool()
+                    delay = min(reconnect_min * (2 ** self.reconnect_attempts), reconnect_max)
+                    self.reconnect_attempts += 1
+                    time.sleep(delay * random.uniform(0.8, 1.2))
+
+    def _drain(self, client):
+        """Publishes up to one batch; unsent messages go back to the front of the outbox."""
+        import paho.mqtt.client as mqtt
+
+        qos = int(self.config.get("haos", "qos"))
+        batch = self.outbox.take(int(self.config.get("haos", "batch_size")), 1)
 
-    def _on_connect(self, client, userdata, flags, rc):
+        for i, (topic, payload, retain, queued_at) in enumerate(batch):
+            try: rc = client.publish(topic, payload, qos=qos, retain=retain).rc
+            except Exception as e:
+                Logger.log(f"HAOS Publish Error: {e}")
+                rc = None
+            # With QoS > 0, paho keeps messages published while offline and sends them on reconnect
+            if rc == mqtt.MQTT_ERR_SUCCESS or (qos and rc == mqtt.MQTT_ERR_NO_CONN):
+                self.outbox.mark_sent(queued_at)
+            else:
+                MQTT_FAILURES.inc()
+                self.outbox.requeue(batch[i:])
+                return
+
+        # Everything queued so far is out, including the traced state
+        if batch and not len(self.outbox) and self.queued_version is not None:
+            TRACER.mark_version(self.queued_version, "mqtt_publish")
+            self.queued_version = None
+
+    def get_metrics(self):
+        """Outbox depth, drops and queue-to-publish latency, plus connection state."""
+        metrics = self.outbox.get_metrics()
+        metrics.update({
+            "connected": self.connected,
+            "reconnects": self.reconnects,
+            "outage_s": round(time.time() - self.disconnected_since, 1) if self.disconnected_since else 0.0
+        })
+        return metrics
+
+    def _on_connect(self, client, userdata, flags, rc, properties=None):
         if rc == 0:
             self.connected = True
-            Logger.log("HAOS: Connected to Broker!")
+            self.reconnect_attempts = 0
+            if self.disconnected_since:
+                self.reconnects += 1
+                MQTT_RECONNECTS.inc()
+                Logger.log(f"HAOS: Reconnected after {time.time() - self.disconnected_since:.0f}s, "
+                           f"{len(self.outbox)} queued, {self.outbox.dropped} dropped so far.")
+                self.disconnected_since = None
+            else:
+                Logger.log("HAOS: Connected to Broker!")
+            if self.discovery:
+                self._announce()
             # Resend last state upon reconnection
-            if self.last_payload:
+            elif self.last_payload:
                 self._publish(self.last_payload)
+            self.online.set()
         else:
             Logger.log(f"HAOS: Connection failed (Code {rc})")
             self.connected = False
 
-    def _on_disconnect(self, client, userdata, rc):
+    def _on_disconnect(self, client, userdata, *args):
+        # paho 1.x: (rc), paho 2.x: (flags, reason_code, properties)
+        rc = args[1] if len(args) > 1 else args[0]
         self.connected = False
+        self.online.clear()
         if rc != 0:
+            if not self.disconnected_since: self.disconnected_since = time.time()
             Logger.log("HAOS: Connection lost unexpectedly.")
 
     def update(self, data):
         """Receives data from Core and publishes to MQTT."""
-        if not self.config.get("haos", "enabled") or not self.client or not self.connected:
+        if not self.config.get("haos", "enabled"):
+            return
+        self.queued_version = getattr(data, "version", None)
+
+        if self.discovery:
+            try: self._update_entities(data)
+            except Exception as e: Logger.log(f"HAOS Update Error: {e}")
             return
 
         try:
@@ -130,7 +387,87 @@ class HAOSHandler:
         if not topic: return
 
         try:
-            json_str = json.dumps(payload_dict)
-            self.client.publish(topic, json_str, retain=True)
+            self.outbox.put(topic, json.dumps(payload_dict))
         except Exception as e:
-            Logger.log(f"HAOS Publish Error: {e}")
\ No newline at end of file
+            Logger.log(f"HAOS Publish Error: {e}")
+
+    # === MQTT DISCOVERY ===
+    def _base_topic(self):
+        return (self.config.get("haos", "base_topic") or "ps5_monitor").strip("/")
+
+    def _availability_topic(self):
+        return f"{self._base_topic()}/availability"
+
+    def _state_topic(self, key):
+        if key == "game_attributes": return f"{self._base_topic()}/game/attributes"
+        return f"{self._base_topic()}/{key}/state"
+
+    def _announce(self):
+        """Publishes the discovery configs once per connection, then the full current state."""
+        prefix = (self.config.get("haos", "discovery_prefix") or "homeassistant").strip("/")
+        node_id = self._base_topic().replace("/", "_")
+        device = {
+            "identifiers": [node_id],
+            "name": self.config.get("haos", "device_name") or "PS5",
+            "manufacturer": "Sony",
+            "model": "PlayStation 5"
+        }
+
+        with self.fields_lock:
+            try:
+                for key, entity in ENTITIES.items():
+                    config = {k: v for k, v in entity.items() if k != "attributes"}
+                    config.update({
+                        "unique_id": f"{node_id}_{key}",
+                        "state_topic": self._state_topic(key),
+                        "availability_topic": self._availability_topic(),
+                        "device": device
+                    })
+                    if entity.get("attributes"):
+                        config["json_attributes_topic"] = self._state_topic("game_attributes")
+                    self.outbox.put(f"{prefix}/sensor/{node_id}/{key}/config", json.dumps(config), front=True)
+
+                self.outbox.put(self._availability_topic(), "online", front=True)
+
+                # Retained states may be stale after an outage: resend everything once
+                self.published_fields = {}
+                self._publish_fields()
+            except Exception as e:
+                Logger.log(f"HAOS Discovery Error: {e}")
+
+    def _entity_values(self, data):
+        """Flattens a core snapshot into {field: payload string}."""
+        game = data.get("game", {})
+        stats = data.get("stats", {})
+
+        values = {
+            "status": data.get("status", "Offline"),
+            "game": game.get("name", "None"),
+            "title_id": game.get("title_id", "") or "None",
+            "game_attributes": json.dumps({
+                "title_id": game.get("title_id", ""),
+                "image": game.get("image", ""),
+                "background": game.get("background", "")
+            })
+        }
+
+        # Numeric sensors need bare numbers; "None" sets the entity to unknown
+        for key in ("cpu_temp", "soc_temp", "frequency"):
+            number = parse_stat(stats.get(key))
+            values[key] = "None" if number is None else f"{number:g}"
+
+        start = game.get("start_timestamp")
+        values["session_start"] = datetime.fromtimestamp(start, timezone.utc).isoformat() if start else "None"
+        return values
+
+    def _update_entities(self, data):
+        with self.fields_lock:
+            self.fields = self._entity_values(data)
+            self._publish_fields()
+
+    def _publish_fields(self):
+        """Queues only the fields whose value differs from what was last sent."""
+        for key, value in self.fields.items():
+            if self.published_fields.get(key) == value: continue
+            self.outbox.put(self._state_topic(key), value)
+            self.published_fields[key] = value
@@ -0,0 +1,145 @@
+import random
+import threading
+import time
+from urllib.parse import urlsplit
+from .utils import Logger
+from . import metrics
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+class HttpClient:
+    """
+    Long-lived pooled HTTP client shared by metadata lookups.
+    Keeps connections alive between lookups, retries 429/5xx with
+    exponential backoff and tracks latency per upstream host (exported
+as ps5_http_* metrics, labelled by host).
+    httpx is only imported when the first request is made.
+    """
+    def __init__(self, timeout=10, max_connections=10, http2=False, retries=2, backoff=0.5, headers=None):
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.http2 = http2
+        self.headers = headers
+        self.retries = retries
+        self.backoff = backoff
+        self._client = None
+        self.client_lock = threading.Lock()
+
+        self.host_stats = {}
+        self.host_latency = {} # host -> latency histogram
+        self.stats_lock = threading.Lock()
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self.client_lock:
+                if self._client is None: self._client = self._create_client()
+        return self._client
+
+    def _create_client(self):
+        import httpx
+
+        http2 = self.http2
+        if http2:
+            try:
+                import h2 # noqa: F401 - required by httpx for HTTP/2
+            except ImportError:
+                Logger.log("HTTP/2 requested but 'h2' is not installed, using HTTP/1.1.")
+                http2 = False
+
+        return httpx.Client(
+            timeout=self.timeout,
+            headers=self.headers,
+            follow_redirects=True,
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_connections,
+                keepalive_expiry=60
+            )
+        )
+
+    def get(self, url, **kwargs):
+        """GET with retry on 429/5xx. Returns the last response (may still be an error status)."""
+        return self._request(url, False, **kwargs)
+
+    def stream(self, url, **kwargs):
+        """
+        Like get(), but only the headers are read. The caller iterates the
+        body (iter_bytes/iter_text) and must close() the response.
+        """
+        return self._request(url, True, **kwargs)
+
+    def _request(self, url, stream, **kwargs):
+        host = urlsplit(url).hostname
+        attempt = 0
+
+        while True:
+            started = time.perf_counter()
+            try:
+                request = self.client.build_request("GET", url, **kwargs)
+                r = self.client.send(request, stream=stream)
+            except Exception:
+                self._record(host, time.perf_counter() - started, error=True)
+                raise
+            self._record(host, time.perf_counter() - started, error=r.status_code >= 400)
+
+            if r.status_code not in RETRY_STATUS or attempt >= self.retries:
+                return r
+
+            if stream: r.close()
+            delay = self._retry_delay(r, attempt)
+            attempt += 1
+            with self.stats_lock:
+                self.host_stats[host]["retries"] += 1
+            Logger.log(f"HTTP {r.status_code} from {host}, retry {attempt}/{self.retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def _retry_delay(self, response, attempt):
+        retry_after = response.headers.get("Retry-After")
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), 30.0)
+        # Exponential backoff with jitter
+        return self.backoff * (2 ** attempt) * (0.5 + random.random())
+
+    def _record(self, host, elapsed, error=False):
+        with self.stats_lock:
+            st = self.host_stats.get(host)
+            if st is None:
+                st = self.host_stats[host] = {"requests": 0, "errors": 0, "retries": 0, "total_ms": 0.0, "max_ms": 0.0}
+                self._register(host)
+            self.host_latency[host].observe(elapsed)
+            ms = elapsed * 1000
+            st["requests"] += 1
+            st["total_ms"] += ms
+            if ms > st["max_ms"]: st["max_ms"] = ms
+            if error: st["errors"] += 1
+
+    def _register(self, host):
+        """Exports a new host's counters, read from host_stats at scrape time."""
+        for key, name, help in (
+            ("requests", "ps5_http_requests_total", "Metadata HTTP requests per upstream host"),
+            ("errors", "ps5_http_errors_total", "Metadata HTTP requests that failed or returned 4xx/5xx"),
+            ("retries", "ps5_http_retries_total", "Metadata HTTP requests retried after 429/5xx")
+        ):
+            metrics.counter(name, help, fn=lambda key=key: self.host_stats[host][key], host=host)
+        self.host_latency[host] = metrics.histogram("ps5_http_request_seconds", "Metadata HTTP request latency", host=host)
+
+    def get_stats(self):
+        """Returns per-host counters: requests, errors, retries, avg_ms, max_ms."""
+        with self.stats_lock:
+            return {
+                host: {
+                    "requests": st["requests"],
+                    "errors": st["errors"],
+                    "retries": st["retries"],
+                    "avg_ms": round(st["total_ms"] / st["requests"], 1) if st["requests"] else 0.0,
+                    "max_ms": round(st["max_ms"], 1)
+                }
+                for host, st in self.host_stats.items()
+            }
+
+    def close(self):
+        if self._client is None: return
+        try: self._client.close()
+        except: pass
@@ -0,0 +1,326 @@
+import os
+import re
+import gzip
+import glob
+import socket
+import struct
+import threading
+import time
+from datetime import datetime
+from .utils import Logger
+from . import metrics
+
+# === REGEX PATTERNS ===
+SCENE_PATTERN = re.compile(r"OnFocusActiveSceneChanged\s*\[(.*?)\]\s*->\s*\[(.*?)\]")
+ID_EXTRACTOR = re.compile(r"(?:Render\.|titleId\s*[:=]\s*|title_id\s*=\s*['\"\[]?|SplashScreen\.)([A-Z]{4}[0-9]{5})", re.IGNORECASE)
+DEBUG_PATTERN = re.compile(r"id_debug_settings")
+PROHIBITION_PATTERN = re.compile(r"ProhibitionFlag.*?newFlags\s*=\s*\[.*?,([A-Z]{4}[0-9]{5}),\]")
+
+
+# === IGNORED PROCESSES (Background/Dialogs/Overlays) ===
+IGNORED_IDS = {
+    "NPXS40003", "NPXS40093", "NPXS40094", "NPXS40095", "NPXS40096", 
+    "NPXS40100", "NPXS40109", "NPXS40112"
+}
+
+# === FRAMING LIMITS ===
+RECV_SIZE = 4096
+MAX_LINE_LENGTH = 16384
+
+KLOG_BYTES = metrics.counter("ps5_klog_bytes_total", "Bytes received from the KLOG socket")
+KLOG_LINES = metrics.counter("ps5_klog_lines_total", "KLOG lines framed")
+KLOG_DROPPED = metrics.counter("ps5_klog_lines_dropped_total", "Over-long KLOG lines discarded")
+
+class LineFramer:
+    """
+    Splits the raw KLOG byte stream into text lines.
+    Bytes are received into one reused buffer and only the unterminated
+    tail is kept between reads, so a burst costs linear time.
+    """
+    def __init__(self, max_line=MAX_LINE_LENGTH, recv_size=RECV_SIZE):
+        self.max_line = max_line
+        self.recv_buffer = bytearray(recv_size)
+        self.recv_view = memoryview(self.recv_buffer)
+        self.pending = bytearray()
+        self.tap = None # Optional callable receiving every raw chunk (recorder)
+        self.skipping = False # Discarding an over-long line until its newline
+
+        self.bytes_total = 0
+        self.lines_total = 0
+        self.lines_dropped = 0
+        self.started_at = time.monotonic()
+        self.last_recv_at = None   # perf_counter() of the last socket read (latency tracing)
+        self.last_framed_at = None # ... and of the end of its framing
+
+    def reset(self):
+        """Clears pending data and counters (new connection)."""
+        self.pending.clear()
+        self.skipping = False
+        self.bytes_total = 0
+        self.lines_total = 0
+        self.lines_dropped = 0
+        self.started_at = time.monotonic()
+
+    def recv(self, sock):
+        """Reads from the socket into the reused buffer. Returns decoded lines, or None on EOF."""
+        n = sock.recv_into(self.recv_buffer)
+        if not n: return None
+        self.last_recv_at = time.perf_counter()
+        chunk = self.recv_view[:n]
+        if self.tap: self.tap(chunk)
+        lines = self.feed(chunk)
+        self.last_framed_at = time.perf_counter()
+        return lines
+
+    def feed(self, data):
+        """Appends raw bytes and returns every complete line as str."""
+        self.bytes_total += len(data)
+        KLOG_BYTES.inc(len(data))
+        pending = self.pending
+        scan_from = len(pending)
+        pending += data
+
+        # Only the newly appended bytes can hold the last terminator
+        end = pending.rfind(b"\n", scan_from)
+        if end < 0:
+            # Unterminated tail grew past the limit: drop it and skip to the next newline
+            if len(pending) > self.max_line:
+                if not self.skipping:
+                    self.lines_dropped += 1
+                    KLOG_DROPPED.inc()
+                self.skipping = True
+                pending.clear()
+            return []
+
+        # '\n' never appears inside a multi-byte UTF-8 sequence, so decoding
+        # the whole terminated region keeps characters intact across reads.
+        with memoryview(pending) as view:
+            text = str(view[:end], "utf-8", "ignore")
+        del pending[:end + 1]
+
+        lines = text.split("\n")
+        if self.skipping:
+            self.skipping = False
+            lines.pop(0)
+        if len(text) > self.max_line:
+            kept = [line for line in lines if len(line) <= self.max_line]
+            self.lines_dropped += len(lines) - len(kept)
+            KLOG_DROPPED.inc(len(lines) - len(kept))
+            lines = kept
+
+        self.lines_total += len(lines)
+        KLOG_LINES.inc(len(lines))
+        return lines
+
+    def throughput(self):
+        """Returns (bytes/sec, lines/sec) since the last reset."""
+        elapsed = max(time.monotonic() - self.started_at, 1e-6)
+        return self.bytes_total / elapsed, self.lines_total / elapsed
+
+class KlogMatch:
+    """Typed result of classifying a KLOG line."""
+    __slots__ = ("kind", "title_id")
+
+    PROHIBITION = "prohibition"
+    SCENE = "scene"
+    TITLE = "title"
+    DEBUG = "debug"
+
+    def __init__(self, kind, title_id):
+        self.kind = kind
+        self.title_id = title_id
+
+    def __repr__(self):
+        return f"KlogMatch({self.kind}, {self.title_id})"
+
+def classify_line(line):
+    """
+    Returns the KlogMatch announced by a KLOG line, or None for noise.
+    Lines without any trigger literal are rejected after a single scan;
+    the rest follow the original precedence (prohibition > scene > bare id).
+    """
+    # Literal prefilter: every line that can produce a transition contains one
+    # of these (lowercased because ID_EXTRACTOR is case-insensitive). Plain
+    # substring checks are far cheaper than a regex alternation here.
+    low = line.lower()
+    if not ("title" in low or "render." in low or "splashscreen." in low
+            or "onfocusactivescenechanged" in low or "prohibitionflag" in low
+            or "id_debug_settings" in low):
+        return None
+
+    proh_match = PROHIBITION_PATTERN.search(line)
+    if proh_match:
+        return KlogMatch(KlogMatch.PROHIBITION, proh_match.group(1))
+
+    scene_match = SCENE_PATTERN.search(line)
+    if scene_match:
+        source, destination = scene_match.groups()
+
+        # Ignore internal overlay transitions
+        if "FocusCapture" in destination or "ReactModalScene" in destination:
+            return None
+
+        if "id_debug_settings" in destination:
+            return KlogMatch(KlogMatch.DEBUG, "DEBUG_SETTINGS")
+
+        id_match = ID_EXTRACTOR.search(destination)
+        if not id_match and ("AppScreen" in destination or "ApplicationScreenScene" in destination):
+            id_match = ID_EXTRACTOR.search(source)
+        if id_match:
+            return KlogMatch(KlogMatch.SCENE, id_match.group(1))
+
+    if "Unload" in line: return None
+
+    found = None
+    id_match = ID_EXTRACTOR.search(line)
+    if id_match:
+        found = id_match.group(1)
+        if found in IGNORED_IDS: return None
+
+    if DEBUG_PATTERN.search(line):
+        return KlogMatch(KlogMatch.DEBUG, "DEBUG_SETTINGS")
+
+    if found and found.startswith(("NPXS", "CUSA", "PPSA")):
+        return KlogMatch(KlogMatch.TITLE, found)
+    return None
+
+# === RECORD / REPLAY ===
+# Recordings are gzip files: a magic header followed by records of
+# (wall-clock timestamp, length) + raw bytes exactly as received.
+RECORD_MAGIC = b"PS5KLOG1"
+RECORD_HEADER = struct.Struct("<dI")
+
+class KlogRecorder:
+    """Writes the raw KLOG stream to compressed, size-rotated recordings."""
+    def __init__(self, directory, max_bytes=50 * 1024 * 1024, keep=10):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.keep = keep
+        self.file = None
+        self.path = None
+        self.lock = threading.Lock()
+
+    def write(self, data):
+        with self.lock:
+            try:
+                if not self.file: self._open()
+                self.file.write(RECORD_HEADER.pack(time.time(), len(data)))
+                self.file.write(data)
+                # Compressed size on disk drives the rotation
+                if self.file.fileobj.tell() >= self.max_bytes:
+                    self._close()
+            except Exception as e:
+                Logger.log(f"KLOG recorder error: {e}")
+                self._close()
+
+    def close(self):
+        with self.lock:
+            self._close()
+
+    def _open(self):
+        os.makedirs(self.directory, exist_ok=True)
+        stamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")
+        self.path = os.path.join(self.directory, f"klog_{stamp}.bin.gz")
+        self.file = gzip.open(self.path, "wb", compresslevel=6)
+        self.file.write(RECORD_MAGIC)
+        Logger.log(f"Recording KLOG to {self.path}")
+        self._prune()
+
+    def _close(self):
+        if self.file:
+            try: self.file.close()
+            except: pass
+            self.file = None
+
+    def _prune(self):
+        files = sorted(glob.glob(os.path.join(self.directory, "klog_*.bin.gz")))
+        for old in files[:-self.keep] if self.keep else []:
+            try: os.remove(old)
+            except: pass
+
+def iter_recording(path):
+    """Yields (timestamp, bytes) records from a recording file or a directory of them."""
+    if os.path.isdir(path):
+        files = sorted(glob.glob(os.path.join(path, "klog_*.bin.gz")))
+    else:
+        files = [path]
+
+    for file_path in files:
+        with gzip.open(file_path, "rb") as f:
+            if f.read(len(RECORD_MAGIC)) != RECORD_MAGIC:
+                Logger.log(f"Not a KLOG recording: {file_path}")
+                continue
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size: break # EOF or truncated by a crash
+                timestamp, length = RECORD_HEADER.unpack(header)
+                data = f.read(length)
+                if len(data) < length: break
+                yield timestamp, data
+
+class KlogReplayServer:
+    """
+    Local TCP stand-in for the console KLOG server.
+    Serves a recording to each client that connects, keeping the original
+    pacing divided by 'speed' (speed <= 0 sends as fast as possible).
+    """
+    def __init__(self, path, port, speed=1.0, host="127.0.0.1", loop=False):
+        self.path = path
+        self.address = (host, port)
+        self.speed = speed
+        self.loop = loop
+        self.running = False
+        self.server = None
+
+    def start(self):
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(self.address)
+        self.server.listen(1)
+        self.running = True
+        threading.Thread(target=self._serve, daemon=True).start()
+        pace = f"{self.speed}x" if self.speed > 0 else "max speed"
+        Logger.log(f"KLOG replay of {self.path} on {self.address[0]}:{self.address[1]} ({pace})")
+
+    def stop(self):
+        self.running = False
+        if self.server:
+            try: self.server.close()
+            except: pass
+            self.server = None
+
+    def _serve(self):
+        while self.running:
+            try:
+                conn, _ = self.server.accept()
+            except OSError:
+                break
+            with conn:
+                try:
+                    self._stream(conn)
+                except OSError:
+                    pass # Client went away
+
+    def _stream(self, conn):
+        while self.running:
+            sent = 0
+            first_ts = None
+            started = time.monotonic()
+
+            for timestamp, data in iter_recording(self.path):
+                if not self.running: return
+                if first_ts is None: first_ts = timestamp
+
+                if self.speed > 0:
+                    delay = (timestamp - first_ts) / self.speed - (time.monotonic() - started)
+                    if delay > 0: time.sleep(delay)
+
+                conn.sendall(data)
+                sent += len(data)
+
+            Logger.log(f"KLOG replay finished ({sent} bytes in {time.monotonic() - started:.1f}s)")
+            if not self.loop:
+                # Keep the connection open like an idle console, otherwise the
+                # reader would reconnect and replay everything again
+                while self.running: time.sleep(0.5)
+                return
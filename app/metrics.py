@@ -0,0 +1,155 @@
+import threading
+from bisect import bisect_left
+from .utils import Logger
+
+# Seconds; covers a sub-millisecond fan-out up to a slow metadata lookup
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# Updates are lock-free plain attribute writes: cheap enough for the per-line
+# KLOG path, at the cost of a rare lost increment under heavy contention.
+class Counter:
+    __slots__ = ("value", "fn")
+    kind = "counter"
+
+    def __init__(self):
+        self.value = 0
+        self.fn = None # Optional callable returning the value (reuses existing counters)
+
+    def inc(self, amount=1):
+        self.value += amount
+
+    def samples(self, name, labels):
+        yield name, labels, self.fn() if self.fn else self.value
+
+class Gauge(Counter):
+    __slots__ = ()
+    kind = "gauge"
+
+    def set(self, value):
+        self.value = value
+
+    def dec(self, amount=1):
+        self.value -= amount
+
+class Histogram:
+    """Fixed buckets; counts are stored per bucket and made cumulative on export."""
+    __slots__ = ("bounds", "counts", "sum", "count")
+    kind = "histogram"
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.bounds = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.bounds) + 1) # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        total = 0
+        for bound, count in zip(self.bounds + (float("inf"),), self.counts):
+            total += count
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            yield f"{name}_bucket", labels + (("le", le),), total
+        yield f"{name}_sum", labels, self.sum
+        yield f"{name}_count", labels, self.count
+
+class Registry:
+    """Named metrics, one instance per (name, labels) pair."""
+    def __init__(self):
+        self.metrics = {}   # (name, labels) -> metric
+        self.families = {}  # name -> (kind, help)
+        self.lock = threading.Lock()
+
+    def _get(self, cls, name, help, labels, *args):
+        key = (name, tuple(sorted(labels.items())))
+        metric = self.metrics.get(key)
+        if metric is None:
+            with self.lock:
+                metric = self.metrics.get(key)
+                if metric is None:
+                    metric = self.metrics[key] = cls(*args)
+                    self.families.setdefault(name, (cls.kind, help))
+        return metric
+
+    def counter(self, name, help="", fn=None, **labels):
+        metric = self._get(Counter, name, help, labels)
+        if fn: metric.fn = fn
+        return metric
+
+    def gauge(self, name, help="", fn=None, **labels):
+        metric = self._get(Gauge, name, help, labels)
+        if fn: metric.fn = fn
+        return metric
+
+    def histogram(self, name, help="", buckets=DEFAULT_BUCKETS, **labels):
+        return self._get(Histogram, name, help, labels, buckets)
+
+    def render(self):
+        """Prometheus text exposition format (version 0.0.4)."""
+        with self.lock:
+            items = sorted(self.metrics.items(), key=lambda item: item[0])
+        lines = []
+        current = None
+        for (name, labels), metric in items:
+            if name != current:
+                current = name
+                kind, help = self.families[name]
+                if help: lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+            try:
+                for sample, sample_labels, value in metric.samples(name, labels):
+                    lines.append(f"{sample}{_format_labels(sample_labels)} {_format_value(value)}")
+            except Exception as e:
+                Logger.log(f"Metrics: {name} failed ({e})")
+        return "\n".join(lines) + "\n"
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(labels):
+    if not labels: return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in labels) + "}"
+
+def _format_value(value):
+    if isinstance(value, bool): return "1" if value else "0"
+    if isinstance(value, int): return str(value)
+    return repr(float(value))
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+# === EXPOSITION ===
+def serve(host="127.0.0.1", port=9108, registry=REGISTRY):
+    """Starts the /metrics endpoint on a background thread; returns the server or None."""
+    # http.server is slow to import, so it is only loaded when the endpoint is enabled
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split('?', 1)[0] != '/metrics':
+                self.send_error(404)
+                return
+            body = self.server.registry.render().encode('utf-8')
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            return
+
+    try:
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+    except Exception as e:
+        Logger.log(f"Metrics endpoint failed to start: {e}")
+        return None
+    server.registry = registry
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    Logger.log(f"Metrics at http://{host}:{port}/metrics")
+    return server
@@ -1,100 +1,306 @@
 import os
+import glob
+import hashlib
 import importlib
+import importlib.metadata
 import importlib.util
+import json
+import re
 import sys
 import subprocess
 import threading
-from app.utils import Logger
+import time
+from concurrent.futures import ThreadPoolExecutor
+from app.utils import Logger, PLUGIN_CACHE_FILE
+from app import metrics
+
+LOAD_WORKERS = 4 # Plugin imports running at once
+REQUIREMENT_NAME = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)") # "requests[socks]>=2; ..." -> "requests"
+
+# === METRICS ===
+PLUGIN_LOAD = metrics.histogram("ps5_plugin_load_seconds", "Time to import and instantiate a plugin")
+PLUGIN_ERRORS = metrics.counter("ps5_plugin_load_errors_total", "Plugins that failed to load")
+PLUGIN_INSTALLS = {
+    ok: metrics.counter("ps5_plugin_installs_total", "Plugin dependencies installed with pip", result="ok" if ok else "failed")
+    for ok in (True, False)
+}
+MANIFEST_CACHE = {
+    hit: metrics.counter("ps5_plugin_manifest_cache_total", "Manifest lookups by cache result", result="hit" if hit else "miss")
+    for hit in (True, False)
+}
+
+class ManifestCache:
+    """
+    Plugin manifests keyed on the plugin's source files, so a plugin's
+    requirements are known before any of its code runs. An entry is valid
+    while the files' mtime and size match, or their content hash does.
+    """
+    def __init__(self, path=PLUGIN_CACHE_FILE):
+        self.path = path
+        self.entries = {} # source path -> {"mtime", "size", "sha1", "manifest"}
+        self.dirty = False
+        self.lock = threading.Lock()
+        self.load()
+
+    def get(self, source):
+        entry = self.entries.get(source)
+        if entry:
+            mtime, size = _stat(source)
+            if (entry["mtime"], entry["size"]) == (mtime, size):
+                MANIFEST_CACHE[True].inc()
+                return entry["manifest"]
+            # Touched but unchanged (checkout, copy): same content, same manifest
+            if entry["sha1"] == _digest(source):
+                with self.lock:
+                    entry.update(mtime=mtime, size=size)
+                    self.dirty = True
+                MANIFEST_CACHE[True].inc()
+                return entry["manifest"]
+        MANIFEST_CACHE[False].inc()
+        return None
+
+    def put(self, source, manifest):
+        try: json.dumps(manifest)
+        except (TypeError, ValueError): return # Not cacheable, read from the plugin every time
+        mtime, size = _stat(source)
+        entry = {"mtime": mtime, "size": size, "sha1": _digest(source), "manifest": manifest}
+        with self.lock:
+            if self.entries.get(source) != entry:
+                self.entries[source] = entry
+                self.dirty = True
+
+    def load(self):
+        if not os.path.exists(self.path): return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except Exception as e:
+            Logger.log(f"Plugin manifest cache unreadable: {e}")
+
+    def save(self, present=None):
+        """Writes the cache if it changed; 'present' drops entries of removed plugins."""
+        with self.lock:
+            if present is not None:
+                for source in [s for s in self.entries if s not in present]:
+                    del self.entries[source]
+                    self.dirty = True
+            if not self.dirty: return
+            data = json.dumps(self.entries, indent=1)
+            self.dirty = False
+        try:
+            tmp = self.path + ".tmp"
+            with open(tmp, "w", encoding="utf-8") as f:
+                f.write(data)
+            os.replace(tmp, self.path)
+        except Exception as e:
+            Logger.log(f"Plugin manifest cache error: {e}")
+
+def _source_files(source):
+    """The file of a single-file plugin, or the top-level modules of a package plugin."""
+    if os.path.isdir(source): return sorted(glob.glob(os.path.join(source, "*.py")))
+    return [source]
+
+def _stat(source):
+    mtime = size = 0
+    for path in _source_files(source):
+        try: st = os.stat(path)
+        except OSError: continue
+        mtime = max(mtime, st.st_mtime_ns)
+        size += st.st_size
+    return mtime, size
+
+def _digest(source):
+    h = hashlib.sha1()
+    for path in _source_files(source):
+        try:
+            with open(path, "rb") as f: h.update(f.read())
+        except OSError: pass
+    return h.hexdigest()
+
+def _installed(requirement):
+    """
+    True if a requirement is satisfied, checked without importing it.
+    Requirements are pip names ("beautifulsoup4", "paho-mqtt>=2"), looked up
+    as installed distributions; plain module names ("bs4") are accepted too.
+    Version specifiers are not checked, pip is only asked for missing packages.
+    """
+    match = REQUIREMENT_NAME.match(requirement)
+    if not match: return True
+    name = match.group(1)
+    try:
+        importlib.metadata.distribution(name)
+        return True
+    except importlib.metadata.PackageNotFoundError:
+        pass
+    try: return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError): return False
+
+def _missing(manifest):
+    """Requirements of a manifest that are not installed."""
+    return [r for r in (manifest or {}).get("requirements", []) if not _installed(r)]
 
 class PluginManager:
     def __init__(self, plugin_dir="plugins"):
         self.plugin_dir = plugin_dir
-        self.plugins = [] 
-        self.loaded_modules = {} # Track modules for reloading
+        self.plugins = []
+        self.stats_history = None # Shared with plugins (set by the app)
+        self.manifests = ManifestCache()
+        self.generation = 0 # Bumped per discovery; stale background loads are discarded
+        self.lock = threading.Lock()
+        metrics.gauge("ps5_plugins_loaded", "Plugins currently loaded", fn=lambda: len(self.plugins))
+        metrics.gauge("ps5_plugins_enabled", "Plugins currently enabled", fn=lambda: sum(1 for p in self.plugins if p.enabled))
 
-    def discover_plugins(self):
-        """Scans, installs dependencies, and loads plugins."""
+    def discover_plugins(self, on_ready=None):
+        """
+        Scans and loads plugins, importing them in parallel. Plugins with
+        missing requirements are installed and loaded in the background;
+        'on_ready' is then called with the list of plugins that came online.
+        """
         if not os.path.exists(self.plugin_dir):
             os.makedirs(self.plugin_dir)
 
+        plugin_path = os.path.abspath(self.plugin_dir)
+        if plugin_path not in sys.path:
+            sys.path.append(plugin_path)
+
         # Clear existing to allow reload
-        self.plugins = []
-        sys.path.append(self.plugin_dir)
+        with self.lock:
+            self.plugins = []
+            self.generation += 1
+            generation = self.generation
+
+        entries = self._scan()
+        deferred = [] # (entry, manifest) waiting for their requirements
+        ready = []
+        for entry in entries:
+            # Known requirements are checked before the plugin is imported at all
+            manifest = self.manifests.get(entry[1])
+            if _missing(manifest): deferred.append((entry, manifest))
+            else: ready.append(entry)
+
+        loaded = []
+        if ready:
+            with ThreadPoolExecutor(max_workers=min(LOAD_WORKERS, len(ready)), thread_name_prefix="plugin-load") as pool:
+                results = list(pool.map(self._load, ready))
+            for entry, plugin in zip(ready, results):
+                if plugin is None: continue
+                # First run of a plugin: its requirements were unknown until now
+                if _missing(plugin.manifest): deferred.append((entry, plugin.manifest))
+                else: loaded.append(plugin)
 
-        for filename in os.listdir(self.plugin_dir):
+        with self.lock:
+            if generation == self.generation: self.plugins = loaded
+        self.manifests.save(present={source for _, source in entries})
+
+        if deferred:
+            threading.Thread(target=self._load_deferred, args=(deferred, generation, on_ready),
+                             name="plugin-install", daemon=True).start()
+
+    def _scan(self):
+        """(module name, source path) of every plugin file and package, in name order."""
+        entries = []
+        for filename in sorted(os.listdir(self.plugin_dir)):
+            path = os.path.abspath(os.path.join(self.plugin_dir, filename))
             if filename.endswith(".py") and filename != "__init__.py":
-                self._load_file(filename)
-            elif os.path.isdir(os.path.join(self.plugin_dir, filename)):
-                 if os.path.exists(os.path.join(self.plugin_dir, filename, "__init__.py")):
-                     self._load_module(filename)
-
-    def _load_file(self, filename):
-        module_name = filename[:-3]
-        file_path = os.path.join(self.plugin_dir, filename)
-        
+                entries.append((filename[:-3], path))
+            elif os.path.isdir(path) and os.path.exists(os.path.join(path, "__init__.py")):
+                entries.append((filename, path))
+        return entries
+
+    def _load(self, entry):
+        """Imports a plugin (always fresh, to pick up code changes) and instantiates it."""
+        started = time.perf_counter()
+        try: return self._import(*entry)
+        finally: PLUGIN_LOAD.observe(time.perf_counter() - started)
+
+    def _import(self, module_name, source):
         try:
-            # Dynamic Import
-            spec = importlib.util.spec_from_file_location(module_name, file_path)
-            module = importlib.util.module_from_spec(spec)
-            
-            # If we already loaded this module before, reload it to get code changes
-            if module_name in sys.modules:
-                module = importlib.reload(sys.modules[module_name])
+            if os.path.isdir(source):
+                spec = importlib.util.spec_from_file_location(
+                    module_name, os.path.join(source, "__init__.py"), submodule_search_locations=[source])
             else:
-                sys.modules[module_name] = module
-            
+                spec = importlib.util.spec_from_file_location(module_name, source)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[module_name] = module
             spec.loader.exec_module(module)
-            self._process_plugin(module)
-            
         except Exception as e:
-            Logger.log(f"Error loading plugin file {filename}: {e}")
+            PLUGIN_ERRORS.inc()
+            Logger.log(f"Error loading plugin {module_name}: {e}")
+            return None
 
-    def _process_plugin(self, module):
-        if hasattr(module, "Plugin"):
-            try:
-                # 1. Instantiate temporarily to read manifest
-                temp_instance = module.Plugin()
-                manifest = temp_instance.get_manifest()
-                
-                # 2. Check and Install Dependencies
-                reqs = manifest.get("requirements", [])
-                if reqs:
-                    if self._install_dependencies(reqs):
-                        # If we installed something, we MUST reload the module
-                        # so the plugin can now import the new library
-                        importlib.reload(module)
-                        # Re-instantiate after reload
-                        temp_instance = module.Plugin() 
-
-                # 3. Register valid plugin
-                self.plugins.append(temp_instance)
-                Logger.log(f"Plugin loaded: {manifest['name']}")
-                
-            except Exception as e:
-                Logger.log(f"Error instantiating plugin in {module}: {e}")
+        if not hasattr(module, "Plugin"): return None
+        try:
+            plugin = module.Plugin()
+            plugin.stats_history = self.stats_history
+            self.manifests.put(source, plugin.manifest)
+        except Exception as e:
+            PLUGIN_ERRORS.inc()
+            Logger.log(f"Error instantiating plugin in {module}: {e}")
+            return None
+
+        Logger.log(f"Plugin loaded: {plugin.manifest['name']}")
+        return plugin
 
-    def _install_dependencies(self, requirements):
-        """Checks if packages are installed, if not, pip installs them."""
-        installed_something = False
-        for package in requirements:
+    def _load_deferred(self, entries, generation, on_ready):
+        """Installs missing requirements, then brings the waiting plugins online one by one."""
+        for entry, manifest in entries:
+            if generation != self.generation: return # Plugins were reloaded meanwhile
+
+            missing = _missing(manifest)
+            if missing:
+                Logger.log(f"Plugin {entry[0]} waits for its dependencies: {', '.join(missing)}")
+                installed = self._install_dependencies(missing)
+                importlib.invalidate_caches()
+                if not installed:
+                    Logger.log(f"Plugin {entry[0]} disabled, missing: {', '.join(missing)}")
+                    continue
+
+            # A successful pip install is trusted: the plugin's own imports tell the rest
+            plugin = self._load(entry)
+            if plugin is None: continue
+
+            with self.lock:
+                if generation != self.generation: return
+                self.plugins = self.plugins + [plugin]
+            self.manifests.save()
+            if on_ready:
+                try: on_ready([plugin])
+                except Exception as e: Logger.log(f"Plugin Error: {e}")
+
+    def _install_dependencies(self, packages):
+        """pip installs the given packages; True if all of them succeeded."""
+        ok = True
+        for package in packages:
+            Logger.log(f"Installing missing dependency: {package}...")
             try:
-                importlib.import_module(package)
-            except ImportError:
-                Logger.log(f"Installing missing dependency: {package}...")
-                try:
-                    subprocess.check_call([sys.executable, "-m", "pip", "install", package])
-                    installed_something = True
-                    Logger.log(f"Successfully installed {package}")
-                except Exception as e:
-                    Logger.log(f"Failed to install {package}: {e}")
-        return installed_something
+                subprocess.check_call([sys.executable, "-m", "pip", "install", package])
+                PLUGIN_INSTALLS[True].inc()
+                Logger.log(f"Successfully installed {package}")
+            except Exception as e:
+                ok = False
+                PLUGIN_INSTALLS[False].inc()
+                Logger.log(f"Failed to install {package}: {e}")
+        return ok
 
     def get_plugins(self):
         return self.plugins
-    
+
+    def wants_stats(self):
+        """True if any enabled plugin consumes console stats."""
+        return any(p.enabled and p.uses_stats for p in self.plugins)
+
+    def get_metadata_providers(self):
+        """Collects metadata providers from enabled plugins."""
+        providers = []
+        for p in self.plugins:
+            if not p.enabled: continue
+            try: providers += p.get_metadata_providers() or []
+            except Exception as e: Logger.log(f"Plugin Error: {e}")
+        return providers
+
     def unload_all(self):
         """Calls on_unload for all plugins before reloading."""
         for p in self.plugins:
             try: p.on_unload()
             except: pass
-        self.plugins = []
\ No newline at end of file
+        self.plugins = []
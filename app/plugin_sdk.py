@@ -4,9 +4,19 @@ class PluginBase:
     """
     Base class for all PS5 Monitor plugins.
     """
+    # Set to False if the plugin ignores data['stats'], so polling can pause
+    uses_stats = True
+    # Overflow policy of the plugin's update queue: "drop_oldest" or "latest"
+    queue_policy = "drop_oldest"
+    # Typed events delivered to on_event(): any of "status", "game", "stats"
+    event_kinds = ()
+
     def __init__(self):
         self.enabled = False
         self.config = {}
+        # StatsHistory (app/timeseries.py) set by the PluginManager, e.g.
+        # self.stats_history.aggregate("cpu_temp", 3600) -> {"min", "max", "avg", "count"}
+        self.stats_history = None
     
     def get_manifest(self):
         """
@@ -26,6 +36,14 @@ class PluginBase:
         """
         raise NotImplementedError
 
+    @property
+    def manifest(self):
+        """get_manifest(), evaluated once per instance."""
+        manifest = self.__dict__.get("_manifest")
+        if manifest is None:
+            manifest = self._manifest = self.get_manifest()
+        return manifest
+
     def on_load(self, config_data):
         """Called when the app starts or settings are saved."""
         self.config = config_data
@@ -34,11 +52,28 @@ class PluginBase:
 
     def on_update(self, data):
         """
-        Called when PS5 status changes. 
-        'data' contains: {status, game: {...}, stats: {...}}
+        Called when PS5 status changes, on the plugin's own worker thread.
+        'data' is a read-only snapshot (app/state.py) used like a dict:
+        {status, game: {...}, stats: {...}, version}. Use data.to_dict() for
+        a mutable / JSON-serializable copy.
         """
         pass
 
+    def on_event(self, event):
+        """
+        Called with typed deltas for the kinds listed in 'event_kinds'
+        (StatusChanged, GameChanged, StatsChanged from app/events.py).
+        Every event has a monotonic 'version'.
+        """
+        pass
+
+    def get_metadata_providers(self):
+        """
+        Optional: returns MetadataProvider instances (see app/providers.py)
+        used to resolve game names and covers while the plugin is enabled.
+        """
+        return []
+
     def on_unload(self):
         """Called when plugin is disabled or app closes."""
         pass
\ No newline at end of file
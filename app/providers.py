@@ -0,0 +1,367 @@
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, TimeoutError as FutureTimeout
+from html.parser import HTMLParser
+from .utils import Logger
+from . import metrics
+
+PS4_PREFIXES = ("CUSA", "CUSJ", "CUSK", "CUSC", "CUSH", "CUSE", "PLAS", "PLJM", "PCJS")
+ICON_URL_PATTERN = re.compile(r'url\((?:&quot;|")?(.*?)(?:&quot;|")?\)')
+
+class GamePageParser(HTMLParser):
+    """
+    Incremental extractor for patch-site pages.
+    Collects only the first h1.bd-title text, the first <title> text and the
+    style of the first div.game-icon.secondary, without building a DOM.
+    Text runs are joined between tags before stripping, like BeautifulSoup's
+    get_text(strip=True), so results match the previous parser.
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.h1_parts = None   # Stripped text runs of the target h1 (None = not found yet)
+        self.h1_depth = 0
+        self.h1_done = False
+        self.title_raw = None  # Raw and stripped runs of the first <title>
+        self.title_parts = None
+        self.title_done = False
+        self.icon_seen = False
+        self.icon_style = None
+        self.run = []          # Current text run, flushed at each tag boundary
+
+    @property
+    def complete(self):
+        """True once nothing later in the page can change the result."""
+        if not (self.h1_done and self.icon_seen): return False
+        return bool(self._h1_text()) or self.title_done
+
+    def handle_starttag(self, tag, attrs):
+        self._flush()
+        if tag == "h1":
+            if self.h1_depth:
+                self.h1_depth += 1
+            elif self.h1_parts is None and "bd-title" in _classes(attrs):
+                self.h1_parts = []
+                self.h1_depth = 1
+        elif tag == "title" and self.title_parts is None:
+            self.title_raw = []
+            self.title_parts = []
+        elif tag == "div" and not self.icon_seen:
+            classes = _classes(attrs)
+            if "game-icon" in classes and "secondary" in classes:
+                self.icon_seen = True
+                self.icon_style = dict(attrs).get("style")
+
+    def handle_endtag(self, tag):
+        self._flush()
+        if tag == "h1" and self.h1_depth:
+            self.h1_depth -= 1
+            if not self.h1_depth: self.h1_done = True
+        elif tag == "title" and self.title_parts is not None:
+            self.title_done = True
+
+    def handle_comment(self, data):
+        self._flush()
+
+    def handle_data(self, data):
+        if self.h1_depth or (self.title_parts is not None and not self.title_done):
+            self.run.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+    def _flush(self):
+        if not self.run: return
+        text = "".join(self.run)
+        self.run = []
+        stripped = text.strip()
+        if self.h1_depth and stripped:
+            self.h1_parts.append(stripped)
+        if self.title_parts is not None and not self.title_done:
+            self.title_raw.append(text)
+            if stripped: self.title_parts.append(stripped)
+
+    def _h1_text(self):
+        return "".join(self.h1_parts) if self.h1_parts else ""
+
+    def result(self, base_url):
+        """Returns (name, image, background) with the same fallbacks as before."""
+        name = self._h1_text() or None
+
+        if not name and self.title_parts is not None:
+            if 'Patches' in "".join(self.title_raw):
+                name = "".join(self.title_parts).split(' - ')[0]
+
+        img_url = "ps5"
+        bg_url = ""
+        if self.icon_style:
+            match = ICON_URL_PATTERN.search(self.icon_style)
+            if match:
+                u = match.group(1)
+                img_url = base_url + u if u.startswith("/") else u
+                bg_url = img_url
+
+        return name, img_url, bg_url
+
+def _classes(attrs):
+    for key, value in attrs:
+        if key == "class" and value: return value.split()
+    return ()
+
+class MetadataProvider:
+    """
+    Base class for game metadata sources.
+    Plugins can subclass it and return instances from get_metadata_providers().
+    """
+    name = "provider"
+    timeout = 10
+    local = False # Local providers are answered synchronously before any network lookup
+
+    def preferred(self, title_id):
+        """Preferred providers are started first, the others only after the hedge delay."""
+        return False
+
+    def lookup(self, title_id, cancel):
+        """
+        Returns (info, None) on success or (None, reason) on failure.
+        'cancel' is a threading.Event set once another provider has answered.
+        """
+        raise NotImplementedError
+
+class PatchSiteProvider(MetadataProvider):
+    """Scrapes a patch site page (orbispatches / prosperopatches) for name and cover."""
+    def __init__(self, name, base_url, http, prefixes=None, timeout=10):
+        self.name = name
+        self.base_url = base_url
+        self.http = http
+        self.prefixes = prefixes
+        self.timeout = timeout
+
+    def preferred(self, title_id):
+        # No prefixes: preferred for every title (fallback site)
+        return self.prefixes is None or title_id.startswith(self.prefixes)
+
+    def lookup(self, title_id, cancel):
+        if cancel.is_set(): return None, "cancelled"
+        base_url = self.base_url
+
+        r = self.http.stream(f"{base_url}/{title_id}", timeout=self.timeout)
+        try:
+            if r.status_code != 200: return None, f"HTTP {r.status_code}"
+
+            # Parse as the page streams in and stop once name and icon are known
+            parser = GamePageParser()
+            for chunk in r.iter_text():
+                if cancel.is_set(): return None, "cancelled"
+                parser.feed(chunk)
+                if parser.complete: break
+            else:
+                parser.close()
+        finally:
+            r.close()
+
+        name, img_url, bg_url = parser.result(base_url)
+        if not name: return None, "no title in page"
+        return {"name": name, "image": img_url, "background": bg_url}, None
+
+class OverridesProvider(MetadataProvider):
+    """
+    Local JSON file of manual entries: {"CUSA12345": {"name": ..., "image": ..., "background": ...}}.
+    Reloaded whenever the file changes.
+    """
+    name = "overrides"
+    local = True
+
+    def __init__(self, path):
+        self.path = path
+        self.mtime = None
+        self.entries = {}
+
+    def get(self, title_id):
+        self._reload()
+        entry = self.entries.get(title_id)
+        if not entry: return None
+        return {"name": entry.get("name", title_id), "image": entry.get("image", "ps5"), "background": entry.get("background", "")}
+
+    def lookup(self, title_id, cancel):
+        info = self.get(title_id)
+        return (info, None) if info else (None, "no override")
+
+    def _reload(self):
+        try: mtime = os.path.getmtime(self.path)
+        except OSError:
+            self.entries = {}
+            return
+        if mtime == self.mtime: return
+        self.mtime = mtime
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+        except Exception as e:
+            Logger.log(f"Error reading overrides file: {e}")
+            self.entries = {}
+
+class ProviderChain:
+    """
+    Resolves a title through several providers.
+    Local providers answer first; remote ones are hedged: the preferred
+    provider starts immediately, each further one after 'hedge_delay'
+    (or as soon as the previous one fails). The first good answer wins
+    and the slower requests are told to cancel. A provider that has not
+    answered within its own 'timeout' counts as a miss.
+    """
+    def __init__(self, providers, hedge_delay=1.5, max_workers=8):
+        self.providers = providers
+        self.hedge_delay = hedge_delay
+        self.plugin_source = None # Callable returning providers from enabled plugins
+        self.pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="provider")
+
+        self.stats = {}
+        self.stats_lock = threading.Lock()
+
+    def get_providers(self):
+        providers = list(self.providers)
+        if self.plugin_source:
+            try: providers += self.plugin_source()
+            except Exception as e: Logger.log(f"Plugin provider error: {e}")
+        return providers
+
+    def lookup(self, title_id):
+        """Returns (info, None) from the first provider that answers, or (None, reasons)."""
+        providers = self.get_providers()
+        reasons = []
+
+        for provider in providers:
+            if not provider.local: continue
+            future, request = self._start(provider, title_id)
+            try:
+                info, reason = future.result(timeout=provider.timeout)
+            except FutureTimeout:
+                self._expire(future, request)
+                reasons.append(f"{provider.name}: timeout")
+                continue
+            if info: return info, None
+
+        remote = [p for p in providers if not p.local]
+        remote.sort(key=lambda p: not p.preferred(title_id))
+        if not remote: return None, "no providers"
+
+        pending = {} # future -> request
+        next_launch = 0
+
+        while remote or pending:
+            now = time.monotonic()
+            if remote and (not pending or now >= next_launch):
+                future, request = self._start(remote.pop(0), title_id)
+                pending[future] = request
+                next_launch = now + self.hedge_delay
+                continue
+
+            # Wake for the next hedge or the nearest provider deadline, whichever comes first
+            wake = min(request["deadline"] for request in pending.values())
+            if remote: wake = min(wake, next_launch)
+            done, _ = wait(pending, timeout=max(0, wake - now), return_when=FIRST_COMPLETED)
+            for future in done:
+                provider = pending.pop(future)["provider"]
+                info, reason = future.result()
+                if info:
+                    for other, request in pending.items():
+                        request["cancel"].set()
+                        # Never started: settled here, a running one settles itself
+                        if other.cancel(): self._settle(request, "cancelled")
+                    return info, None
+                reasons.append(f"{provider.name}: {reason}")
+
+            now = time.monotonic()
+            for future, request in list(pending.items()):
+                if now < request["deadline"]: continue
+                del pending[future]
+                self._expire(future, request)
+                reasons.append(f"{request['provider'].name}: timeout")
+
+        return None, "; ".join(reasons)
+
+    def _start(self, provider, title_id):
+        """Submits one provider lookup; the request is counted as soon as it is started."""
+        request = {"provider": provider, "cancel": threading.Event(),
+                   "deadline": time.monotonic() + provider.timeout, "settled": False}
+        with self.stats_lock:
+            self._stats_for(provider)["requests"] += 1
+        return self.pool.submit(self._run, request, title_id), request
+
+    def _run(self, request, title_id):
+        started = time.perf_counter()
+        try:
+            info, reason = request["provider"].lookup(title_id, request["cancel"])
+        except Exception as e:
+            info, reason = None, f"error: {e}"
+        elapsed = time.perf_counter() - started
+
+        if info: outcome = "hits"
+        elif request["cancel"].is_set(): outcome = "cancelled"
+        else: outcome = "misses"
+        self._settle(request, outcome, elapsed)
+        return info, reason
+
+    def _expire(self, future, request):
+        """A provider past its own timeout is told to stop and counted as a miss."""
+        request["cancel"].set()
+        future.cancel()
+        self._settle(request, "timeouts")
+
+    def _settle(self, request, outcome, elapsed=None):
+        """
+        Records a request's outcome once: a late answer after a timeout
+        only adds its latency. Timeouts count as misses for the success rate.
+        """
+        with self.stats_lock:
+            st = self._stats_for(request["provider"])
+            if elapsed is not None:
+                st["answered"] += 1
+                st["total_ms"] += elapsed * 1000
+                st["latency"].observe(elapsed)
+            if request["settled"]: return
+            request["settled"] = True
+            st[outcome] += 1
+            if outcome == "timeouts": st["misses"] += 1
+
+    def _stats_for(self, provider):
+        """Counters of a provider, exported as ps5_provider_* metrics on first use."""
+        name = provider.name
+        st = self.stats.get(name)
+        if st is None:
+            st = self.stats[name] = {"requests": 0, "hits": 0, "misses": 0, "cancelled": 0, "timeouts": 0,
+                                     "answered": 0, "total_ms": 0.0}
+            metrics.counter("ps5_provider_requests_total", "Metadata provider lookups started",
+                            fn=lambda: self.stats[name]["requests"], provider=name)
+            for result, fn in (
+                ("hit", lambda: self.stats[name]["hits"]),
+                ("miss", lambda: self.stats[name]["misses"] - self.stats[name]["timeouts"]),
+                ("timeout", lambda: self.stats[name]["timeouts"]),
+                ("cancelled", lambda: self.stats[name]["cancelled"])
+            ):
+                metrics.counter("ps5_provider_results_total", "Metadata provider lookups by outcome",
+                                fn=fn, provider=name, result=result)
+            st["latency"] = metrics.histogram("ps5_provider_lookup_seconds", "Metadata provider answer latency",
+                                              provider=name)
+        return st
+
+    def get_stats(self):
+        """Returns per-provider counters with success rate and average latency."""
+        with self.stats_lock:
+            result = {}
+            for name, st in self.stats.items():
+                decided = st["hits"] + st["misses"]
+                result[name] = {
+                    "requests": st["requests"],
+                    "hits": st["hits"],
+                    "misses": st["misses"],
+                    "cancelled": st["cancelled"],
+                    "timeouts": st["timeouts"],
+                    "success_rate": round(st["hits"] / decided, 3) if decided else None,
+                    "avg_ms": round(st["total_ms"] / st["answered"], 1) if st["answered"] else 0.0
+                }
+            return result
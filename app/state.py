@@ -0,0 +1,71 @@
+from collections.abc import Mapping
+
+class Frozen(Mapping):
+    """
+    Immutable record with __slots__ that still reads like the old dicts
+    (data.get("name"), data["game"], dict(data)). Fields set to None are
+    treated as missing keys. Use replace() to derive a modified copy.
+    """
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for field in self.__slots__:
+            object.__setattr__(self, field, values.get(field))
+
+    @classmethod
+    def from_dict(cls, data, **extra):
+        values = {f: data.get(f) for f in cls.__slots__} if data else {}
+        values.update(extra)
+        return cls(**values)
+
+    def __setattr__(self, key, value):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, key):
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __getitem__(self, key):
+        if key in self.__slots__:
+            value = getattr(self, key)
+            if value is not None: return value
+        raise KeyError(key)
+
+    def __iter__(self):
+        return (f for f in self.__slots__ if getattr(self, f) is not None)
+
+    def __len__(self):
+        return sum(1 for f in self.__slots__ if getattr(self, f) is not None)
+
+    def __eq__(self, other):
+        if type(other) is type(self):
+            return all(getattr(self, f) == getattr(other, f) for f in self.__slots__)
+        return Mapping.__eq__(self, other)
+
+    __hash__ = None
+
+    def replace(self, **changes):
+        values = {f: getattr(self, f) for f in self.__slots__}
+        values.update(changes)
+        return type(self)(**values)
+
+    def to_dict(self):
+        """Plain (JSON-serializable) dict copy."""
+        return {k: (v.to_dict() if isinstance(v, Frozen) else v) for k, v in self.items()}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()})"
+
+class GameInfo(Frozen):
+    __slots__ = ("name", "image", "background", "title_id", "start_timestamp")
+
+class Stats(Frozen):
+    __slots__ = ("cpu_temp", "soc_temp", "frequency")
+
+class CoreState(Frozen):
+    """One published snapshot: {status, game, stats, version}."""
+    __slots__ = ("status", "game", "stats", "version")
+
+EMPTY_GAME = GameInfo()
+STATS_NA = Stats(cpu_temp="N/A", soc_temp="N/A", frequency="N/A")
+STATS_TIMEOUT = Stats(cpu_temp="Timeout", soc_temp="Timeout", frequency="Timeout")
+STATS_ERR_CONN = Stats(cpu_temp="Err Conn", soc_temp="Err Conn", frequency="Err Conn")
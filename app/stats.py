@@ -0,0 +1,323 @@
+import os
+import time
+from html.parser import HTMLParser
+from .utils import Logger
+
+# Label shown on the stats page -> key in current_stats
+STATS_LABELS = {"cpu temp": "cpu_temp", "soc temp": "soc_temp", "frequency": "frequency"}
+
+def _child_pids(root):
+    """All descendants of 'root', from /proc (Linux)."""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit(): continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rpartition(")")[2].split() # The name may contain spaces
+            children.setdefault(int(fields[1]), []).append(int(entry))
+        except (OSError, IndexError, ValueError):
+            pass
+    found, todo = [], [root]
+    while todo:
+        for pid in children.get(todo.pop(), []):
+            found.append(pid)
+            todo.append(pid)
+    return found
+
+def _rss_mb(children=False):
+    """
+    Resident memory (MB) of this process, or of all its child processes.
+    psutil is used when installed, otherwise /proc; None where neither works.
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+
+    if psutil:
+        me = psutil.Process()
+        total = 0
+        for proc in (me.children(recursive=True) if children else [me]):
+            try: total += proc.memory_info().rss
+            except psutil.Error: pass
+        return total / 2**20
+
+    if not os.path.isdir("/proc"): return None
+    total = 0
+    for pid in (_child_pids(os.getpid()) if children else ["self"]):
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        total += int(line.split()[1]) * 1024
+                        break
+        except OSError:
+            pass
+    return total / 2**20
+
+class StatsTimeout(Exception):
+    """The stats page did not answer in time."""
+
+class StatsUnavailable(Exception):
+    """The stats server answered with an error status (e.g. still starting up)."""
+
+class StatsFetcher:
+    """
+    Base class for stats backends.
+    fetch() returns {"cpu_temp", "soc_temp", "frequency"}, or None when the
+    backend cannot read this page; connection problems raise.
+    """
+    name = "base"
+
+    def __init__(self):
+        self.requests = 0
+        self.total_ms = 0.0
+        self.last_ms = 0.0
+        self.rss_mb = None # Memory of the backend after the last fetch
+        self.peak_rss_mb = None
+
+    def fetch(self, url):
+        started = time.perf_counter()
+        try:
+            return self._fetch(url)
+        finally:
+            self.last_ms = (time.perf_counter() - started) * 1000
+            self.total_ms += self.last_ms
+            self.requests += 1
+            self._sample_memory()
+
+    def _fetch(self, url):
+        raise NotImplementedError
+
+    def _memory(self):
+        """Resident memory (MB) this backend runs in, None if not measured."""
+        return None
+
+    def _sample_memory(self):
+        try: rss = self._memory()
+        except: rss = None
+        if rss is None: return
+        self.rss_mb = rss
+        self.peak_rss_mb = max(rss, self.peak_rss_mb or 0)
+
+    def get_stats(self):
+        avg = self.total_ms / self.requests if self.requests else 0.0
+        stats = {"backend": self.name, "requests": self.requests, "avg_ms": round(avg, 1), "last_ms": round(self.last_ms, 1)}
+        if self.rss_mb is not None:
+            stats["rss_mb"] = round(self.rss_mb, 1)
+            stats["peak_rss_mb"] = round(self.peak_rss_mb, 1)
+        return stats
+
+    def close(self):
+        pass
+
+class StatsPageParser(HTMLParser):
+    """Reads 'div.info-label' + adjacent 'div.info-value' pairs from the stats page."""
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.values = {}
+        self.capture = None  # "label" or "value" while inside one of those divs
+        self.depth = 0
+        self.text = []
+        self.pending_key = None # Key of the label just closed, waiting for its value
+
+    def handle_starttag(self, tag, attrs):
+        if self.capture:
+            if tag == "div": self.depth += 1
+            return
+
+        key, self.pending_key = self.pending_key, None
+        if tag != "div": return
+        classes = dict(attrs).get("class", "") or ""
+        classes = classes.split()
+        if "info-label" in classes:
+            self.capture = "label"
+        elif "info-value" in classes and key:
+            self.capture = "value"
+            self.pending_key = key
+        else:
+            return
+        self.depth = 1
+        self.text = []
+
+    def handle_endtag(self, tag):
+        if not self.capture or tag != "div": return
+        self.depth -= 1
+        if self.depth: return
+
+        text = "".join(self.text).strip()
+        if self.capture == "label":
+            low = text.lower()
+            self.pending_key = next((k for label, k in STATS_LABELS.items() if label in low), None)
+        elif self.pending_key:
+            self.values[self.pending_key] = text
+            self.pending_key = None
+        self.capture = None
+
+    def handle_data(self, data):
+        if self.capture:
+            self.text.append(data)
+        elif data.strip():
+            self.pending_key = None # Only an adjacent sibling counts as the value
+
+class HttpStatsFetcher(StatsFetcher):
+    """Plain HTTP GET plus a targeted HTML (or JSON) parse, no browser."""
+    name = "http"
+
+    def __init__(self, timeout=5):
+        import httpx
+
+        super().__init__()
+        self.client = httpx.Client(timeout=timeout, follow_redirects=True)
+        self.timeout_error = httpx.TimeoutException
+
+    def _fetch(self, url):
+        try:
+            r = self.client.get(url)
+        except self.timeout_error:
+            raise StatsTimeout()
+        if not 200 <= r.status_code < 300:
+            raise StatsUnavailable(f"HTTP {r.status_code}")
+
+        if "json" in r.headers.get("content-type", ""):
+            data = r.json()
+            values = {key: str(data[key]) for key in STATS_LABELS.values() if key in data}
+        else:
+            parser = StatsPageParser()
+            parser.feed(r.text)
+            parser.close()
+            values = parser.values
+
+        # Nothing found: the page is probably rendered by JavaScript
+        if not values: return None
+        return {key: values.get(key, "N/A") for key in STATS_LABELS.values()}
+
+    def _memory(self):
+        return _rss_mb() # Runs inside the app process
+
+    def close(self):
+        try: self.client.close()
+        except: pass
+
+class PlaywrightStatsFetcher(StatsFetcher):
+    """Headless Chromium, for stats pages that need JavaScript."""
+    name = "playwright"
+    SELECTORS = {
+        "cpu_temp": 'div.info-label:text("CPU Temp") + div.info-value',
+        "soc_temp": 'div.info-label:text("SoC Temp") + div.info-value',
+        "frequency": 'div.info-label:text("Frequency") + div.info-value'
+    }
+
+    def __init__(self):
+        super().__init__()
+        self.playwright = None
+        self.browser = None
+        self.page = None
+
+    def _fetch(self, url):
+        from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+        if not self.page: self._launch()
+        try:
+            self.page.goto(url, timeout=5000)
+        except PlaywrightTimeoutError:
+            raise StatsTimeout()
+
+        try: self.page.wait_for_selector('div.system-info-content', timeout=3000)
+        except: pass
+
+        new_stats = {}
+        for key, selector in self.SELECTORS.items():
+            try:
+                if self.page.locator(selector).count() > 0:
+                    val = self.page.locator(selector).first.inner_text()
+                    new_stats[key] = val.strip()
+                else: new_stats[key] = "N/A"
+            except: new_stats[key] = "N/A"
+        return new_stats
+
+    def _launch(self):
+        from playwright.sync_api import sync_playwright
+
+        self.playwright = sync_playwright().start()
+        self.browser = self.playwright.chromium.launch(headless=True)
+        self.page = self.browser.new_page()
+        Logger.log("Stats: headless Chromium started.")
+
+    def _memory(self):
+        # The Playwright driver and Chromium are the app's only long-lived child processes
+        return _rss_mb(children=True) if self.browser else None
+
+    def close(self):
+        for obj, method in ((self.browser, "close"), (self.playwright, "stop")):
+            if obj:
+                try: getattr(obj, method)()
+                except: pass
+        self.playwright = self.browser = self.page = None
+
+class AutoStatsFetcher(StatsFetcher):
+    """
+    HTTP first. Switches to Playwright only after 'fallback_after' pages in a
+    row came back OK but without values (rendered by JavaScript), and tries
+    HTTP again every 'retry_http' seconds while on the browser.
+    """
+    name = "auto"
+
+    def __init__(self, fallback_after=3, retry_http=600):
+        super().__init__()
+        self.fallback_after = fallback_after
+        self.retry_http = retry_http
+        self.http = HttpStatsFetcher()
+        self.browser = None
+        self.browser_stats = None # Last figures of a closed browser
+        self.empty_pages = 0
+        self.browser_since = 0
+
+    def _fetch(self, url):
+        if self.browser:
+            if time.monotonic() - self.browser_since < self.retry_http:
+                return self.browser.fetch(url)
+            self.browser_since = time.monotonic()
+            try: values = self.http.fetch(url)
+            except Exception: values = None
+            if values is None: return self.browser.fetch(url)
+            Logger.log("Stats page readable over HTTP again, closing Playwright.")
+            self._close_browser()
+            return values
+
+        values = self.http.fetch(url) # Error statuses and connection problems raise
+        if values is not None:
+            self.empty_pages = 0
+            return values
+        self.empty_pages += 1
+        if self.empty_pages < self.fallback_after: return None
+
+        Logger.log(f"Stats page needs JavaScript, switching to Playwright ({self.http.get_stats()})")
+        self.empty_pages = 0
+        self.browser = PlaywrightStatsFetcher()
+        self.browser_since = time.monotonic()
+        return self.browser.fetch(url)
+
+    def get_stats(self):
+        stats = super().get_stats()
+        stats["active"] = "playwright" if self.browser else "http"
+        stats["http"] = self.http.get_stats()
+        browser = self.browser.get_stats() if self.browser else self.browser_stats
+        if browser: stats["playwright"] = browser
+        return stats
+
+    def _close_browser(self):
+        if self.browser:
+            self.browser_stats = self.browser.get_stats()
+            self.browser.close()
+        self.browser = None
+
+    def close(self):
+        self.http.close()
+        self._close_browser()
+
+def create_stats_fetcher(backend):
+    """'http', 'playwright' or 'auto' (HTTP first, Playwright if the page needs JS)."""
+    if backend == "playwright": return PlaywrightStatsFetcher()
+    if backend == "http": return HttpStatsFetcher()
+    return AutoStatsFetcher()
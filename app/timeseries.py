@@ -0,0 +1,139 @@
+import re
+import threading
+import time
+from array import array
+
+STATS_METRICS = ("cpu_temp", "soc_temp", "frequency")
+NUMBER_PATTERN = re.compile(r"-?\d+(?:[.,]\d+)?")
+
+def parse_stat(value):
+    """'52 °C' -> 52.0, '3500 MHz' -> 3500.0, 'N/A' / 'Timeout' -> None."""
+    if isinstance(value, (int, float)): return float(value)
+    match = NUMBER_PATTERN.search(value or "")
+    if not match: return None
+    return float(match.group(0).replace(",", "."))
+
+class Series:
+    """
+    Fixed-size ring of buckets stored in flat arrays.
+    step=0 keeps every sample; otherwise samples are folded into
+    min/max/sum/count buckets aligned to 'step' seconds.
+    """
+    def __init__(self, step, capacity):
+        self.step = step
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.mins = array("d", bytes(8 * capacity))
+        self.maxs = array("d", bytes(8 * capacity))
+        self.sums = array("d", bytes(8 * capacity))
+        self.counts = array("L", bytes(array("L").itemsize * capacity))
+        self.head = -1
+        self.size = 0
+
+    def add(self, ts, value):
+        bucket = ts - ts % self.step if self.step else ts
+        head = self.head
+
+        if self.step and self.size and self.times[head] == bucket:
+            if value < self.mins[head]: self.mins[head] = value
+            if value > self.maxs[head]: self.maxs[head] = value
+            self.sums[head] += value
+            self.counts[head] += 1
+            return
+
+        head = self.head = (head + 1) % self.capacity
+        self.times[head] = bucket
+        self.mins[head] = self.maxs[head] = self.sums[head] = value
+        self.counts[head] = 1
+        if self.size < self.capacity: self.size += 1
+
+    def oldest(self):
+        if not self.size: return None
+        return self.times[(self.head - self.size + 1) % self.capacity]
+
+    def _indexes(self, since):
+        """Slot indexes overlapping the window after 'since', newest first."""
+        # A bucket starting before 'since' still overlaps the window until it ends
+        oldest_start = since - self.step
+        idx = self.head
+        for _ in range(self.size):
+            start = self.times[idx]
+            if start < since and (not self.step or start <= oldest_start): break
+            yield idx
+            idx = (idx - 1) % self.capacity
+
+    def aggregate(self, since):
+        lo, hi, total, count = None, None, 0.0, 0
+        for idx in self._indexes(since):
+            if lo is None or self.mins[idx] < lo: lo = self.mins[idx]
+            if hi is None or self.maxs[idx] > hi: hi = self.maxs[idx]
+            total += self.sums[idx]
+            count += self.counts[idx]
+        if not count: return None
+        return {"min": lo, "max": hi, "avg": total / count, "count": count}
+
+    def points(self, since):
+        """(timestamp, min, max, avg) tuples, oldest first."""
+        result = [(self.times[i], self.mins[i], self.maxs[i], self.sums[i] / self.counts[i]) for i in self._indexes(since)]
+        result.reverse()
+        return result
+
+class StatsHistory:
+    """
+    Bounded history of the numeric console stats at several resolutions:
+    raw samples, 1-minute and 1-hour min/max/avg buckets.
+    """
+    RESOLUTIONS = {
+        "raw": (0, 720),     # Last 720 polls
+        "1m": (60, 1440),    # 24 hours
+        "1h": (3600, 720)    # 30 days
+    }
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {
+            metric: {name: Series(step, capacity) for name, (step, capacity) in self.RESOLUTIONS.items()}
+            for metric in STATS_METRICS
+        }
+
+    def record(self, stats, ts=None):
+        """Adds one poll ({"cpu_temp": "52 °C", ...}); unparsable values are skipped."""
+        ts = ts or time.time()
+        with self.lock:
+            for metric in STATS_METRICS:
+                value = parse_stat(stats.get(metric))
+                if value is None: continue
+                for series in self.series[metric].values():
+                    series.add(ts, value)
+
+    def latest(self, metric):
+        """(timestamp, value) of the last raw sample, or None."""
+        with self.lock:
+            raw = self.series[metric]["raw"]
+            if not raw.size: return None
+            return raw.times[raw.head], raw.sums[raw.head]
+
+    def aggregate(self, metric, seconds, resolution=None):
+        """
+        {"min", "max", "avg", "count"} over the last 'seconds', or None.
+        Without 'resolution', the finest one still covering the window is used.
+        """
+        since = time.time() - seconds
+        with self.lock:
+            return self._pick(metric, since, resolution).aggregate(since)
+
+    def points(self, metric, seconds, resolution=None):
+        """List of (timestamp, min, max, avg) over the last 'seconds'."""
+        since = time.time() - seconds
+        with self.lock:
+            return self._pick(metric, since, resolution).points(since)
+
+    def _pick(self, metric, since, resolution):
+        by_res = self.series[metric]
+        if resolution: return by_res[resolution]
+        for name in ("raw", "1m"):
+            oldest = by_res[name].oldest()
+            # Finest resolution whose ring hasn't wrapped past the window start
+            if by_res[name].size < by_res[name].capacity or (oldest is not None and oldest <= since):
+                return by_res[name]
+        return by_res["1h"]
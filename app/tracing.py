@@ -0,0 +1,131 @@
+import json
+import threading
+import time
+from collections import OrderedDict, deque
+from .utils import Logger
+from . import metrics
+
+# Stages stamped by the core, in pipeline order; sinks add "sink:<name>" and friends
+CORE_STAGES = ("recv", "framed", "classified", "update_state", "notify", "metadata", "notify+metadata")
+
+class Trace:
+    """Timeline of one title transition, from the KLOG bytes to the sinks."""
+    __slots__ = ("trace_id", "title_id", "started", "marks", "enriched")
+
+    def __init__(self, trace_id, title_id, started):
+        self.trace_id = trace_id
+        self.title_id = title_id
+        self.started = started
+        self.marks = [] # (stage, perf_counter seconds)
+        self.enriched = False # Metadata resolved: later stages belong to the enriched update
+
+    @property
+    def suffix(self):
+        return "+metadata" if self.enriched else ""
+
+    def mark(self, stage, at=None):
+        self.marks.append((stage, at or time.perf_counter()))
+
+class Tracer:
+    """
+    Keeps the recent transition traces and per-stage latency samples.
+    Stages are measured from the socket receive of the triggering line, so
+    the percentiles show where a transition's time goes. Traces are looked
+    up by the state versions they produced, which is how sinks find them.
+    """
+    def __init__(self, keep=200, window=500, versions=256):
+        self.traces = deque(maxlen=keep)
+        self.by_version = OrderedDict()
+        self.max_versions = versions
+        self.window = window
+        self.samples = {} # stage -> deque of seconds since receive
+        self.next_id = 1
+        self.lock = threading.Lock()
+
+    def start(self, title_id, recv_at=None, framed_at=None):
+        now = time.perf_counter()
+        with self.lock:
+            trace = Trace(self.next_id, title_id, recv_at or now)
+            self.next_id += 1
+            self.traces.append(trace)
+        if recv_at: self._mark(trace, "recv", recv_at)
+        if framed_at: self._mark(trace, "framed", framed_at)
+        self._mark(trace, "classified", now)
+        return trace
+
+    def bind(self, trace, version):
+        """Marks the state 'version' as produced by 'trace'."""
+        with self.lock:
+            self.by_version[version] = (trace, trace.suffix)
+            while len(self.by_version) > self.max_versions:
+                self.by_version.popitem(last=False)
+
+    def mark(self, trace, stage):
+        if not trace: return
+        if stage == "metadata":
+            trace.enriched = True
+        else:
+            stage += trace.suffix
+        self._mark(trace, stage, time.perf_counter())
+
+    def mark_version(self, version, stage):
+        """Stamps the trace that produced 'version', if any (cheap no-op otherwise)."""
+        entry = self.by_version.get(version)
+        if entry: self._mark(entry[0], stage + entry[1], time.perf_counter())
+
+    def mark_event(self, event, stage):
+        self.mark_version(getattr(event, "version", None), stage)
+
+    def _mark(self, trace, stage, at):
+        elapsed = at - trace.started
+        with self.lock:
+            trace.mark(stage, at)
+            samples = self.samples.get(stage)
+            if samples is None: samples = self.samples[stage] = deque(maxlen=self.window)
+            samples.append(elapsed)
+        metrics.histogram("ps5_transition_seconds", "Time from KLOG receive to each pipeline stage", stage=stage).observe(elapsed)
+
+    def percentiles(self):
+        """{stage: {"p50", "p90", "p99", "max", "count"}} in milliseconds since receive."""
+        with self.lock:
+            snapshot = {stage: sorted(samples) for stage, samples in self.samples.items()}
+        result = {}
+        for stage, values in snapshot.items():
+            if not values: continue
+            pick = lambda q: values[min(int(q * len(values)), len(values) - 1)] * 1000
+            result[stage] = {"p50": round(pick(0.5), 2), "p90": round(pick(0.9), 2), "p99": round(pick(0.99), 2),
+                             "max": round(values[-1] * 1000, 2), "count": len(values)}
+        return result
+
+    def summary(self):
+        """One line per stage, in pipeline order."""
+        stats = self.percentiles()
+        order = [s for s in CORE_STAGES if s in stats] + sorted(s for s in stats if s not in CORE_STAGES)
+        return "\n".join(f"  {s:<20} p50 {stats[s]['p50']:>8} ms  p90 {stats[s]['p90']:>8} ms  "
+                         f"p99 {stats[s]['p99']:>8} ms  (n={stats[s]['count']})" for s in order)
+
+    def export(self, path):
+        """Writes the recent traces in Chrome trace-event format (chrome://tracing, Perfetto)."""
+        with self.lock:
+            traces = [(t.trace_id, t.title_id, sorted(t.marks, key=lambda m: m[1])) for t in self.traces]
+
+        events = []
+        for trace_id, title_id, marks in traces:
+            events.append({"ph": "M", "name": "thread_name", "pid": 1, "tid": trace_id,
+                           "args": {"name": f"#{trace_id} {title_id}"}})
+            previous = None # Last core stage: later stages (sinks, metadata) start from it
+            for stage, at in marks:
+                if previous is not None:
+                    events.append({"ph": "X", "name": stage, "cat": "core" if stage in CORE_STAGES else "sink",
+                                   "pid": 1, "tid": trace_id, "ts": previous * 1e6, "dur": (at - previous) * 1e6,
+                                   "args": {"title_id": title_id}})
+                if stage in CORE_STAGES or previous is None: previous = at
+
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+            Logger.log(f"Trace: {len(traces)} transitions written to {path}")
+        except Exception as e:
+            Logger.log(f"Trace export error: {e}")
+
+TRACER = Tracer()
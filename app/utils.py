@@ -2,12 +2,17 @@ import json
 import os
 import sys
 import threading
+import time
 from datetime import datetime
 
+# First app module to be imported; startup timings are measured from here
+STARTED_AT = time.perf_counter()
+
 # Path setup based on file location
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 CONFIG_FILE = os.path.join(BASE_DIR, "config.json")
 CACHE_FILE = os.path.join(BASE_DIR, "ps5_game_cache.json")
+PLUGIN_CACHE_FILE = os.path.join(BASE_DIR, "plugin_manifests.json")
 LOG_FILE = os.path.join(BASE_DIR, "app.log")
 
 DEFAULT_CONFIG = {
@@ -17,6 +22,34 @@ DEFAULT_CONFIG = {
         "stats_port": 1214,
         "language": "en"
     },
+    "stats": {
+        "backend": "auto",
+        "interval_playing": 10,
+        "interval_online": 30,
+        "interval_idle": 60,
+        "max_backoff": 300,
+        "deadband": {"cpu_temp": 1.5, "soc_temp": 1.5, "frequency": 100},
+        "min_publish_interval": 20,
+        "heartbeat": 300
+    },
+    "klog": {
+        "record": False,
+        "record_dir": "klog_recordings",
+        "record_max_mb": 50,
+        "record_keep": 10
+    },
+    "metadata": {
+        "timeout": 10,
+        "max_connections": 10,
+        "http2": False,
+        "retries": 2,
+        "backoff": 0.5,
+        "cache_ttl_days": 30,
+        "retry_base_min": 10,
+        "retry_max_hours": 24,
+        "hedge_delay": 1.5,
+        "overrides_file": "game_overrides.json"
+    },
     "discord": {
         "enabled": False,
         "client_id": ""
@@ -27,7 +60,26 @@ DEFAULT_CONFIG = {
         "mqtt_port": 1883,
         "mqtt_user": "",
         "mqtt_pass": "",
-        "mqtt_topic": "homeassistant/sensor/ps5_custom/state"
+        "mqtt_topic": "homeassistant/sensor/ps5_custom/state",
+        "discovery": False,
+        "discovery_prefix": "homeassistant",
+        "base_topic": "ps5_monitor",
+        "device_name": "PS5",
+        "qos": 1,
+        "queue_size": 500,
+        "batch_size": 50,
+        "spool": False,
+        "spool_file": "haos_spool.json",
+        "reconnect_min": 2,
+        "reconnect_max": 120
+    },
+    "metrics": {
+        "enabled": False,
+        "host": "127.0.0.1",
+        "port": 9108
+    },
+    "tracing": {
+        "export_file": ""
     },
     "plugins": {}
 }
@@ -109,17 +161,3 @@ class Logger:
             except: pass
             
         return formatted
-
-def load_cache():
-    if os.path.exists(CACHE_FILE):
-        try:
-            with open(CACHE_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-        except: pass
-    return {}
-
-def save_cache(data):
-    try:
-        with open(CACHE_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=4, ensure_ascii=False)
-    except: pass
\ No newline at end of file
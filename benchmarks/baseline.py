@@ -0,0 +1,173 @@
+"""
+Pre-optimization implementations, kept only as the "before" side of the
+benchmarks (and as the parity reference of the tests). Not used by the app.
+"""
+import re
+
+# === KLOG FRAMING (PS5Core._monitor_klog before LineFramer) ===
+def legacy_frame(chunks, process=None):
+    """Decodes every read to str and splits the growing buffer one line at a time."""
+    buffer = ""
+    lines = 0
+    for data in chunks:
+        buffer += bytes(data).decode("utf-8", errors="ignore")
+        while "\n" in buffer:
+            line, buffer = buffer.split("\n", 1)
+            if process: process(line)
+            lines += 1
+    return lines
+
+# === KLOG CLASSIFICATION (PS5Core._process_log_line before classify_line) ===
+SCENE_PATTERN = re.compile(r"OnFocusActiveSceneChanged\s*\[(.*?)\]\s*->\s*\[(.*?)\]")
+ID_EXTRACTOR = re.compile(r"(?:Render\.|titleId\s*[:=]\s*|title_id\s*=\s*['\"\[]?|SplashScreen\.)([A-Z]{4}[0-9]{5})", re.IGNORECASE)
+DEBUG_PATTERN = re.compile(r"id_debug_settings")
+PROHIBITION_PATTERN = re.compile(r"ProhibitionFlag.*?newFlags\s*=\s*\[.*?,([A-Z]{4}[0-9]{5}),\]")
+IGNORED_IDS = {
+    "NPXS40003", "NPXS40093", "NPXS40094", "NPXS40095", "NPXS40096",
+    "NPXS40100", "NPXS40109", "NPXS40112"
+}
+
+class LegacyClassifier:
+    """The original line handler; records the transitions it would have triggered."""
+    def __init__(self):
+        self.current_title_id = None
+        self.transitions = []
+
+    def process(self, line):
+        new_id = None
+
+        proh_match = PROHIBITION_PATTERN.search(line)
+        if proh_match:
+            new_id = proh_match.group(1)
+
+        if not new_id:
+            scene_match = SCENE_PATTERN.search(line)
+            if scene_match:
+                source = scene_match.group(1)
+                destination = scene_match.group(2)
+
+                if "FocusCapture" in destination or "ReactModalScene" in destination:
+                    return
+
+                if "id_debug_settings" in destination:
+                    new_id = "DEBUG_SETTINGS"
+                else:
+                    id_match = ID_EXTRACTOR.search(destination)
+                    if id_match: new_id = id_match.group(1)
+
+                if not new_id and ("AppScreen" in destination or "ApplicationScreenScene" in destination):
+                    id_match_src = ID_EXTRACTOR.search(source)
+                    if id_match_src: new_id = id_match_src.group(1)
+
+        if not new_id:
+            if "Unload" in line: return
+
+            id_match = ID_EXTRACTOR.search(line)
+            if id_match:
+                found = id_match.group(1)
+                if found in IGNORED_IDS: return
+                if found.startswith("NPXS") or found.startswith("CUSA") or found.startswith("PPSA"):
+                    if found != self.current_title_id:
+                        new_id = found
+
+            if DEBUG_PATTERN.search(line):
+                new_id = "DEBUG_SETTINGS"
+
+        if new_id and new_id != self.current_title_id:
+            if new_id in IGNORED_IDS: return
+            self.transitions.append(new_id)
+            self.current_title_id = new_id
+
+# === METADATA HTTP (PS5Core._fetch_online before HttpClient) ===
+def cold_get(url, headers=None, timeout=10):
+    """One throw-away client per lookup: a fresh connection (and TLS handshake) every time."""
+    import httpx
+    with httpx.Client(timeout=timeout, headers=headers, follow_redirects=True) as client:
+        r = client.get(url)
+        return r.status_code, r.text
+
+# === PATCH-SITE PAGE (PatchSiteProvider.lookup before GamePageParser) ===
+def legacy_extract(html, base_url):
+    """Full BeautifulSoup DOM of the page; returns (name, image, background)."""
+    from bs4 import BeautifulSoup
+    soup = BeautifulSoup(html, 'html.parser')
+    name = None
+
+    h1 = soup.select_one("h1.bd-title")
+    if h1: name = h1.get_text(strip=True)
+
+    if not name:
+        t = soup.find('title')
+        if t and 'Patches' in t.get_text():
+            name = t.get_text(strip=True).split(' - ')[0]
+
+    img_url = "ps5"
+    bg_url = ""
+
+    icon_div = soup.select_one("div.game-icon.secondary")
+    if icon_div and "style" in icon_div.attrs:
+        match = re.search(r'url\((?:&quot;|")?(.*?)(?:&quot;|")?\)', icon_div["style"])
+        if match:
+            u = match.group(1)
+            img_url = base_url + u if u.startswith("/") else u
+            bg_url = img_url
+
+    return name, img_url, bg_url
+
+# === WEB DASHBOARD (plugins/web_server.py.example before pre-rendered pages) ===
+def legacy_dashboard_server(address, state):
+    """Single-threaded HTTP/1.0 server rendering the page on every request."""
+    import json
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+
+    class StatusHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == '/api':
+                self.send_response(200)
+                self.send_header('Content-type', 'application/json')
+                self.send_header('Access-Control-Allow-Origin', '*')
+                self.end_headers()
+                self.wfile.write(json.dumps(state, default=lambda o: o.to_dict()).encode('utf-8'))
+                return
+
+            self.send_response(200)
+            self.send_header('Content-type', 'text/html; charset=utf-8')
+            self.end_headers()
+
+            game_img = state.get("game", {}).get("image", "")
+            img_html = f'<img src="{game_img}" width="200">' if game_img.startswith('http') else ''
+
+            html = f"""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>PS5 Status Monitor</title>
+            <meta http-equiv="refresh" content="5">
+            <style>
+                body {{ font-family: sans-serif; background: #121212; color: white; display: flex; justify-content: center; align-items: center; height: 100vh; margin: 0; }}
+                .card {{ background: #1e1e1e; padding: 30px; border-radius: 15px; box-shadow: 0 4px 15px rgba(0,0,0,0.5); text-align: center; width: 350px; }}
+                .status {{ font-weight: bold; color: #4cc2ff; margin-bottom: 10px; }}
+                .game {{ font-size: 24px; margin: 15px 0; }}
+                .stats {{ font-size: 14px; color: #888; margin-top: 20px; }}
+                img {{ border-radius: 10px; margin-top: 15px; max-width: 100%; box-shadow: 0 4px 10px rgba(0,0,0,0.3); }}
+            </style>
+        </head>
+        <body>
+            <div class="card">
+                <div class="status">STATUS: {state.get('status')}</div>
+                <div class="game">{state.get('game', {}).get('name', 'None')}</div>
+                {img_html}
+                <div class="stats">
+                    CPU: {state.get('stats', {}).get('cpu_temp', 'N/A')} |
+                    SoC: {state.get('stats', {}).get('soc_temp', 'N/A')}
+                </div>
+            </div>
+        </body>
+        </html>
+        """
+            self.wfile.write(html.encode('utf-8'))
+
+        def log_message(self, format, *args):
+            return
+
+    return HTTPServer(address, StatusHandler)
@@ -0,0 +1,66 @@
+"""
+KLOG line classification throughput: the original five-scan handler
+against classify_line (literal prefilter + typed match).
+
+    python benchmarks/bench_classifier.py [--lines 200000] [--recording klog_recordings]
+
+Without --recording, the golden corpus is mixed into mostly-noise traffic.
+"""
+import argparse
+import os
+import random
+
+from common import BASE_DIR, best_of, report
+from bench_framer import NOISE
+from benchmarks.baseline import LegacyClassifier
+from app.klog import IGNORED_IDS, LineFramer, classify_line, iter_recording
+
+CORPUS = os.path.join(BASE_DIR, "tests", "data", "klog_corpus.txt")
+
+def synthetic_lines(count, noise_ratio=0.98, seed=1):
+    with open(CORPUS, encoding="utf-8") as f:
+        corpus = f.read().splitlines()
+    rng = random.Random(seed)
+    return [rng.choice(NOISE).format(n=rng.randrange(100000)) if rng.random() < noise_ratio else rng.choice(corpus)
+            for _ in range(count)]
+
+def recorded_lines(path):
+    framer = LineFramer()
+    lines = []
+    for _, chunk in iter_recording(path): lines += framer.feed(chunk)
+    return lines
+
+def run_legacy(lines):
+    legacy = LegacyClassifier()
+    for line in lines: legacy.process(line)
+    return legacy.transitions
+
+def run_new(lines):
+    current, result = None, []
+    for line in lines:
+        match = classify_line(line)
+        if not match or match.title_id == current or match.title_id in IGNORED_IDS: continue
+        current = match.title_id
+        result.append(current)
+    return result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=200000)
+    parser.add_argument("--recording", help="KLOG recording file or folder to classify instead")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    lines = recorded_lines(args.recording) if args.recording else synthetic_lines(args.lines)
+    rows = []
+    results = {}
+    for label, fn in (("original handler", run_legacy), ("classify_line", run_new)):
+        elapsed, results[label] = best_of(lambda: fn(lines), args.repeat)
+        rows.append((label, {"lines/s": f"{len(lines) / elapsed:,.0f}", "us/line": f"{elapsed / len(lines) * 1e6:.2f}",
+                             "transitions": str(len(results[label]))}))
+    report(f"KLOG classification, {len(lines):,} lines", rows)
+    if results["original handler"] != results["classify_line"]:
+        print("\n  WARNING: transition sequences differ")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+KLOG framing throughput: the old str-split loop against LineFramer.
+
+    python benchmarks/bench_framer.py [--mb 8] [--recording klog_recordings]
+
+Without --recording, a synthetic burst of kernel-log lines is used.
+"""
+import argparse
+import random
+
+from common import best_of, report
+from benchmarks.baseline import legacy_frame
+from app.klog import LineFramer, iter_recording
+
+NOISE = [
+    "<118>[SceShellCore] AppMgr: memory budget check ok pid=0x{n:x}",
+    "<118>[SceAvSetting] hdmi link status changed ({n})",
+    "<118>[SceShellUI] JSC GC cycle {n} freed 1843 KB in 3 ms",
+    "<118>[SceNpManager] token refresh scheduled in {n} s",
+    "<118>[SceSysCore] thermal: fan step {n} -> {n} rpm target 2{n}00",
+]
+
+def synthetic_burst(megabytes, seed=1):
+    rng = random.Random(seed)
+    lines = []
+    size = 0
+    while size < megabytes * 1024 * 1024:
+        line = rng.choice(NOISE).format(n=rng.randrange(100000)) + " °C" * rng.randrange(2)
+        lines.append(line)
+        size += len(line.encode("utf-8")) + 1
+    return ("\n".join(lines) + "\n").encode("utf-8")
+
+def chunked(data, size):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+def run_new(chunks):
+    framer = LineFramer()
+    return sum(len(framer.feed(chunk)) for chunk in chunks)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mb", type=float, default=8, help="size of the synthetic burst")
+    parser.add_argument("--recording", help="KLOG recording file or folder to replay instead")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.recording:
+        data = b"".join(chunk for _, chunk in iter_recording(args.recording))
+        source = args.recording
+    else:
+        data = synthetic_burst(args.mb)
+        source = "synthetic burst"
+
+    rows = []
+    for read_size in (4096, 65536):
+        chunks = chunked(data, read_size)
+        for label, fn in (("old (str split)", lambda: legacy_frame(chunks)), ("LineFramer", lambda: run_new(chunks))):
+            elapsed, lines = best_of(fn, args.repeat)
+            rows.append((f"{label}, {read_size // 1024} KB reads", {
+                "MB/s": f"{len(data) / elapsed / 1e6:.1f}",
+                "lines/s": f"{lines / elapsed:,.0f}",
+                "lines": f"{lines:,}"
+            }))
+    report(f"KLOG framing, {len(data) / 1e6:.1f} MB ({source})", rows)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Metadata lookups through a throw-away httpx.Client per request (old) and
+through the shared, keep-alive HttpClient, against a local stand-in of a
+patch site.
+
+    python benchmarks/bench_http_client.py [--lookups 200] [--handshake-ms 30]
+
+--handshake-ms delays every new connection on the server side, standing in
+for the TCP + TLS setup a real site costs on each cold lookup.
+"""
+import argparse
+import statistics
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from common import report
+from benchmarks.baseline import cold_get
+from app.http_client import HttpClient
+
+PAGE = ("<html><head><title>Stand-in Game - Patches</title></head><body>"
+        "<h1 class=\"bd-title\">Stand-in Game</h1>"
+        "<div class=\"game-icon secondary\" style=\"background-image: url(&quot;/icon.png&quot;)\"></div>"
+        + "<p>changelog entry</p>" * 2000 + "</body></html>").encode("utf-8")
+
+class PatchSite(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        if self.server.handshake: time.sleep(self.server.handshake) # Once per connection
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(PAGE)))
+        self.end_headers()
+        self.wfile.write(PAGE)
+
+    def log_message(self, format, *args):
+        return
+
+def measure(lookup, count):
+    latencies = []
+    for i in range(count):
+        started = time.perf_counter()
+        lookup(i)
+        latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    return {"total s": f"{sum(latencies):.2f}",
+            "p50 ms": f"{statistics.median(latencies) * 1000:.2f}",
+            "p99 ms": f"{latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000:.2f}"}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lookups", type=int, default=200)
+    parser.add_argument("--handshake-ms", type=float, default=30)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), PatchSite)
+    server.handshake = args.handshake_ms / 1000
+    server.connections = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f"http://127.0.0.1:{server.server_address[1]}"
+
+    rows = []
+    cold = measure(lambda i: cold_get(f"{base}/CUSA{i:05d}"), args.lookups)
+    cold["connections"] = str(server.connections)
+    rows.append(("cold client per lookup", cold))
+
+    server.connections = 0
+    http = HttpClient()
+    pooled = measure(lambda i: http.get(f"{base}/CUSA{i:05d}").text, args.lookups)
+    pooled["connections"] = str(server.connections)
+    rows.append(("pooled HttpClient", pooled))
+    http.close()
+
+    report(f"{args.lookups} lookups, {len(PAGE) // 1024} KB page, {args.handshake_ms:g} ms per new connection", rows)
+    server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+CPU time and peak memory per patch-site lookup: the full BeautifulSoup DOM
+(old) against the streaming GamePageParser that stops once name and icon
+are known, over the saved page corpus of the tests.
+
+    python benchmarks/bench_page_parser.py [--pages tests/data/pages] [--rounds 20]
+"""
+import argparse
+import glob
+import os
+import time
+import tracemalloc
+
+from common import BASE_DIR, report
+from benchmarks.baseline import legacy_extract
+from app.providers import GamePageParser
+
+BASE_URL = "https://prosperopatches.com"
+CHUNK = 4096 # httpx iter_text() hands out roughly one read at a time
+
+def streamed(html):
+    """Same feeding loop as PatchSiteProvider.lookup."""
+    parser = GamePageParser()
+    for i in range(0, len(html), CHUNK):
+        parser.feed(html[i:i + CHUNK])
+        if parser.complete: break
+    else:
+        parser.close()
+    return parser.result(BASE_URL)
+
+def measure(extract, pages, rounds):
+    cpu = []
+    for _ in range(rounds):
+        for html in pages:
+            started = time.process_time()
+            extract(html)
+            cpu.append(time.process_time() - started)
+
+    # Peak allocations of a single lookup, page text itself excluded
+    peaks = []
+    for html in pages:
+        tracemalloc.start()
+        extract(html)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+    return {"cpu ms/lookup": f"{sum(cpu) / len(cpu) * 1000:.3f}",
+            "peak KB avg": f"{sum(peaks) / len(peaks) / 1024:.1f}",
+            "peak KB max": f"{max(peaks) / 1024:.1f}"}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pages", default=os.path.join(BASE_DIR, "tests", "data", "pages"),
+                        help="folder of saved .html pages")
+    parser.add_argument("--rounds", type=int, default=20)
+    args = parser.parse_args()
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(args.pages, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages.append(f.read())
+    if not pages: parser.error(f"no .html pages in {args.pages}")
+
+    for html in pages:
+        assert streamed(html) == legacy_extract(html, BASE_URL)
+
+    size = sum(len(p) for p in pages) / len(pages) / 1024
+    report(f"{len(pages)} pages, {size:.1f} KB average, {args.rounds} rounds", [
+        ("BeautifulSoup (old)", measure(lambda html: legacy_extract(html, BASE_URL), pages, args.rounds)),
+        ("GamePageParser streaming", measure(streamed, pages, args.rounds)),
+    ])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Cold start of the headless app: import time of main.py (python -X importtime)
+and time from process launch to the first KLOG connection, against a local
+stand-in KLOG server.
+
+    python benchmarks/bench_startup.py [--runs 5] [--against <git revision>]
+
+Every run uses a throw-away copy of the app with its own config.json
+(Discord, HAOS and metrics disabled, KLOG on 127.0.0.1), so the checkout's
+settings and caches are never touched. --against measures another
+revision the same way, e.g. the commit before the lazy imports.
+"""
+import argparse
+import json
+import os
+import re
+import shutil
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from common import BASE_DIR, report
+
+IMPORT_MAIN = "import sys; sys.argv.append('--nogui'); import main"
+IMPORT_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+STARTUP_LOG = re.compile(r"first KLOG connection (\d+) ms")
+
+def copy_tree(dest, revision=None):
+    """The app (app/ and main.py) of the working tree or of a git revision."""
+    if revision:
+        archive = subprocess.run(["git", "-C", BASE_DIR, "archive", revision, "app", "main.py"],
+                                 check=True, capture_output=True).stdout
+        subprocess.run(["tar", "-x", "-C", dest], input=archive, check=True)
+    else:
+        shutil.copytree(os.path.join(BASE_DIR, "app"), os.path.join(dest, "app"),
+                        ignore=shutil.ignore_patterns("__pycache__"))
+        shutil.copy(os.path.join(BASE_DIR, "main.py"), dest)
+
+def write_config(dest, klog_port):
+    config = {
+        "general": {"ps5_ip": "127.0.0.1", "klog_port": klog_port},
+        "discord": {"enabled": False},
+        "haos": {"enabled": False},
+        "metrics": {"enabled": False}
+    }
+    with open(os.path.join(dest, "config.json"), "w", encoding="utf-8") as f:
+        json.dump(config, f)
+
+def import_times(dest):
+    """Import time of main and of each module it imports directly, in ms."""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", IMPORT_MAIN],
+                            cwd=dest, capture_output=True, text=True, check=True)
+    children, times = {}, {}
+    # Children are listed before their parent, two spaces deeper
+    for match in IMPORT_LINE.finditer(result.stderr):
+        cumulative, depth, name = int(match.group(2)) / 1000, len(match.group(3)), match.group(4)
+        if depth == 3: children[name] = cumulative
+        elif depth == 1:
+            if name == "main":
+                times = dict(children, main=cumulative)
+            children = {}
+    return times
+
+def first_connect(dest, listener):
+    """Launch to first KLOG accept (ms, seen by the server) and the app's own log figure."""
+    started = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "main.py", "--nogui"], cwd=dest,
+                            stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    try:
+        listener.settimeout(30)
+        conn, _ = listener.accept()
+        elapsed = (time.perf_counter() - started) * 1000
+        conn.close()
+    finally:
+        proc.terminate()
+        output = proc.communicate(timeout=30)[0]
+    logged = STARTUP_LOG.search(output)
+    return elapsed, int(logged.group(1)) if logged else None
+
+def measure(label, runs, revision=None):
+    with tempfile.TemporaryDirectory(prefix="ps5-startup-") as dest:
+        copy_tree(dest, revision)
+        listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        write_config(dest, listener.getsockname()[1])
+        try:
+            import_times(dest) # Warm-up: bytecode compiled, files in the page cache
+            imports = [import_times(dest) for _ in range(runs)]
+            connects = [first_connect(dest, listener) for _ in range(runs)]
+        finally:
+            listener.close()
+
+    total = statistics.median(t.get("main", 0) for t in imports)
+    logged = [ms for _, ms in connects if ms is not None]
+    row = {"import main ms": f"{total:.0f}",
+           "to KLOG ms": f"{statistics.median(ms for ms, _ in connects):.0f}",
+           "logged ms": f"{statistics.median(logged):.0f}" if logged else "-"}
+
+    heaviest = {}
+    for name in imports[0]:
+        if name == "main": continue
+        heaviest[name] = statistics.median(t.get(name, 0) for t in imports)
+    return (label, row), sorted(heaviest.items(), key=lambda item: -item[1])[:8]
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--against", help="git revision to compare with")
+    args = parser.parse_args()
+
+    results = []
+    if args.against: results.append(measure(args.against, args.runs, args.against))
+    results.append(measure("working tree", args.runs))
+
+    report(f"python main.py --nogui, median of {args.runs} runs", [row for row, _ in results])
+    for (label, _), heaviest in results:
+        report(f"Slowest imports of main ({label})", [(name, {"ms": f"{ms:.1f}"}) for name, ms in heaviest])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Load test of the web dashboard plugin (plugins/web_server.py.example):
+many concurrent clients hammering one path, against the previous
+single-threaded server that rendered the page on every request.
+
+    python benchmarks/bench_web_server.py [--clients 32] [--seconds 5] [--path /]
+                                          [--revalidate] [--slow-clients 1]
+
+Each server runs in its own process so the client threads do not compete
+with it for the GIL. Clients keep their connection open when the server
+allows it and ask for gzip like a browser; --revalidate sends the last
+ETag back (If-None-Match), as a refreshing wall screen does.
+--slow-clients connections send half a request and then stall, like a
+screen on a bad Wi-Fi link.
+"""
+import argparse
+import http.client
+import importlib.util
+import multiprocessing
+import os
+import socket
+import statistics
+import threading
+import time
+
+from common import BASE_DIR, report
+
+PLUGIN = os.path.join(BASE_DIR, "plugins", "web_server.py.example")
+STATE = {
+    "status": "Playing",
+    "game": {"name": "Returnal", "title_id": "PPSA01284", "image": "https://example.net/PPSA01284/icon0.png",
+             "background": "", "start_timestamp": 1700000000},
+    "stats": {"cpu_temp": "52 °C", "soc_temp": "48 °C", "frequency": "3200 MHz"},
+    "version": 42
+}
+
+def load_plugin():
+    """Imports the example plugin from its .example file."""
+    from importlib.machinery import SourceFileLoader
+    loader = SourceFileLoader("web_server", PLUGIN)
+    module = importlib.util.module_from_spec(importlib.util.spec_from_loader("web_server", loader))
+    loader.exec_module(module)
+    return module
+
+def serve(kind, ready):
+    address = ("127.0.0.1", 0)
+    if kind == "old":
+        from benchmarks.baseline import legacy_dashboard_server
+        server = legacy_dashboard_server(address, STATE)
+    else:
+        module = load_plugin()
+        plugin = module.Plugin()
+        plugin.enabled = True
+        plugin.on_update(STATE)
+        server = module.ThreadingHTTPServer(address, module.StatusHandler)
+        server.plugin = plugin
+    server.handle_error = lambda request, client_address: None # Resets under load are counted client-side
+    ready.put(server.server_address[1])
+    server.serve_forever()
+
+def client(port, path, revalidate, deadline, results):
+    headers = {"Accept-Encoding": "gzip"}
+    latencies, errors, conn = [], 0, None
+    while time.perf_counter() < deadline:
+        try:
+            if conn is None: conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            started = time.perf_counter()
+            conn.request("GET", path, headers=headers)
+            r = conn.getresponse()
+            r.read()
+            latencies.append(time.perf_counter() - started)
+            if revalidate and r.getheader("ETag"): headers["If-None-Match"] = r.getheader("ETag")
+            if r.will_close:
+                conn.close()
+                conn = None
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            if conn: conn.close()
+            conn = None
+    if conn: conn.close()
+    results.append((latencies, errors))
+
+def run(kind, args):
+    ready = multiprocessing.Queue()
+    server = multiprocessing.Process(target=serve, args=(kind, ready), daemon=True)
+    server.start()
+    try:
+        port = ready.get(timeout=30)
+        stalled = []
+        for _ in range(args.slow_clients):
+            sock = socket.create_connection(("127.0.0.1", port))
+            sock.sendall(b"GET / HTTP/1.1\r\nHost: dashboard\r\n") # Headers never finished
+            stalled.append(sock)
+        results = []
+        deadline = time.perf_counter() + args.seconds
+        threads = [threading.Thread(target=client, args=(port, args.path, args.revalidate, deadline, results))
+                   for _ in range(args.clients)]
+        for t in threads: t.start()
+        for t in threads: t.join()
+        for sock in stalled: sock.close()
+    finally:
+        server.terminate()
+        server.join()
+
+    latencies = sorted(l for ls, _ in results for l in ls)
+    errors = sum(e for _, e in results)
+    if not latencies: return {"req/s": "0", "p50 ms": "-", "p99 ms": "-", "errors": str(errors)}
+    return {"req/s": f"{len(latencies) / args.seconds:.0f}",
+            "p50 ms": f"{statistics.median(latencies) * 1000:.2f}",
+            "p99 ms": f"{latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)] * 1000:.2f}",
+            "errors": str(errors)}
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--path", default="/")
+    parser.add_argument("--revalidate", action="store_true", help="send If-None-Match with the last ETag")
+    parser.add_argument("--slow-clients", type=int, default=0, help="stalled connections held open meanwhile")
+    args = parser.parse_args()
+
+    mode = ", revalidating" if args.revalidate else ""
+    if args.slow_clients: mode += f", {args.slow_clients} stalled"
+    report(f"GET {args.path}, {args.clients} concurrent clients, {args.seconds:g} s{mode}", [
+        ("render per request (old)", run("old", args)),
+        ("threaded, pre-rendered", run("new", args)),
+    ])
+
+if __name__ == "__main__":
+    main()
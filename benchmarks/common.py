@@ -0,0 +1,25 @@
+import os
+import sys
+import time
+
+# Benchmarks run as scripts (python benchmarks/bench_x.py) from anywhere
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BASE_DIR not in sys.path: sys.path.insert(0, BASE_DIR)
+
+def best_of(fn, repeat=5):
+    """Best wall time of 'repeat' runs, in seconds, and the last result."""
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def report(title, rows):
+    """Prints an aligned table: rows are (label, {column: value})."""
+    print(f"\n{title}")
+    columns = list(rows[0][1])
+    print(f"  {'':<28}" + "".join(f"{c:>16}" for c in columns))
+    for label, values in rows:
+        print(f"  {label:<28}" + "".join(f"{values[c]:>16}" for c in columns))
@@ -4,12 +4,24 @@ import time
 import signal
 
 from app.utils import ConfigManager, Logger
-from app.core import PS5Core
+from app.core import PS5Core, SYSTEM_TITLES
+from app.klog import KlogReplayServer
+from app.events import EventBus, LATEST, EVENT_TYPES
+from app.plugin_sdk import PluginBase
 from app.discord import DiscordHandler
 from app.haos import HAOSHandler
 from app.plugin_manager import PluginManager
+from app import metrics
+
+def get_cli_option(name, default=None):
+    if name in sys.argv:
+        idx = sys.argv.index(name)
+        if idx + 1 < len(sys.argv): return sys.argv[idx + 1]
+    return default
 
 HEADLESS_MODE = "--nogui" in sys.argv
+REPLAY_PATH = get_cli_option("--replay")
+REPLAY_SPEED = float(get_cli_option("--replay-speed", 1.0))
 ICON_FILE = "icon.ico"
 
 if not HEADLESS_MODE:
@@ -22,6 +34,38 @@ if not HEADLESS_MODE:
     ctk.set_appearance_mode("Dark")
     ctk.set_default_color_theme("blue")
 
+def setup_replay(core):
+    """Serves a KLOG recording locally and points the core at it (--replay)."""
+    if not REPLAY_PATH: return None
+    port = ConfigManager().get("general", "klog_port")
+    server = KlogReplayServer(REPLAY_PATH, port, REPLAY_SPEED, loop="--replay-loop" in sys.argv)
+    server.start()
+    core.klog_address = ("127.0.0.1", port)
+    return server
+
+def setup_metrics():
+    """Starts the Prometheus /metrics endpoint if enabled in config."""
+    config = ConfigManager()
+    if not config.get("metrics", "enabled"): return None
+    return metrics.serve(config.get("metrics", "host"), int(config.get("metrics", "port")))
+
+def subscribe_plugins(bus, plugin_manager):
+    """Gives every loaded plugin its own queue; called after each (re)load."""
+    bus.unsubscribe_prefix("plugin:")
+    for plugin in plugin_manager.get_plugins():
+        subscribe_plugin(bus, plugin)
+
+def subscribe_plugin(bus, plugin, state=None):
+    """Subscribes one plugin; 'state' (the current snapshot) is delivered first to late plugins."""
+    pid = plugin.manifest['id']
+    # Full snapshots only for plugins that implement on_update
+    if type(plugin).on_update is not PluginBase.on_update:
+        sub = bus.subscribe(f"plugin:{pid}", plugin.on_update, policy=plugin.queue_policy)
+        if state and state.get("version"): sub.put(state)
+    if plugin.event_kinds:
+        kinds = [EVENT_TYPES.get(k, k) for k in plugin.event_kinds]
+        bus.subscribe(f"plugin:{pid}:events", plugin.on_event, policy=plugin.queue_policy, kinds=kinds)
+
 class HeadlessApp:
     def __init__(self):
         self.config = ConfigManager()
@@ -29,7 +73,16 @@ class HeadlessApp:
         self.haos_handler = HAOSHandler()
         self.plugin_manager = PluginManager()
         
-        self.core = PS5Core(self.on_core_update)
+        # Each sink gets its own queue so a slow one can't stall the KLOG reader
+        self.bus = EventBus()
+        self.bus.subscribe("discord", self.discord_handler.update, policy=LATEST)
+        self.bus.subscribe("haos", self.haos_handler.update, policy=LATEST)
+        self.bus.subscribe("log", self.on_core_update)
+
+        self.core = PS5Core(self.bus.publish, self.bus.publish)
+        self.core.metadata.plugin_source = self.plugin_manager.get_metadata_providers
+        self.core.stats_demand = self.stats_wanted
+        self.plugin_manager.stats_history = self.core.stats_history
         self.running = True
 
         signal.signal(signal.SIGINT, self.shutdown)
@@ -38,29 +91,35 @@ class HeadlessApp:
     def run(self):
         Logger.log("Starting PS5 Monitor (Headless Mode)...")
         
-        self.plugin_manager.discover_plugins()
+        # Plugins waiting for a dependency install come online later, via on_plugins_ready
+        self.plugin_manager.discover_plugins(on_ready=self.on_plugins_ready)
         for plugin in self.plugin_manager.get_plugins():
-            manifest = plugin.get_manifest()
-            pid = manifest['id']
-            p_config = self.config.get("plugins", pid) or {}
-            plugin.on_load(p_config)
+            self.load_plugin(plugin)
+        subscribe_plugins(self.bus, self.plugin_manager)
 
         if self.config.get("discord", "enabled"): self.discord_handler.connect()
         if self.config.get("haos", "enabled"): self.haos_handler.connect()
         
+        self.replay_server = setup_replay(self.core)
+        self.metrics_server = setup_metrics()
         self.core.start()
         
         while self.running:
             time.sleep(1)
 
-    def on_core_update(self, data):
-        self.discord_handler.update(data)
-        self.haos_handler.update(data)
-        
-        for plugin in self.plugin_manager.get_plugins():
-            try: plugin.on_update(data)
-            except Exception as e: Logger.log(f"Plugin Error: {e}")
+    def load_plugin(self, plugin):
+        p_config = self.config.get("plugins", plugin.manifest['id']) or {}
+        plugin.on_load(p_config)
+
+    def on_plugins_ready(self, plugins):
+        for plugin in plugins:
+            self.load_plugin(plugin)
+            subscribe_plugin(self.bus, plugin, self.core.state)
+
+    def stats_wanted(self):
+        return bool(self.config.get("haos", "enabled")) or self.plugin_manager.wants_stats()
 
+    def on_core_update(self, data):
         status = data.get("status")
         game = data.get("game", {})
         if status in ['Playing', 'Online']:
@@ -70,6 +129,7 @@ class HeadlessApp:
         Logger.log("Shutting down...")
         self.running = False
         self.core.stop()
+        self.bus.stop()
         self.discord_handler.disconnect()
         self.haos_handler.disconnect()
         for plugin in self.plugin_manager.get_plugins():
@@ -132,7 +192,15 @@ if not HEADLESS_MODE:
             self.haos_handler = HAOSHandler()
             self.plugin_manager = PluginManager()
             
-            self.core = PS5Core(self.on_core_update)
+            self.bus = EventBus()
+            self.bus.subscribe("discord", self.discord_handler.update, policy=LATEST)
+            self.bus.subscribe("haos", self.haos_handler.update, policy=LATEST)
+            self.bus.subscribe("gui", self.on_core_update, policy=LATEST)
+
+            self.core = PS5Core(self.bus.publish, self.bus.publish)
+            self.core.metadata.plugin_source = self.plugin_manager.get_metadata_providers
+            self.core.stats_demand = self.stats_wanted
+            self.plugin_manager.stats_history = self.core.stats_history
             
             self.protocol("WM_DELETE_WINDOW", self.on_close_request)
             self.bind("<Unmap>", self.on_minimize_event)
@@ -159,21 +227,32 @@ if not HEADLESS_MODE:
             if self.config.get("haos", "enabled"): 
                 self.haos_handler.connect()
             
+            self.replay_server = setup_replay(self.core)
+            self.metrics_server = setup_metrics()
             self.core.start()
 
         def reload_plugins_logic(self):
             self.log_gui_safe("Scanning plugins...")
+            self.bus.unsubscribe_prefix("plugin:")
             self.plugin_manager.unload_all()
-            self.plugin_manager.discover_plugins()
-            self._init_plugins_config()
+            self.plugin_manager.discover_plugins(on_ready=self.on_plugins_ready)
+            self._init_plugins_config(self.plugin_manager.get_plugins())
+            subscribe_plugins(self.bus, self.plugin_manager)
             self.after(0, self._refresh_plugin_tabs)
 
-        def _init_plugins_config(self):
-            for plugin in self.plugin_manager.get_plugins():
-                pid = plugin.get_manifest()['id']
-                saved_cfg = self.config.get("plugins", pid) or {}
+        def on_plugins_ready(self, plugins):
+            """Plugins that finished installing their dependencies in the background."""
+            self._init_plugins_config(plugins)
+            for plugin in plugins:
+                subscribe_plugin(self.bus, plugin, self.core.state)
+            self.after(0, self._refresh_plugin_tabs)
+
+        def _init_plugins_config(self, plugins):
+            for plugin in plugins:
+                manifest = plugin.manifest
+                saved_cfg = self.config.get("plugins", manifest['id']) or {}
                 
-                defaults = {f['key']: f['default'] for f in plugin.get_manifest()['fields']}
+                defaults = {f['key']: f['default'] for f in manifest['fields']}
                 defaults['enabled'] = False
                 
                 final_cfg = {**defaults, **saved_cfg}
@@ -191,7 +270,7 @@ if not HEADLESS_MODE:
 
         def _render_plugin_tabs(self):
             for plugin in self.plugin_manager.get_plugins():
-                manifest = plugin.get_manifest()
+                manifest = plugin.manifest
                 pid = manifest['id']
                 p_name = manifest['name']
                 
@@ -240,7 +319,7 @@ if not HEADLESS_MODE:
                 self.plugin_widgets[pid]["btn"] = btn
 
         def save_plugin(self, plugin):
-            manifest = plugin.get_manifest()
+            manifest = plugin.manifest
             pid = manifest['id']
             widgets = self.plugin_widgets.get(pid)
             if not widgets: return
@@ -258,6 +337,7 @@ if not HEADLESS_MODE:
 
             self.config.set("plugins", pid, new_config)
             plugin.on_load(new_config)
+            self.core.request_stats()
             
             self._animate_save_button(widgets["btn"], "Save Settings")
             self.log_gui_safe(f"Saved: {manifest['name']}")
@@ -283,14 +363,12 @@ if not HEADLESS_MODE:
             button.configure(text="Saved!")
             self.after(2000, lambda: button.configure(text=original_text))
 
-        def on_core_update(self, data):
-            self.discord_handler.update(data)
-            self.haos_handler.update(data)
-            
-            for plugin in self.plugin_manager.get_plugins():
-                try: plugin.on_update(data)
-                except: pass
+        def stats_wanted(self):
+            # The status bar shows temperatures while the window is visible
+            if not self.is_minimized_to_tray: return True
+            return bool(self.config.get("haos", "enabled")) or self.plugin_manager.wants_stats()
 
+        def on_core_update(self, data):
             self.after(0, lambda: self.update_gui_elements(data))
 
         def update_gui_elements(self, data):
@@ -326,6 +404,9 @@ if not HEADLESS_MODE:
 
             self.btn_gen = ctk.CTkButton(tab_gen, text="Save General", command=self.save_general)
             self.btn_gen.pack(pady=5)
+
+            self.btn_refresh_title = ctk.CTkButton(tab_gen, text="Refresh Game Info", command=self.btn_refresh_title_click)
+            self.btn_refresh_title.pack(pady=5)
             
             self.log_textbox = ctk.CTkTextbox(tab_gen, width=600, height=150)
             self.log_textbox.pack(pady=10)
@@ -351,6 +432,10 @@ if not HEADLESS_MODE:
             self.entry_mqtt_user = self.create_input(tab_haos, "User:", self.config.get("haos", "mqtt_user"))
             self.entry_mqtt_pass = self.create_input(tab_haos, "Password:", self.config.get("haos", "mqtt_pass"), show="*")
             self.entry_topic = self.create_input(tab_haos, "Topic:", self.config.get("haos", "mqtt_topic"))
+
+            self.chk_haos_discovery = ctk.CTkCheckBox(tab_haos, text="MQTT Discovery (one entity per field)")
+            if self.config.get("haos", "discovery"): self.chk_haos_discovery.select()
+            self.chk_haos_discovery.pack(pady=10)
             
             self.btn_haos = ctk.CTkButton(tab_haos, text="Save HAOS", command=self.save_haos)
             self.btn_haos.pack(pady=20)
@@ -371,6 +456,13 @@ if not HEADLESS_MODE:
         def btn_reload_click(self):
             threading.Thread(target=self.reload_plugins_logic, daemon=True).start()
 
+        def btn_refresh_title_click(self):
+            title_id = self.core.current_title_id
+            if not title_id or title_id.startswith("NPXS") or title_id in SYSTEM_TITLES:
+                self.log_gui_safe("No game running to refresh.")
+                return
+            self.core.refresh_title(title_id)
+
         def save_general(self):
             self.config.set("general", "ps5_ip", self.entry_ip.get())
             self.log_gui_safe("General Settings Saved.")
@@ -407,6 +499,8 @@ if not HEADLESS_MODE:
             self.config.set("haos", "mqtt_user", self.entry_mqtt_user.get())
             self.config.set("haos", "mqtt_pass", self.entry_mqtt_pass.get())
             self.config.set("haos", "mqtt_topic", self.entry_topic.get())
+            self.config.set("haos", "discovery", bool(self.chk_haos_discovery.get()))
+            self.core.request_stats()
             threading.Thread(target=self._reload_haos_service, args=(enabled,), daemon=True).start()
             self._animate_save_button(self.btn_haos, "Save HAOS")
 
@@ -449,6 +543,7 @@ if not HEADLESS_MODE:
 
         def show_window(self, icon, item):
             self.is_minimized_to_tray = False
+            self.core.request_stats()
             self.deiconify()
             self.center_window(700, 600)
             self.lift()
@@ -459,6 +554,7 @@ if not HEADLESS_MODE:
 
         def quit_app(self):
             self.core.stop()
+            self.bus.stop()
             if self.tray_icon: self.tray_icon.stop()
             self.quit()
             sys.exit()
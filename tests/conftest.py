@@ -0,0 +1,18 @@
+import copy
+import os
+import sys
+
+import pytest
+
+# Run from anywhere: the app package lives next to this folder
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import utils
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    """A fresh ConfigManager on a temporary config.json."""
+    monkeypatch.setattr(utils, "CONFIG_FILE", str(tmp_path / "config.json"))
+    monkeypatch.setattr(utils, "DEFAULT_CONFIG", copy.deepcopy(utils.DEFAULT_CONFIG)) # Merged in, not copied
+    monkeypatch.setattr(utils.ConfigManager, "_instance", None)
+    return utils.ConfigManager()
@@ -0,0 +1,65 @@
+import json
+import time
+
+import pytest
+
+from app.cache import CACHE_VERSION, GameCache
+
+def wait_compacted(cache, timeout=5):
+    deadline = time.monotonic() + timeout
+    while cache.compacting and time.monotonic() < deadline: time.sleep(0.01)
+
+def write(path, data):
+    path.write_text(data if isinstance(data, str) else json.dumps(data), encoding="utf-8")
+
+@pytest.mark.parametrize("content", ["null", "[1, 2]", "42", '"text"', "{broken"])
+def test_damaged_snapshot_is_rewritten(tmp_path, content):
+    path = tmp_path / "cache.json"
+    write(path, content)
+
+    cache = GameCache(str(path))
+    wait_compacted(cache)
+
+    assert len(cache) == 0
+    assert json.loads(path.read_text(encoding="utf-8"))["version"] == CACHE_VERSION
+
+def test_malformed_entries_are_skipped(tmp_path):
+    path = tmp_path / "cache.json"
+    write(path, {
+        "version": CACHE_VERSION,
+        "games": {
+            "CUSA00010": {"name": "Good", "image": "a", "background": "", "fetched_at": 100},
+            "CUSA00011": "not a dict",
+            "CUSA00012": None,
+            "CUSA00013": {"name": "Odd date", "image": "", "background": "", "fetched_at": "yesterday"}
+        },
+        "misses": {"CUSA00020": [1], "CUSA00021": {"reason": "x", "failures": 1, "next_retry": 5}}
+    })
+
+    cache = GameCache(str(path))
+    wait_compacted(cache)
+
+    assert cache.get("CUSA00010")["name"] == "Good"
+    assert "CUSA00011" not in cache and "CUSA00012" not in cache
+    assert cache.fetched_at["CUSA00013"] == 0
+    assert cache.get_miss("CUSA00020") is None
+    assert cache.get_miss("CUSA00021")["failures"] == 1
+    assert set(json.loads(path.read_text(encoding="utf-8"))["games"]) == {"CUSA00010", "CUSA00013"}
+
+def test_malformed_journal_records_are_skipped(tmp_path):
+    path = tmp_path / "cache.json"
+    records = [
+        [1, 2],
+        {"id": 5, "info": {"name": "bad id"}},
+        {"id": "CUSA00030", "info": "not a dict"},
+        {"id": "CUSA00031", "miss": "soon"},
+        {"id": "CUSA00032", "info": {"name": "Journal", "image": "", "background": ""}, "fetched_at": 7}
+    ]
+    (tmp_path / "cache.json.journal").write_text("".join(json.dumps(r) + "\n" for r in records) + '{"id": "torn', encoding="utf-8")
+
+    cache = GameCache(str(path))
+    wait_compacted(cache)
+
+    assert len(cache) == 1
+    assert cache.get("CUSA00032")["name"] == "Journal"
+    assert cache.get_miss("CUSA00031") is None
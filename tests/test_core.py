@@ -0,0 +1,114 @@
+import socket
+import time
+from concurrent.futures import Future
+
+import pytest
+
+from app.cache import GameCache
+from app.core import PS5Core
+from app.providers import OverridesProvider
+
+RETURNAL = {"name": "Returnal", "image": "https://example.net/returnal.png", "background": ""}
+
+class InlinePool:
+    """Runs lookups inside submit(): the done callback fires before submit returns."""
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+@pytest.fixture
+def core(config, tmp_path):
+    updates = []
+    c = PS5Core(updates.append)
+    c.updates = updates
+    c.game_cache = GameCache(path=str(tmp_path / "cache.json"))
+    c.overrides = OverridesProvider(str(tmp_path / "overrides.json"))
+    c.lookups = []
+    def fetch(title_id):
+        c.lookups.append(title_id)
+        return dict(RETURNAL), None
+    c._fetch_online = fetch
+    yield c
+    c.metadata_pool.shutdown(wait=True)
+
+def test_instant_lookup_replaces_placeholder(core):
+    core.metadata_pool = InlinePool()
+    core._update_state("PPSA01284")
+
+    assert [u["game"]["name"] for u in core.updates] == ["Loading (PPSA01284)", "Returnal"]
+    assert core.state["game"]["title_id"] == "PPSA01284"
+
+def test_fast_lookups_never_leave_placeholder(core):
+    for i in range(50):
+        title_id = f"PPSA{10000 + i:05d}"
+        core._update_state(title_id)
+        deadline = time.time() + 5
+        while core.pending_lookups and time.time() < deadline: time.sleep(0.001)
+        assert core.state["game"]["name"] == "Returnal", title_id
+
+def test_stale_entry_refreshed_after_publish(core):
+    core.metadata_pool = InlinePool()
+    core.game_cache.put("PPSA01284", {"name": "Old name", "image": "ps5", "background": ""})
+    core.game_cache.fetched_at["PPSA01284"] = 0 # Expired long ago
+
+    core._update_state("PPSA01284")
+    assert [u["game"]["name"] for u in core.updates] == ["Old name", "Returnal"]
+
+def test_no_lookup_for_known_titles(core):
+    core.metadata_pool = InlinePool()
+    core.game_cache.put("PPSA01284", dict(RETURNAL))
+    core._update_state("PPSA01284")
+    core._update_state("NPXS40002")
+    assert core.lookups == []
+    assert core.state["game"]["name"] == "Home Menu"
+
+def test_refresh_ignores_system_titles(core):
+    core.metadata_pool = InlinePool()
+    for title_id in ("CUSA00001", "ITEM00001", "PPSA00001", "NPXS40999"):
+        core._update_state(title_id)
+        core.refresh_title(title_id)
+        assert core.state["game"]["name"] != f"Unknown ({title_id})"
+    assert core.lookups == []
+
+    core._update_state("PPSA01284")
+    core.refresh_title("PPSA01284")
+    assert core.lookups == ["PPSA01284", "PPSA01284"]
+
+def wait_for(condition, timeout=5):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition(): return True
+        time.sleep(0.01)
+    return False
+
+def test_restart_does_not_mix_readers(core, config):
+    listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    listener.bind(("127.0.0.1", 0))
+    listener.listen()
+    listener.settimeout(5)
+    config.data["general"].update({"ps5_ip": "127.0.0.1", "klog_port": listener.getsockname()[1]})
+    titles = lambda: [u["game"]["title_id"] for u in core.updates]
+
+    core.start()
+    old, _ = listener.accept()
+    assert wait_for(lambda: titles() == ["NPXS40002"])
+
+    # Restarted while the first reader still waits in recv()
+    core.stop()
+    core.start()
+    new, _ = listener.accept()
+    try:
+        old.sendall(b"<118>[SceShellUI] Show SplashScreen.CUSA0")
+        time.sleep(0.2)
+        new.sendall(b"7408 fade-in 250ms\n<118>[SceShellUI] Show SplashScreen.PPSA01284 fade-in 250ms\n")
+        assert wait_for(lambda: "PPSA01284" in titles())
+        assert "CUSA07408" not in titles()
+    finally:
+        core.stop()
+        old.close()
+        new.close()
+        listener.close()
@@ -0,0 +1,254 @@
+import json
+import socket
+import struct
+import threading
+import time
+
+import pytest
+
+from app.haos import HAOSHandler, Outbox
+
+# === OUTBOX ===
+def test_outbox_coalesces_per_topic():
+    box = Outbox(10)
+    box.put("a", "1")
+    box.put("b", "1")
+    box.put("a", "2")
+    assert len(box) == 2
+    assert [(t, p) for t, p, _, _ in box.take(10, 0)] == [("b", "1"), ("a", "2")]
+    assert box.get_metrics()["coalesced"] == 1
+
+def test_outbox_drops_oldest_when_full():
+    box = Outbox(2)
+    for topic in "abc": box.put(topic, topic)
+    assert [t for t, _, _, _ in box.take(10, 0)] == ["b", "c"]
+    assert box.dropped == 1
+
+def test_outbox_front_and_batches():
+    box = Outbox(10)
+    for topic in "abc": box.put(topic, topic)
+    box.put("config", "x", front=True)
+    assert [t for t, _, _, _ in box.take(2, 0)] == ["config", "a"]
+    assert [t for t, _, _, _ in box.take(2, 0)] == ["b", "c"]
+    assert box.take(2, 0.01) == []
+
+def test_outbox_requeue_keeps_newer_payloads():
+    box = Outbox(10)
+    for topic in "abc": box.put(topic, "old")
+    batch = box.take(3, 0)
+    box.put("b", "new")
+    box.requeue(batch)
+    assert [(t, p) for t, p, _, _ in box.take(10, 0)] == [("a", "old"), ("c", "old"), ("b", "new")]
+
+def test_outbox_requeue_respects_bound():
+    box = Outbox(2)
+    box.put("a", "1")
+    batch = box.take(1, 0)
+    box.put("b", "1")
+    box.put("c", "1")
+    box.requeue(batch)
+    assert len(box) == 2 and box.dropped == 1
+
+def test_outbox_spool_survives_restart(tmp_path):
+    spool = str(tmp_path / "spool.json")
+    box = Outbox(10, spool)
+    box.put("a", "1", retain=False)
+    box.put("b", "2")
+    box.save_spool()
+
+    restored = Outbox(10, spool)
+    assert [(t, p, r) for t, p, r, _ in restored.take(10, 0)] == [("a", "1", False), ("b", "2", True)]
+    restored.save_spool()
+    assert not (tmp_path / "spool.json").exists() # Empty outbox: spool removed
+
+def test_outbox_spool_trimmed_to_size(tmp_path):
+    spool = tmp_path / "spool.json"
+    spool.write_text(json.dumps([[f"t{i}", "x", True, 0] for i in range(5)]))
+    assert [t for t, _, _, _ in Outbox(2, str(spool)).take(10, 0)] == ["t3", "t4"]
+
+def test_outbox_unreadable_spool(tmp_path):
+    spool = tmp_path / "spool.json"
+    spool.write_text("{not json")
+    assert len(Outbox(10, str(spool))) == 0
+
+# === STAND-IN BROKER ===
+class StandInBroker:
+    """
+    Just enough MQTT 3.1.1 for the handler: CONNECT/CONNACK, PUBLISH with
+    PUBACK for QoS 1, PINGREQ and DISCONNECT. stop() drops every client as
+    a broker outage would; start() listens again on the same port.
+    """
+    def __init__(self):
+        self.port = 0
+        self.listener = None
+        self.clients = []
+        self.published = [] # (topic, payload, qos, retain)
+        self.wills = []
+        self.connects = 0
+        self.lock = threading.Lock()
+
+    def start(self):
+        self.listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(("127.0.0.1", self.port))
+        self.listener.listen()
+        self.port = self.listener.getsockname()[1]
+        self.acceptor = threading.Thread(target=self._accept, args=(self.listener,), daemon=True)
+        self.acceptor.start()
+
+    def stop(self):
+        try: self.listener.shutdown(socket.SHUT_RDWR) # Wakes the blocked accept()
+        except OSError: pass
+        self.listener.close()
+        self.acceptor.join(2)
+        with self.lock:
+            clients, self.clients = self.clients, []
+        for conn in clients:
+            try: conn.shutdown(socket.SHUT_RDWR)
+            except OSError: pass
+            conn.close()
+
+    def payloads(self, topic):
+        with self.lock:
+            return [p for t, p, _, _ in self.published if t == topic]
+
+    def _accept(self, listener):
+        while True:
+            try: conn, _ = listener.accept()
+            except OSError: return
+            with self.lock: self.clients.append(conn)
+            threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+    def _serve(self, conn):
+        try:
+            while True:
+                header, body = self._read_packet(conn)
+                kind = header >> 4
+                if kind == 1: # CONNECT
+                    self._on_connect(body)
+                    conn.sendall(b"\x20\x02\x00\x00")
+                elif kind == 3: # PUBLISH
+                    qos, retain = (header >> 1) & 3, bool(header & 1)
+                    size = struct.unpack("!H", body[:2])[0]
+                    topic, rest = body[2:2 + size].decode(), body[2 + size:]
+                    if qos:
+                        packet_id, rest = rest[:2], rest[2:]
+                        conn.sendall(b"\x40\x02" + packet_id)
+                    with self.lock: self.published.append((topic, rest.decode(), qos, retain))
+                elif kind == 12: # PINGREQ
+                    conn.sendall(b"\xd0\x00")
+                elif kind == 14: # DISCONNECT
+                    return
+        except (ConnectionError, OSError):
+            return
+        finally:
+            conn.close()
+
+    def _on_connect(self, body):
+        flags = body[7]
+        with self.lock:
+            self.connects += 1
+            if flags & 0x04: # Will flag: client id, then will topic and message
+                pos = 10
+                fields = []
+                for _ in range(3):
+                    size = struct.unpack("!H", body[pos:pos + 2])[0]
+                    fields.append(body[pos + 2:pos + 2 + size].decode())
+                    pos += 2 + size
+                self.wills.append((fields[1], fields[2]))
+
+    @staticmethod
+    def _read_packet(conn):
+        header = _recv(conn, 1)[0]
+        length, shift = 0, 0
+        while True:
+            byte = _recv(conn, 1)[0]
+            length |= (byte & 0x7F) << shift
+            shift += 7
+            if not byte & 0x80: break
+        return header, _recv(conn, length)
+
+def _recv(conn, size):
+    data = b""
+    while len(data) < size:
+        part = conn.recv(size - len(data))
+        if not part: raise ConnectionError("closed")
+        data += part
+    return data
+
+def wait_for(condition, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition(): return True
+        time.sleep(0.02)
+    return False
+
+@pytest.fixture
+def broker():
+    pytest.importorskip("paho.mqtt.client")
+    b = StandInBroker()
+    b.start()
+    yield b
+    b.stop()
+
+@pytest.fixture
+def handler(broker, config):
+    config.data["haos"].update({
+        "enabled": True, "mqtt_broker": "127.0.0.1", "mqtt_port": broker.port,
+        "reconnect_min": 1, "reconnect_max": 1
+    })
+    h = HAOSHandler()
+    yield h
+    h.disconnect()
+
+def snapshot(name, cpu="50 °C"):
+    return {"status": "Playing", "game": {"name": name, "title_id": "PPSA01284"}, "stats": {"cpu_temp": cpu}}
+
+def test_publishes_while_connected(broker, handler):
+    topic = handler.config.get("haos", "mqtt_topic")
+    handler.connect()
+    assert wait_for(lambda: handler.connected)
+
+    handler.update(snapshot("Returnal"))
+    assert wait_for(lambda: broker.payloads(topic))
+    assert json.loads(broker.payloads(topic)[-1])["game_name"] == "Returnal"
+    assert len(handler.outbox) == 0
+
+def test_outage_coalesces_and_drains_after_reconnect(broker, handler):
+    topic = handler.config.get("haos", "mqtt_topic")
+    handler.connect()
+    assert wait_for(lambda: handler.connected)
+    handler.update(snapshot("Returnal"))
+    assert wait_for(lambda: broker.payloads(topic))
+
+    broker.stop()
+    assert wait_for(lambda: not handler.connected)
+    for cpu in range(60, 70):
+        handler.update(snapshot("Astro's Playroom", f"{cpu} °C"))
+    assert len(handler.outbox) == 1 # Ten updates, one pending message
+    assert handler.outbox.coalesced >= 9
+    sent_before = len(broker.payloads(topic))
+
+    broker.start()
+    assert wait_for(lambda: handler.reconnects == 1 and len(handler.outbox) == 0)
+    assert wait_for(lambda: len(broker.payloads(topic)) > sent_before)
+    latest = json.loads(broker.payloads(topic)[-1])
+    assert (latest["game_name"], latest["cpu_temp"]) == ("Astro's Playroom", "69 °C")
+    assert broker.connects == 2
+
+def test_discovery_announces_again_after_reconnect(broker, handler):
+    handler.config.data["haos"]["discovery"] = True
+    handler.connect()
+    assert wait_for(lambda: handler.connected)
+    assert broker.wills == [("ps5_monitor/availability", "offline")]
+    handler.update(snapshot("Returnal"))
+    assert wait_for(lambda: broker.payloads("ps5_monitor/game/state") == ["Returnal"])
+
+    broker.stop()
+    assert wait_for(lambda: not handler.connected)
+    handler.update(snapshot("Bloodborne"))
+    broker.start()
+
+    assert wait_for(lambda: broker.payloads("ps5_monitor/game/state")[-1:] == ["Bloodborne"])
+    assert wait_for(lambda: len(broker.payloads("homeassistant/sensor/ps5_monitor/game/config")) == 2)
+    assert broker.payloads("ps5_monitor/availability")[-1] == "online"
@@ -0,0 +1,63 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from app import metrics
+from app.http_client import HttpClient
+
+class Upstream(BaseHTTPRequestHandler):
+    """/flaky fails once with 503, /missing is 404, anything else 200."""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        status = 200
+        if self.path == "/missing": status = 404
+        elif self.path == "/flaky" and not self.server.flaked:
+            self.server.flaked = True
+            status = 503
+        body = b"ok"
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        return
+
+@pytest.fixture
+def upstream():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Upstream)
+    httpd.flaked = False
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+def sample(text, name):
+    for line in text.splitlines():
+        if line.startswith(name + '{host="127.0.0.1"'):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+def test_per_host_stats_exported(upstream):
+    before = metrics.REGISTRY.render()
+    client = HttpClient(retries=2, backoff=0)
+    try:
+        assert client.get(upstream + "/page").status_code == 200
+        assert client.get(upstream + "/flaky").status_code == 200
+        assert client.get(upstream + "/missing").status_code == 404
+    finally:
+        client.close()
+
+    stats = client.get_stats()["127.0.0.1"]
+    assert (stats["requests"], stats["errors"], stats["retries"]) == (4, 2, 1)
+    assert stats["max_ms"] >= stats["avg_ms"] > 0
+
+    text = metrics.REGISTRY.render()
+    assert sample(text, "ps5_http_requests_total") == 4
+    assert sample(text, "ps5_http_errors_total") == 2
+    assert sample(text, "ps5_http_retries_total") == 1
+    assert sample(text, "ps5_http_request_seconds_count") - (sample(before, "ps5_http_request_seconds_count") or 0) == 4
@@ -0,0 +1,81 @@
+import os
+import random
+
+from app.klog import IGNORED_IDS, KlogMatch, LineFramer, classify_line
+from benchmarks.baseline import LegacyClassifier, legacy_frame
+
+CORPUS = os.path.join(os.path.dirname(__file__), "data", "klog_corpus.txt")
+
+# Transitions the corpus must produce, in order (home, splash, overlays and
+# unloads ignored, prohibition flag, settings, debug settings, quoted and
+# bracketed ids, ITEM/lowercase ids ignored, AppScreen source fallback)
+GOLDEN = [
+    "NPXS40002", "PPSA01284", "CUSA07408", "NPXS40002", "NPXS40008", "DEBUG_SETTINGS",
+    "CUSA00411", "PPSA03420", "NPXS40002", "CUSA00001", "NPXS40002", "PPSA01284"
+]
+
+def corpus_lines():
+    with open(CORPUS, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+def transitions(lines):
+    """Same decision as PS5Core._process_log_line."""
+    current, result = None, []
+    for line in lines:
+        match = classify_line(line)
+        if not match or match.title_id == current or match.title_id in IGNORED_IDS: continue
+        current = match.title_id
+        result.append(current)
+    return result
+
+def legacy_transitions(lines):
+    legacy = LegacyClassifier()
+    for line in lines: legacy.process(line)
+    return legacy.transitions
+
+def test_golden_transitions():
+    assert transitions(corpus_lines()) == GOLDEN
+
+def test_legacy_parity_on_corpus():
+    assert legacy_transitions(corpus_lines()) == GOLDEN
+
+def test_parity_on_shuffled_corpus():
+    lines = corpus_lines()
+    rng = random.Random(2024)
+    for _ in range(200):
+        sample = rng.choices(lines, k=60)
+        assert transitions(sample) == legacy_transitions(sample)
+
+def test_match_kinds():
+    assert classify_line("ProhibitionFlag x newFlags=[0x8,CUSA07408,]").kind == KlogMatch.PROHIBITION
+    assert classify_line("OnFocusActiveSceneChanged [A] -> [GameScene.Render.PPSA01284]").kind == KlogMatch.SCENE
+    assert classify_line("launchApp titleId=CUSA00411").kind == KlogMatch.TITLE
+    assert classify_line("OnFocusActiveSceneChanged [A] -> [X.id_debug_settings]").kind == KlogMatch.DEBUG
+    assert classify_line("OnFocusActiveSceneChanged [A] -> [FocusCaptureScene.Render.CUSA07408]") is None
+    assert classify_line("<118>[SceSysCore] thermal: fan step 3 -> 4") is None
+
+def frame(data, size):
+    framer = LineFramer()
+    lines = []
+    for i in range(0, len(data), size): lines += framer.feed(data[i:i + size])
+    return lines
+
+def test_framer_matches_legacy_split():
+    data = "\n".join(corpus_lines()).encode("utf-8") + b"\n"
+    legacy = []
+    legacy_frame([data[i:i + 4096] for i in range(0, len(data), 4096)], legacy.append)
+    assert frame(data, 4096) == legacy == corpus_lines()
+
+def test_framer_keeps_characters_split_across_reads():
+    # The old loop decoded every read on its own and lost these
+    text = ["tail °C ünïcödé"] * 50
+    data = "\n".join(text).encode("utf-8") + b"\n"
+    for size in (1, 7, 4096):
+        assert frame(data, size) == text
+
+def test_framer_drops_overlong_lines():
+    framer = LineFramer(max_line=16)
+    lines = framer.feed(b"short\n" + b"x" * 40)
+    lines += framer.feed(b"still the long one\nnext\n")
+    assert lines == ["short", "next"]
+    assert framer.lines_dropped == 1
@@ -0,0 +1,141 @@
+import json
+import os
+import threading
+
+import pytest
+
+from app.plugin_manager import ManifestCache, PluginManager, _missing
+
+PLUGIN = '''
+from app.plugin_sdk import PluginBase
+
+with open({log!r}, "a") as f: f.write({name!r} + "\\n")
+
+class Plugin(PluginBase):
+    def get_manifest(self):
+        return {{"name": {name!r}, "id": {name!r}, "requirements": {requirements!r}}}
+'''
+
+@pytest.fixture
+def plugins(tmp_path):
+    """A plugin folder; plugins.add(name, requirements) writes one, plugins.imports() lists imports so far."""
+    folder = tmp_path / "plugins"
+    folder.mkdir()
+    log = str(tmp_path / "imports.log")
+
+    class Folder:
+        path = str(folder)
+        def add(self, name, requirements=()):
+            source = PLUGIN.format(log=log, name=name, requirements=list(requirements))
+            (folder / f"{name}.py").write_text(source)
+        def imports(self):
+            if not os.path.exists(log): return []
+            with open(log) as f: return f.read().split()
+    return Folder()
+
+@pytest.fixture
+def manager(plugins, tmp_path, monkeypatch):
+    m = PluginManager(plugins.path)
+    m.manifests = ManifestCache(str(tmp_path / "manifests.json"))
+    m.installs = []
+    m.install_ok = True
+    def install(packages):
+        m.installs.append(list(packages))
+        return m.install_ok
+    monkeypatch.setattr(m, "_install_dependencies", install)
+    return m
+
+def discover(manager):
+    """discover_plugins, then waits for the background loads; returns the plugins brought online later."""
+    ready = []
+    manager.discover_plugins(on_ready=ready.extend)
+    for thread in threading.enumerate():
+        if thread.name == "plugin-install": thread.join(10)
+    return ready
+
+def names(plugins):
+    return sorted(p.manifest["name"] for p in plugins)
+
+# === REQUIREMENTS ===
+def test_requirements_checked_by_distribution_name():
+    assert _missing({"requirements": ["pytest", "pluggy", "iniconfig"]}) == []
+    assert _missing({"requirements": ["PyTest>=7", "pluggy[dev] ; python_version > '3'", "pytest==0.1"]}) == []
+    assert _missing({"requirements": ["json"]}) == [] # Plain module name
+    assert _missing({"requirements": ["no-such-dist-ps5hub", "pytest"]}) == ["no-such-dist-ps5hub"]
+    assert _missing(None) == [] and _missing({}) == []
+
+def test_requirements_pip_and_module_names_differ():
+    pytest.importorskip("bs4")
+    assert _missing({"requirements": ["beautifulsoup4", "bs4"]}) == []
+
+# === MANIFEST CACHE ===
+def test_manifest_cache_roundtrip(tmp_path):
+    source = tmp_path / "a.py"
+    source.write_text("x = 1")
+    cache = ManifestCache(str(tmp_path / "m.json"))
+    assert cache.get(str(source)) is None
+    cache.put(str(source), {"name": "A", "requirements": ["x"]})
+    cache.save()
+
+    again = ManifestCache(str(tmp_path / "m.json"))
+    assert again.get(str(source)) == {"name": "A", "requirements": ["x"]}
+
+def test_manifest_cache_follows_content(tmp_path):
+    source = tmp_path / "a.py"
+    source.write_text("x = 1")
+    cache = ManifestCache(str(tmp_path / "m.json"))
+    cache.put(str(source), {"name": "A"})
+
+    st = os.stat(source)
+    os.utime(source, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9)) # Touched, same content
+    assert cache.get(str(source)) == {"name": "A"}
+    source.write_text("x = 22")
+    assert cache.get(str(source)) is None
+
+def test_manifest_cache_prunes_and_skips_unserializable(tmp_path):
+    a, b = tmp_path / "a.py", tmp_path / "b.py"
+    a.write_text("a")
+    b.write_text("b")
+    path = str(tmp_path / "m.json")
+    cache = ManifestCache(path)
+    cache.put(str(a), {"name": "A"})
+    cache.put(str(b), {"name": "B", "callback": object()})
+    cache.save(present={str(b)})
+    with open(path) as f: assert json.load(f) == {}
+
+def test_manifest_cache_unreadable(tmp_path):
+    path = tmp_path / "m.json"
+    path.write_text("{broken")
+    assert ManifestCache(str(path)).entries == {}
+
+# === LOADING ===
+def test_loads_plugins_in_parallel_without_installing(plugins, manager):
+    for i in range(6): plugins.add(f"plugin{i}", ["pytest>=7"])
+    assert discover(manager) == []
+    assert names(manager.get_plugins()) == [f"plugin{i}" for i in range(6)]
+    assert manager.installs == []
+
+def test_missing_dependency_installed_in_background(plugins, manager):
+    plugins.add("ready")
+    plugins.add("needs_dep", ["no-such-dist-ps5hub"])
+    ready = discover(manager)
+    assert manager.installs == [["no-such-dist-ps5hub"]]
+    assert names(ready) == ["needs_dep"]
+    assert names(manager.get_plugins()) == ["needs_dep", "ready"]
+
+def test_failed_install_disables_plugin(plugins, manager):
+    plugins.add("needs_dep", ["no-such-dist-ps5hub"])
+    manager.install_ok = False
+    assert discover(manager) == []
+    assert manager.get_plugins() == []
+
+def test_cached_manifest_defers_import(plugins, manager):
+    plugins.add("needs_dep", ["no-such-dist-ps5hub"])
+    manager.install_ok = False
+    discover(manager)
+    assert plugins.imports() == ["needs_dep"]
+
+    # Requirements known from the cache: not imported again until they are installed
+    discover(manager)
+    assert plugins.imports() == ["needs_dep"]
+    assert manager.installs == [["no-such-dist-ps5hub"]] * 2
@@ -0,0 +1,153 @@
+import glob
+import json
+import os
+import threading
+import time
+
+import pytest
+
+from app import metrics
+from app.providers import GamePageParser, MetadataProvider, PatchSiteProvider, ProviderChain
+
+PAGES = os.path.join(os.path.dirname(__file__), "data", "pages")
+BASE_URL = "https://prosperopatches.com"
+
+def corpus():
+    with open(os.path.join(PAGES, "expected.json"), encoding="utf-8") as f:
+        expected = json.load(f)
+    pages = {}
+    for path in sorted(glob.glob(os.path.join(PAGES, "*.html"))):
+        with open(path, encoding="utf-8") as f:
+            pages[os.path.basename(path)[:-5]] = f.read()
+    assert set(pages) == set(expected)
+    return pages, {k: tuple(v) for k, v in expected.items()}
+
+def chunks(html, size):
+    return [html[i:i + size] for i in range(0, len(html), size)]
+
+def extract(html, size=4096):
+    """Same feeding loop as PatchSiteProvider.lookup."""
+    parser = GamePageParser()
+    for chunk in chunks(html, size):
+        parser.feed(chunk)
+        if parser.complete: break
+    else:
+        parser.close()
+    return parser.result(BASE_URL)
+
+class StreamedPage:
+    def __init__(self, status_code, html, size):
+        self.status_code = status_code
+        self.parts = chunks(html, size)
+        self.read = 0
+        self.closed = False
+
+    def iter_text(self):
+        for part in self.parts:
+            self.read += 1
+            yield part
+
+    def close(self):
+        self.closed = True
+
+class FakeHttp:
+    """Serves corpus pages as HttpClient.stream would, in fixed-size text chunks."""
+    def __init__(self, pages, size=1024):
+        self.pages = pages
+        self.size = size
+        self.responses = []
+
+    def stream(self, url, timeout=None):
+        html = self.pages.get(url.rsplit("/", 1)[-1])
+        r = StreamedPage(404, "", self.size) if html is None else StreamedPage(200, html, self.size)
+        self.responses.append(r)
+        return r
+
+@pytest.mark.parametrize("size", [1, 7, 512, 4096, 1 << 20])
+def test_parser_matches_saved_results(size):
+    pages, expected = corpus()
+    for title_id, html in pages.items():
+        assert extract(html, size) == expected[title_id], title_id
+
+def test_parser_matches_beautifulsoup():
+    pytest.importorskip("bs4")
+    from benchmarks.baseline import legacy_extract
+    pages, _ = corpus()
+    for title_id, html in pages.items():
+        assert extract(html) == legacy_extract(html, BASE_URL), title_id
+
+def test_lookup_stops_reading_once_complete():
+    pages, expected = corpus()
+    http = FakeHttp(pages)
+    provider = PatchSiteProvider("prosperopatches", BASE_URL, http)
+
+    info, reason = provider.lookup("PPSA01284", threading.Event())
+    assert reason is None
+    assert (info["name"], info["image"], info["background"]) == expected["PPSA01284"]
+
+    r = http.responses[-1]
+    assert r.closed
+    assert r.read < len(r.parts) // 10 # Header only, the changelog is never read
+
+def test_lookup_failures():
+    pages, _ = corpus()
+    provider = PatchSiteProvider("prosperopatches", BASE_URL, FakeHttp(pages))
+    assert provider.lookup("NPXS40002", threading.Event()) == (None, "no title in page")
+    assert provider.lookup("CUSA99999", threading.Event()) == (None, "HTTP 404")
+
+    cancel = threading.Event()
+    cancel.set()
+    assert provider.lookup("PPSA01284", cancel) == (None, "cancelled")
+
+# === PROVIDER CHAIN ===
+class Scripted(MetadataProvider):
+    """Answers 'info' after 'delay' seconds, or stops early once cancelled."""
+    def __init__(self, name, delay=0.0, info=None, timeout=5, preferred=False):
+        self.name = name
+        self.delay = delay
+        self.info = info
+        self.timeout = timeout
+        self.is_preferred = preferred
+        self.finished = threading.Event()
+
+    def preferred(self, title_id):
+        return self.is_preferred
+
+    def lookup(self, title_id, cancel):
+        try:
+            if cancel.wait(self.delay): return None, "cancelled"
+            return (self.info, None) if self.info else (None, "not found")
+        finally:
+            self.finished.set()
+
+def test_chain_timeout_counted_once():
+    slow = Scripted("chain-slow", delay=0.5, timeout=0.05)
+    chain = ProviderChain([slow], hedge_delay=0.01)
+    assert chain.lookup("PPSA01284") == (None, "chain-slow: timeout")
+    assert slow.finished.wait(2)
+    time.sleep(0.05)
+
+    stats = chain.get_stats()["chain-slow"]
+    assert (stats["requests"], stats["hits"], stats["misses"], stats["timeouts"], stats["cancelled"]) == (1, 0, 1, 1, 0)
+    assert stats["success_rate"] == 0.0
+
+def test_chain_hedge_winner_cancels_the_rest():
+    slow = Scripted("chain-hedged", delay=2, preferred=True)
+    fast = Scripted("chain-fast", info={"name": "Returnal"})
+    chain = ProviderChain([slow, fast], hedge_delay=0.02)
+    assert chain.lookup("PPSA01284") == ({"name": "Returnal"}, None)
+    assert slow.finished.wait(2)
+    time.sleep(0.05)
+
+    stats = chain.get_stats()
+    assert (stats["chain-hedged"]["requests"], stats["chain-hedged"]["cancelled"]) == (1, 1)
+    assert (stats["chain-fast"]["requests"], stats["chain-fast"]["hits"]) == (1, 1)
+    assert stats["chain-fast"]["success_rate"] == 1.0
+
+def test_chain_stats_exported():
+    chain = ProviderChain([Scripted("chain-export", info={"name": "x"})])
+    chain.lookup("PPSA01284")
+    text = metrics.REGISTRY.render()
+    assert 'ps5_provider_requests_total{provider="chain-export"} 1' in text
+    assert 'ps5_provider_results_total{provider="chain-export",result="hit"} 1' in text
+    assert 'ps5_provider_lookup_seconds_count{provider="chain-export"} 1' in text
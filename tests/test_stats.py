@@ -0,0 +1,165 @@
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip("httpx")
+
+from app import stats
+from app.stats import AutoStatsFetcher, HttpStatsFetcher, StatsUnavailable
+
+STATS_PAGE = """
+<html><body><div class="system-info-content">
+    <div class="info-row"><div class="info-label">CPU Temp</div><div class="info-value">52 &deg;C</div></div>
+    <div class="info-row"><div class="info-label">SoC Temp</div><div class="info-value">48 &deg;C</div></div>
+    <div class="info-row"><div class="info-label">Frequency</div><div class="info-value">3200 MHz</div></div>
+</div></body></html>
+"""
+JS_SHELL = '<html><body><div id="root"></div><script src="/app.js"></script></body></html>'
+
+class StatsPage(BaseHTTPRequestHandler):
+    """Stand-in for the console's stats server: /ok, /shell (JS only), anything else 404."""
+    def do_GET(self):
+        path = self.server.routes.get(self.path)
+        if path is None:
+            self.send_error(404)
+            return
+        body = path.encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        return
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), StatsPage)
+    httpd.routes = {"/ok": STATS_PAGE, "/shell": JS_SHELL}
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def url(server, path):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+class FakeBrowser:
+    """Replaces PlaywrightStatsFetcher, so no Chromium is needed."""
+    instances = []
+
+    def __init__(self):
+        self.closed = False
+        FakeBrowser.instances.append(self)
+
+    def fetch(self, url):
+        return {"cpu_temp": "browser", "soc_temp": "browser", "frequency": "browser"}
+
+    def get_stats(self):
+        return {"backend": "playwright", "rss_mb": 300.0}
+
+    def close(self):
+        self.closed = True
+
+@pytest.fixture
+def browser(monkeypatch):
+    FakeBrowser.instances = []
+    monkeypatch.setattr(stats, "PlaywrightStatsFetcher", FakeBrowser)
+    return FakeBrowser
+
+def test_reads_stats_page(server):
+    fetcher = HttpStatsFetcher()
+    try:
+        assert fetcher.fetch(url(server, "/ok")) == {"cpu_temp": "52 °C", "soc_temp": "48 °C", "frequency": "3200 MHz"}
+    finally:
+        fetcher.close()
+
+def test_error_status_raises(server):
+    fetcher = HttpStatsFetcher()
+    try:
+        with pytest.raises(StatsUnavailable):
+            fetcher.fetch(url(server, "/missing"))
+    finally:
+        fetcher.close()
+
+def test_js_shell_has_no_values(server):
+    fetcher = HttpStatsFetcher()
+    try:
+        assert fetcher.fetch(url(server, "/shell")) is None
+    finally:
+        fetcher.close()
+
+def test_auto_keeps_http_on_error_pages(server, browser):
+    fetcher = AutoStatsFetcher(fallback_after=3)
+    try:
+        for _ in range(5):
+            with pytest.raises(StatsUnavailable):
+                fetcher.fetch(url(server, "/missing"))
+        assert fetcher.browser is None
+        assert fetcher.fetch(url(server, "/ok"))["cpu_temp"] == "52 °C"
+        assert not browser.instances
+    finally:
+        fetcher.close()
+
+def test_auto_falls_back_after_repeated_js_pages(server, browser):
+    fetcher = AutoStatsFetcher(fallback_after=3)
+    try:
+        assert fetcher.fetch(url(server, "/shell")) is None
+        assert fetcher.fetch(url(server, "/shell")) is None
+        assert fetcher.browser is None
+        assert fetcher.fetch(url(server, "/shell"))["cpu_temp"] == "browser"
+        assert fetcher.get_stats()["active"] == "playwright"
+    finally:
+        fetcher.close()
+
+def test_auto_counts_only_consecutive_js_pages(server, browser):
+    fetcher = AutoStatsFetcher(fallback_after=2)
+    try:
+        fetcher.fetch(url(server, "/shell"))
+        fetcher.fetch(url(server, "/ok"))
+        assert fetcher.fetch(url(server, "/shell")) is None
+        assert fetcher.browser is None
+    finally:
+        fetcher.close()
+
+def test_auto_returns_to_http(server, browser):
+    fetcher = AutoStatsFetcher(fallback_after=1, retry_http=0)
+    try:
+        assert fetcher.fetch(url(server, "/shell"))["cpu_temp"] == "browser"
+        assert fetcher.fetch(url(server, "/ok"))["cpu_temp"] == "52 °C"
+        assert fetcher.browser is None
+        assert browser.instances[0].closed
+        assert fetcher.get_stats()["playwright"]["rss_mb"] == 300.0 # Kept after the browser closed
+    finally:
+        fetcher.close()
+
+# === MEMORY ===
+def test_memory_reported_per_backend(server, browser):
+    fetcher = AutoStatsFetcher(fallback_after=1)
+    try:
+        fetcher.fetch(url(server, "/ok"))
+        report = fetcher.get_stats()
+        assert "playwright" not in report
+        if stats._rss_mb() is not None:
+            assert report["http"]["peak_rss_mb"] >= report["http"]["rss_mb"] > 0
+
+        fetcher.fetch(url(server, "/shell"))
+        assert fetcher.get_stats()["playwright"]["rss_mb"] == 300.0
+    finally:
+        fetcher.close()
+
+def test_child_process_memory():
+    if stats._rss_mb(children=True) is None: pytest.skip("no RSS probe on this platform")
+    before = stats._rss_mb(children=True)
+    child = subprocess.Popen([sys.executable, "-c", "import sys; sys.stdin.read()"], stdin=subprocess.PIPE)
+    try:
+        deadline = time.time() + 5
+        while stats._rss_mb(children=True) - before < 1 and time.time() < deadline: time.sleep(0.05)
+        assert stats._rss_mb(children=True) - before >= 1 # An idle interpreter is several MB
+    finally:
+        child.communicate(b"")
@@ -0,0 +1,38 @@
+from app.timeseries import Series, StatsHistory, parse_stat
+
+NOW = 1_699_999_200 # Aligned to the hour
+
+def filled(step, capacity, minutes=180):
+    """One sample per minute over the last 'minutes', value = minutes ago."""
+    series = Series(step, capacity)
+    for ago in range(minutes, 0, -1):
+        series.add(NOW - ago * 60 + 1, float(ago))
+    return series
+
+def test_parse_stat():
+    assert parse_stat("52 °C") == 52.0
+    assert parse_stat("3,5 GHz") == 3.5
+    assert parse_stat("Timeout") is None
+
+def test_raw_window_is_exact():
+    assert filled(0, 720).aggregate(NOW - 90 * 60)["count"] == 90
+
+def test_minute_buckets_cover_window():
+    assert filled(60, 1440).aggregate(NOW - 90 * 60)["count"] == 90
+
+def test_hour_bucket_straddling_window_start_is_included():
+    result = filled(3600, 720).aggregate(NOW - 90 * 60)
+    # Last hour plus the whole hour bucket the window starts in
+    assert result["count"] == 120
+    assert result["max"] == 120.0
+
+def test_points_include_straddling_bucket():
+    points = filled(3600, 720).points(NOW - 90 * 60)
+    assert [p[0] for p in points] == [NOW - 7200, NOW - 3600]
+
+def test_history_aggregate_uses_recorded_samples():
+    history = StatsHistory()
+    for ago in range(30, 0, -1):
+        history.record({"cpu_temp": f"{40 + ago} °C", "soc_temp": "N/A"}, ts=NOW - ago * 60)
+    assert history.latest("cpu_temp") == (NOW - 60, 41.0)
+    assert history.series["soc_temp"]["raw"].size == 0